@@ -8,7 +8,7 @@ Section 1.6.3 Bracketed OL-systems
 """
 
 from l_system.base import Lsystem
-from l_system.rendering.turtle import TurtleConfiguration
+from l_system.rendering.configuration import TurtleConfiguration
 
 
 class BracketedOlSystemFig124c(Lsystem):
@@ -8,7 +8,7 @@ Section 1.4 Synthesis of DOL-systems
 """
 
 from l_system.base import Lsystem
-from l_system.rendering.turtle import TurtleConfiguration
+from l_system.rendering.configuration import TurtleConfiguration
 
 
 class DragonCurve(Lsystem):
@@ -8,7 +8,7 @@ Section 1.3
 """
 
 from l_system.base import Lsystem
-from l_system.rendering.turtle import TurtleConfiguration
+from l_system.rendering.configuration import TurtleConfiguration
 
 
 class QuadraticSnowFlakeCurve(Lsystem):
@@ -0,0 +1,22 @@
+"""
+Example inspired by the book:
+    Przemyslaw Prusinkiewicz, Aristid Lindenmayer –
+    [The Algorithmic Beauty of Plants PDF version available here for free Archived 2021-04-10 at the Wayback Machine]
+    (https://en.wikipedia.org/wiki/The_Algorithmic_Beauty_of_Plants)
+
+Section 1.10 Parametric L-systems
+"""
+
+from l_system.parametric import ParametricLsystem
+from l_system.rendering.configuration import TurtleConfiguration
+
+
+class ParametricBinaryTree(ParametricLsystem):
+    """A binary tree whose branches shrink and fan out until they become shorter than a single step."""
+
+    axiom = 'A(60)'
+    productions = {'A(l) : l >= 1': 'F(l)[+(35)A(l*0.6)][-(25)A(l*0.7)]'}
+    recursions = 8
+
+
+DEFAULT_TURTLE_CONFIG = TurtleConfiguration(initial_heading_angle=90, turtle_move_mapper={'A': 'F'})
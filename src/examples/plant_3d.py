@@ -0,0 +1,26 @@
+"""
+Example taken from the book:
+    Przemyslaw Prusinkiewicz, Aristid Lindenmayer –
+    [The Algorithmic Beauty of Plants PDF version available here for free Archived 2021-04-10 at the Wayback Machine]
+    (https://en.wikipedia.org/wiki/The_Algorithmic_Beauty_of_Plants)
+
+Section 1.7 Modeling in three dimensions
+
+It uses the 3D symbols `&` and `/`, render it with `l_system.rendering.geometry3d.compute_geometry3d`.
+"""
+
+from l_system.base import Lsystem
+from l_system.rendering.configuration import TurtleConfiguration
+
+
+class ThreeDimensionalBush(Lsystem):
+    """Figure 1.25: A three-dimensional bush-like structure (without its leaves)."""
+
+    axiom = 'A'
+    productions = {'A': '[&FA]/////[&FA]///////[&FA]', 'F': 'S/////F', 'S': 'F'}
+    recursions = 6
+
+
+DEFAULT_TURTLE_CONFIG = TurtleConfiguration(
+    angle=22.5, initial_heading_angle=90, turtle_move_mapper={'A': 'F', 'S': 'F'}
+)
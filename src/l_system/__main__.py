@@ -1,24 +1,501 @@
 import argparse
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Sequence
 
-from l_system.rendering.renderer import GlobalSettings, LSystemRenderer
+import numpy as np
 
+from l_system import profiling
+from l_system.budget import Budget, BudgetExceeded, limits
+from l_system.profiling import Profiler, observe
+from l_system.registry import DEFAULT_EXAMPLE, EXAMPLES
+from l_system.symbol_array import CHUNK_SIZE
 
-def main() -> None:
+HOT_LOOPS = {"expansion", "drawing"}
+"""The spans profiled with `cProfile` when `--cprofile` is provided."""
+
+FORMATS = ("png", "svg", "eps")
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    """
+    Parses an image size.
+
+    Args:
+        value: The size in `WxH` format, e.g. `800x600`.
+
+    Returns:
+        The `(width, height)` of the image.
+
+    Raises:
+        argparse.ArgumentTypeError: If `value` is not a valid size.
+    """
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}', expected WxH, e.g. 800x600") from exc
+    if width <= 0 or height <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}', the width and height must be positive")
+    return width, height
+
+
+def parse_values(value: str) -> list[float]:
+    """
+    Parses the values of a swept parameter.
+
+    Args:
+        value: Either `START:STOP:COUNT`, `COUNT` evenly spaced values from `START` to `STOP` included, e.g.
+            `20:30:11`, or a comma separated list, e.g. `22.5,25.7,30`.
+
+    Returns:
+        The values.
+
+    Raises:
+        argparse.ArgumentTypeError: If `value` is not a valid range or list.
+    """
+    try:
+        if ":" in value:
+            start, stop, count = value.split(":")
+            values = np.linspace(float(start), float(stop), int(count)).tolist()
+        else:
+            values = [float(v) for v in value.split(",")]
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid values '{value}', expected START:STOP:COUNT or a list") from exc
+    if not values:
+        raise argparse.ArgumentTypeError(f"invalid values '{value}', the count must be positive")
+    return values
+
+
+def run_gui(args: argparse.Namespace) -> None:
+    """Renders the examples on screen with turtle graphics."""
+    # Only the GUI needs `tkinter`
+    from l_system.rendering.renderer import GlobalSettings, LSystemRenderer
+
+    global_settings = GlobalSettings(args.animate, args.progressive, args.backend, args.dedup)
+    renderer = LSystemRenderer(global_settings)
+    renderer.draw()
+
+
+def run_render(args: argparse.Namespace) -> None:
+    """Expands, frames and exports an example to a file without a display, streaming the state in chunks."""
+    from l_system.rendering.dedup import deduplicate
+    from l_system.rendering.export import EXPORTERS
+    from l_system.rendering.geometry import Geometry, merge_bounding_boxes
+    from l_system.rendering.instancing import build_instances, write_instanced_svg
+    from l_system.rendering.tiles import DEFAULT_TILE_SIZE, write_tile_directory, write_tiled_png
+    from l_system.serialization import GeometryWriter, grammar_fingerprint, load_geometry, read_header
+    from l_system.streaming import iter_expansion, iter_geometry
+
+    lsystem, turtle_configuration = EXAMPLES[args.example]
+    fingerprint = grammar_fingerprint(lsystem.axiom, lsystem.productions)
+    depth = lsystem.recursions if args.depth is None else args.depth
+    fmt = args.format or (args.out.suffix.lstrip(".").lower() if args.out and args.out.suffix else "png")
+    if fmt not in FORMATS:
+        raise SystemExit(f"error: unsupported format '{fmt}', expected one of {', '.join(FORMATS)}")
+    if (args.tile_size or args.tile_dir) and fmt != "png":
+        raise SystemExit("error: tiled rendering only supports the png format")
+    if args.instanced and (args.geometry or args.save_geometry):
+        raise SystemExit("error: --instanced can't be combined with geometry files")
+    if args.instanced and args.dedup:
+        raise SystemExit("error: --instanced can't be combined with --dedup")
+    out = args.out or Path(f"{args.example}_tiles" if args.tile_dir else f"{args.example}.{fmt}")
+
+    def stream():
+        return iter_geometry(iter_expansion(lsystem, depth, args.chunk_size), turtle_configuration)
+
+    profiler = Profiler()
+    start = time.perf_counter()
+    with observe(profiler):
+        if args.instanced:
+            try:
+                tree = build_instances(lsystem, turtle_configuration, depth)
+            except ValueError as exc:
+                raise SystemExit(f"error: {exc}") from exc
+            profiling.count("segments", len(tree))
+        elif args.geometry is None:
+            # The image is framed by the bounding box of the whole drawing, which is known once the state has been
+            # streamed. The segments are then streamed again, or read back from the geometry file if one is saved.
+            writer = GeometryWriter(args.save_geometry, np.float64, fingerprint, depth) if args.save_geometry else None
+            bounding_boxes = []
+            for geometry in stream():
+                bounding_boxes.append(geometry.bounding_box)
+                profiling.count("segments", len(geometry))
+                if writer:
+                    writer.write(geometry)
+            if writer:
+                writer.close()
+
+        geometry_file = args.geometry or args.save_geometry
+        if geometry_file:
+            # The segments are memory mapped, they are only read while they are drawn
+            try:
+                geometry = load_geometry(geometry_file, fingerprint)
+            except ValueError as exc:
+                raise SystemExit(f"error: {exc}") from exc
+            depth = read_header(geometry_file).depth
+            if args.geometry:
+                profiling.count("segments", len(geometry))
+            chunks = (geometry.segments[i : i + args.chunk_size] for i in range(0, len(geometry), args.chunk_size))
+            bounding_box = geometry.bounding_box
+        elif args.instanced:
+            chunks = tree.chunks(args.chunk_size)
+            bounding_box = tree.bounding_box
+        else:
+            chunks = (g.segments for g in stream())
+            bounding_box = merge_bounding_boxes(bounding_boxes)
+        dedup_report = None
+        if args.dedup:
+            # A segment may be retraced in any chunk, so the segments must all be resident
+            segments = geometry.segments if geometry_file else np.concatenate(list(chunks)).reshape(-1, 4)
+            geometry, dedup_report = deduplicate(Geometry(segments, bounding_box))
+            chunks = [geometry.segments]
+        if args.instanced and fmt == "svg":
+            write_instanced_svg(tree, turtle_configuration, out, args.size)
+        elif args.tile_size or args.tile_dir:
+            # The segments are bucketed to the tiles, so they must all be resident (or memory mapped)
+            if not geometry_file:
+                geometry = Geometry(np.concatenate(list(chunks)).reshape(-1, 4), bounding_box)
+            write_tiles = write_tile_directory if args.tile_dir else write_tiled_png
+            write_tiles(
+                geometry, turtle_configuration, out, args.size, args.tile_size or DEFAULT_TILE_SIZE, args.workers
+            )
+        else:
+            EXPORTERS[fmt](chunks, bounding_box, turtle_configuration, out, args.size)
+    elapsed = time.perf_counter() - start
+
+    report = profiler.report()
+    print(f"Rendered {args.example} (depth {depth}, {report['counters'].get('segments', 0)} segments) to {out}")
+    if dedup_report:
+        print(f"  {dedup_report}")
+    for name in ("expansion", "geometry", "dedup", "export") if args.dedup else ("expansion", "geometry", "export"):
+        print(f"  {name:<10} {report['spans'].get(name, {}).get('total_seconds', 0.0):>8.3f} s")
+    print(f"  {'total':<10} {elapsed:>8.3f} s")
+    if report["peak_rss_bytes"] is not None:
+        print(f"  {'peak RSS':<10} {report['peak_rss_bytes'] / 2**20:>8.1f} MiB")
+
+
+def run_animate(args: argparse.Namespace) -> None:
+    """Renders the growth of an example to an animated GIF or PNG file without a display, in a process pool."""
+    from l_system.rendering.animation import FORMATS as ANIMATION_FORMATS
+    from l_system.rendering.animation import growth_frames, write_animation
+
+    lsystem, turtle_configuration = EXAMPLES[args.example]
+    out = args.out or Path(f"{args.example}.gif")
+    if out.suffix.lower() not in ANIMATION_FORMATS:
+        raise SystemExit(f"error: unsupported animation format '{out.suffix}', expected one of .gif, .png or .apng")
+    start = time.perf_counter()
+    frames = growth_frames(lsystem, turtle_configuration, args.depth, args.mode, args.frames, args.size, args.workers)
+    write_animation(frames, out, args.duration)
+    print(f"Rendered {len(frames)} frames of {args.example} to {out} in {time.perf_counter() - start:.3f} s")
+
+
+def run_sweep(args: argparse.Namespace) -> None:
+    """
+    Renders an example with many turning angles and forward steps, to a contact sheet or an image per variant. The
+    grammar is expanded once and the geometry of all the variants is computed in one pass.
+    """
+    from l_system.rendering.sweep import contact_sheet, sweep, write_variants
+
+    lsystem, turtle_configuration = EXAMPLES[args.example]
+    start = time.perf_counter()
+    variants = sweep(lsystem, turtle_configuration, args.angles, args.steps, args.depth)
+    if args.out_dir:
+        write_variants(variants, turtle_configuration, args.out_dir, args.format, args.cell)
+        out = args.out_dir
+    else:
+        out = args.out or Path(f"{args.example}_sweep.png")
+        contact_sheet(variants, turtle_configuration, args.cell, args.columns, args.shared_frame).save(out)
+    print(f"Rendered {len(variants)} variants of {args.example} to {out} in {time.perf_counter() - start:.3f} s")
+
+
+def run_serve(args: argparse.Namespace) -> None:
+    """Serves renders of L-Systems on a local HTTP port, see `l_system.server`."""
+    import asyncio
+    import logging
+
+    from l_system.server import serve
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size * 2**20))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv: Sequence[str] | None = None) -> None:
     parser = argparse.ArgumentParser(prog="l-system", description="Render L-systems with turtle graphics.")
     parser.add_argument(
         "--animate",
         "-a",
         dest="animate",
         action="store_true",
-        default=True,
+        default=False,
         help="If provided, animate turtle movement. (default: False)",
     )
+    parser.add_argument(
+        "--progressive",
+        "-p",
+        action="store_true",
+        help="Draw the low generations at once and refine them in the background. (default: False)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("turtle", "canvas"),
+        default="turtle",
+        help="Draw with the turtle, or the precomputed geometry straight to the canvas. (default: turtle)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Drop the segments drawn more than once and merge the overlapping collinear ones before drawing with the "
+        "canvas backend or rendering, keeping all the segments in memory. (default: False)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="REPORT",
+        help="Write a JSON report of the timing spans, counters and peak RSS to REPORT on exit.",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        metavar="STATS",
+        help="Also write the cProfile stats of the expansion and drawing loops to STATS (requires --profile).",
+    )
+    parser.add_argument("--max-symbols", type=int, metavar="N", help="Abort before a state exceeds N symbols.")
+    parser.add_argument(
+        "--max-memory",
+        type=int,
+        metavar="MIB",
+        help="Abort before a state or a geometry held in memory exceeds MIB MiB, or stream it where possible.",
+    )
+    parser.add_argument("--max-seconds", type=float, metavar="S", help="Abort an expansion running for over S seconds.")
+    parser.add_argument("--max-segments", type=int, metavar="N", help="Abort before drawing over N segments.")
+    parser.set_defaults(command=run_gui)
 
-    args = parser.parse_args()
+    subparsers = parser.add_subparsers(title="commands", description="Without a command the GUI is started.")
+    render_parser = subparsers.add_parser(
+        "render", help="Render an example to an image file without a display.", description=run_render.__doc__
+    )
+    render_parser.add_argument(
+        "--example",
+        "-e",
+        choices=list(EXAMPLES),
+        default=DEFAULT_EXAMPLE,
+        metavar="NAME",
+        help=f"The example to render, one of {', '.join(EXAMPLES)}. (default: {DEFAULT_EXAMPLE})",
+    )
+    render_parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        metavar="N",
+        help="The number of recursions. (default: the recursions of the example)",
+    )
+    render_parser.add_argument(
+        "--format", "-f", choices=FORMATS, help="The image format. (default: the suffix of --out or png)"
+    )
+    render_parser.add_argument(
+        "--size",
+        "-s",
+        type=parse_size,
+        default=(800, 800),
+        metavar="WxH",
+        help="The image size in WxH format. (default: 800x800)",
+    )
+    render_parser.add_argument(
+        "--out", "-o", type=Path, metavar="PATH", help="Where the image is stored. (default: EXAMPLE.FORMAT)"
+    )
+    render_parser.add_argument(
+        "--chunk-size", type=int, default=CHUNK_SIZE, help="The maximum number of symbols resident per generation."
+    )
+    render_parser.add_argument(
+        "--save-geometry",
+        type=Path,
+        metavar="PATH",
+        help="Also store the computed segments to a binary geometry file, see `l_system.serialization`.",
+    )
+    render_parser.add_argument(
+        "--geometry",
+        type=Path,
+        metavar="PATH",
+        help="Render the segments of a geometry file of the example instead of expanding it.",
+    )
+    render_parser.add_argument(
+        "--instanced",
+        action="store_true",
+        help="Interpret every (symbol, depth) pair once and place it by rigid transforms, SVG images reuse the shapes "
+        "with <use> elements. Only for L-Systems of rigid turtle moves with balanced branches.",
+    )
+    render_parser.add_argument(
+        "--tile-size",
+        type=parse_size,
+        metavar="WxH",
+        help="Render the image in tiles of WxH pixels in a process pool, for images too large for one buffer.",
+    )
+    render_parser.add_argument(
+        "--tile-dir",
+        action="store_true",
+        help="Store the tiles as PNG files in the directory --out instead of a single PNG image.",
+    )
+    render_parser.add_argument(
+        "--workers", type=int, help="The number of processes rendering the tiles. (default: the number of CPUs)"
+    )
+    render_parser.set_defaults(command=run_render)
 
-    global_settings = GlobalSettings(args.animate)
-    renderer = LSystemRenderer(global_settings)
-    renderer.draw()
+    animate_parser = subparsers.add_parser(
+        "animate",
+        help="Render the growth of an example to an animated GIF or PNG file.",
+        description=run_animate.__doc__,
+    )
+    animate_parser.add_argument(
+        "--example",
+        "-e",
+        choices=list(EXAMPLES),
+        default=DEFAULT_EXAMPLE,
+        metavar="NAME",
+        help=f"The example to animate, one of {', '.join(EXAMPLES)}. (default: {DEFAULT_EXAMPLE})",
+    )
+    animate_parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        metavar="N",
+        help="The number of recursions. (default: the recursions of the example)",
+    )
+    animate_parser.add_argument(
+        "--mode",
+        "-m",
+        choices=("progress", "depth"),
+        default="progress",
+        help="Draw the last generation segment by segment, or a frame per generation. (default: progress)",
+    )
+    animate_parser.add_argument(
+        "--frames", type=int, default=60, help="The number of frames of a progress animation. (default: 60)"
+    )
+    animate_parser.add_argument(
+        "--duration", type=int, default=50, metavar="MS", help="How long every frame is shown. (default: 50)"
+    )
+    animate_parser.add_argument(
+        "--size",
+        "-s",
+        type=parse_size,
+        default=(400, 400),
+        metavar="WxH",
+        help="The frame size in WxH format. (default: 400x400)",
+    )
+    animate_parser.add_argument(
+        "--out", "-o", type=Path, metavar="PATH", help="Where the animation is stored. (default: EXAMPLE.gif)"
+    )
+    animate_parser.add_argument(
+        "--workers", type=int, help="The number of processes rendering the frames. (default: the number of CPUs)"
+    )
+    animate_parser.set_defaults(command=run_animate)
+
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="Render an example with many turning angles and forward steps.",
+        description=run_sweep.__doc__,
+    )
+    sweep_parser.add_argument(
+        "--example",
+        "-e",
+        choices=list(EXAMPLES),
+        default=DEFAULT_EXAMPLE,
+        metavar="NAME",
+        help=f"The example to sweep, one of {', '.join(EXAMPLES)}. (default: {DEFAULT_EXAMPLE})",
+    )
+    sweep_parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        metavar="N",
+        help="The number of recursions. (default: the recursions of the example)",
+    )
+    sweep_parser.add_argument(
+        "--angles",
+        type=parse_values,
+        required=True,
+        metavar="VALUES",
+        help="The turning angles in degrees, START:STOP:COUNT or a comma separated list, e.g. 20:30:11.",
+    )
+    sweep_parser.add_argument(
+        "--steps",
+        type=parse_values,
+        metavar="VALUES",
+        help="The forward steps, START:STOP:COUNT or a comma separated list. (default: the step of the example)",
+    )
+    sweep_parser.add_argument(
+        "--cell",
+        type=parse_size,
+        default=(200, 200),
+        metavar="WxH",
+        help="The size of the drawing of every variant in WxH format. (default: 200x200)",
+    )
+    sweep_parser.add_argument(
+        "--columns", type=int, help="The number of variants per row of the contact sheet. (default: a square grid)"
+    )
+    sweep_parser.add_argument(
+        "--shared-frame",
+        action="store_true",
+        help="Frame all the variants by the same bounding box, so that their sizes can be compared.",
+    )
+    sweep_parser.add_argument(
+        "--out", "-o", type=Path, metavar="PATH", help="Where the contact sheet is stored. (default: EXAMPLE_sweep.png)"
+    )
+    sweep_parser.add_argument(
+        "--out-dir",
+        type=Path,
+        metavar="DIR",
+        help="Store an image of --cell size per variant in DIR instead of a contact sheet.",
+    )
+    sweep_parser.add_argument(
+        "--format", "-f", choices=FORMATS, default="png", help="The format of the images of --out-dir. (default: png)"
+    )
+    sweep_parser.set_defaults(command=run_sweep)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve renders of L-Systems on a local HTTP port.", description=run_serve.__doc__
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1", help="The interface to listen on. (default: 127.0.0.1)")
+    serve_parser.add_argument("--port", type=int, default=8000, help="The port to listen on. (default: 8000)")
+    serve_parser.add_argument(
+        "--workers", type=int, help="The number of processes rendering the images. (default: the number of CPUs)"
+    )
+    serve_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        metavar="MIB",
+        help="The bound of the total size of the cached images in MiB. (default: 256)",
+    )
+    serve_parser.set_defaults(command=run_serve)
+
+    args = parser.parse_args(argv)
+    if args.cprofile and not args.profile:
+        parser.error("--cprofile requires --profile")
+
+    budget = Budget(
+        args.max_symbols,
+        args.max_memory and args.max_memory * 2**20,
+        args.max_seconds,
+        args.max_segments,
+        degrade=True,
+    )
+    profiler = Profiler(HOT_LOOPS if args.cprofile else None)
+    with observe(profiler) if args.profile else nullcontext(), limits(budget):
+        try:
+            args.command(args)
+        except BudgetExceeded as exc:
+            raise SystemExit(f"error: {exc}") from exc
+
+    if args.profile:
+        profiler.write_json(args.profile)
+        print(f"Wrote profiling report to {args.profile}")
+    if args.cprofile:
+        profiler.write_cprofile_stats(args.cprofile)
+        print(f"Wrote cProfile stats to {args.cprofile}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,15 @@
 from abc import ABC, abstractmethod
 from typing import Iterable
 
+import numpy as np
 import tqdm
 
+from l_system import profiling
+from l_system.budget import BYTES, Budget, Governor, GrowthModel, growth_model_cached, resolve
+from l_system.compiler import CompiledGrammar, compile_grammar_cached
+from l_system.run_length import RunLengthState, run_length_grammar_cached
+from l_system.symbol_array import SymbolArray, intern_grammar_cached
+
 
 class Lsystem(ABC):
     """L-Systems need to inherit this ABC."""
@@ -60,12 +67,57 @@ class Lsystem(ABC):
                 values that will be replaced with.
         """
 
+    @property
+    def compiled_grammar(self) -> CompiledGrammar:
+        """
+        Returns:
+            A rewrite function specialized for the `axiom` and `productions` of the L-System, generated once per
+                grammar and cached.
+        """
+        return compile_grammar_cached(self.axiom, tuple(self.productions.items()))
+
+    @property
+    def growth_model(self) -> GrowthModel:
+        """
+        Returns:
+            How the number of occurrences of every symbol changes from one generation to the next, used to check the
+                `Budget` of an expansion before every rewrite.
+        """
+        return growth_model_cached(self.axiom, tuple(self.productions.items()))
+
+    def governor(
+        self, budget: Budget | None = None, resident: bool = True, state: str | np.ndarray | None = None
+    ) -> Governor | None:
+        """
+        Args:
+            budget: The budget of an expansion, defaults to `l_system.budget.default_budget()`.
+            resident: Whether the whole state is held in memory, otherwise `max_bytes` isn't enforced.
+            state: The state the expansion starts from (or its symbol ids), defaults to the `axiom`.
+
+        Returns:
+            The `Governor` enforcing the budget on the expansion, `None` when it is unbounded.
+        """
+        budget = resolve(budget)
+        if not budget.bounded:
+            return None
+        model = self.growth_model
+        return Governor(budget, model, resident, None if state is None else model.count(state))
+
+    @property
+    def rewrite_strategy(self) -> str:
+        """
+        Returns:
+            The strategy the grammar compiler chose for the L-System (`replace`, `gather`, `translate` or
+                `reference`).
+        """
+        return self.compiled_grammar.strategy
+
     @property
     def recursions(self) -> int:
         """How many times to recursively apply the productions rules."""
         return 1
 
-    def apply(self, n: int | None = None, reset_state: bool = True) -> str:
+    def apply(self, n: int | None = None, reset_state: bool = True, budget: Budget | None = None) -> str:
         """
         Apply the production rules iteratively `n` times.
 
@@ -75,23 +127,90 @@ class Lsystem(ABC):
                 `recursions` property.
             reset_state: If set to `True` it will reset the state of the string of symbols to its `axiom` prior to
                 applying any `productions` (rules).
+            budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`.
 
         Returns:
             Returns the updated state of the string symbols after applying the `productions` (rules) `n` times on the
                 string onf symbols.
+
+        Raises:
+            BudgetExceeded: If the next generation would exceed the `budget`, the state is left at the last generation
+                that fits.
         """
         n_recursions = self.recursions if n is None else n
         if reset_state:
             self.reset_state()
-
-        for _ in tqdm.tqdm(range(n_recursions), desc="Applying the L-System production rules."):
-            next_state = []
-            for s in self._state:
-                next_v = self.productions.get(s)
-                next_state += next_v if next_v is not None else s
-            self._state = "".join(next_state)
+        governor = self.governor(budget, state=None if reset_state else self._state)
+
+        rewrite = self.compiled_grammar.rewrite
+        with profiling.span("expansion"):
+            for generation in tqdm.tqdm(range(1, n_recursions + 1), desc="Applying the L-System production rules."):
+                if governor:
+                    governor.before_rewrite(generation)
+                self._state = rewrite(self._state)
+        profiling.count("symbols", len(self._state))
         return self._state
 
+    def apply_array(self, n: int | None = None, budget: Budget | None = None) -> SymbolArray:
+        """
+        Apply the production rules iteratively `n` times on the `axiom`, using a `uint8` array of symbol ids as the
+        state instead of a string. The state of the L-System is not modified.
+
+        Args:
+            n: How many times to apply the `productions` (rules). If set to `None` then the `productions` (rules) will
+                be applied as many times as defined by the `recursions` property.
+            budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`.
+
+        Returns:
+            The state after applying the `productions` (rules) `n` times as a `SymbolArray`.
+
+        Raises:
+            BudgetExceeded: If the next generation would exceed the `budget`.
+        """
+        n_recursions = self.recursions if n is None else n
+        grammar = intern_grammar_cached(self.axiom, tuple(self.productions.items()))
+        state = grammar.encode(self.axiom)
+        governor = self.governor(budget)
+        with profiling.span("expansion"):
+            for generation in tqdm.tqdm(range(1, n_recursions + 1), desc="Applying the L-System production rules."):
+                if governor:
+                    governor.before_rewrite(generation)
+                state = grammar.rewrite(state)
+        profiling.count("symbols", len(state))
+        return state
+
+    def apply_runs(self, n: int | None = None, budget: Budget | None = None) -> RunLengthState:
+        """
+        Apply the production rules iteratively `n` times on the `axiom`, using runs of identical symbols as the state
+        instead of a string. The state of the L-System is not modified.
+
+        Args:
+            n: How many times to apply the `productions` (rules). If set to `None` then the `productions` (rules) will
+                be applied as many times as defined by the `recursions` property.
+            budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`. The runs
+                merge, so the bytes of a generation are only measured after it is rewritten.
+
+        Returns:
+            The state after applying the `productions` (rules) `n` times as a `RunLengthState`.
+
+        Raises:
+            BudgetExceeded: If a generation would exceed the `budget`.
+        """
+        n_recursions = self.recursions if n is None else n
+        productions = tuple(self.productions.items())
+        grammar = run_length_grammar_cached(self.axiom, productions)
+        state = RunLengthState.encode(intern_grammar_cached(self.axiom, productions).encode(self.axiom))
+        governor = self.governor(budget, resident=False)
+        with profiling.span("expansion"):
+            for generation in tqdm.tqdm(range(1, n_recursions + 1), desc="Applying the L-System production rules."):
+                if governor:
+                    governor.before_rewrite(generation)
+                state = grammar.rewrite(state)
+                if governor:
+                    governor.budget.check(BYTES, state.ids.nbytes + state.counts.nbytes, generation)
+        profiling.count("symbols", len(state))
+        return state
+
     def reset_state(self) -> None:
         """Resets the state of the L-System to it's `axiom`."""
         self._state = self.axiom
@@ -0,0 +1,401 @@
+"""
+A benchmark suite of the L-System pipeline.
+
+Every example of `EXAMPLES_MAP` is run at several depths through the following stages:
+
+Stage            What is measured
+   apply         Expanding the axiom with `Lsystem.apply`.
+   bounding_box  Computing the bounding box used to frame the drawing.
+   geometry      Interpreting the state to line segments.
+   export        Rasterizing the segments to a PNG file (headless, with Pillow).
+
+The wall time, symbols per second and peak (Python and NumPy) memory of every stage are appended to a JSON history file
+and compared against the previous run of the history, flagging regressions beyond a threshold. The startup time, i.e.
+how long importing the headless and GUI entry points takes in a fresh interpreter, is measured and reported as well.
+Run it with:
+
+```shell
+$ python -m l_system.benchmark --history benchmark_history.json
+```
+
+The scaling of the parallel geometry (`compute_geometry_parallel`) with the number of worker processes is measured on
+the bracketed examples instead with:
+
+```shell
+$ python -m l_system.benchmark --scaling --workers 1 2 4 8
+```
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from functools import partial
+from pathlib import Path
+from typing import Callable, Sequence
+
+import numpy as np
+
+from l_system.base import Lsystem
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import export_png
+from l_system.rendering.geometry import compute_bounding_box, compute_geometry
+from l_system.rendering.parallel import compute_geometry_parallel
+
+STAGES = ("apply", "bounding_box", "geometry", "export")
+DEFAULT_DEPTH_OFFSETS = (-1, 0, 1)
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_HISTORY = Path("benchmark_history.json")
+STARTUP_MODULES = ("l_system.base", "l_system.registry", "l_system.rendering.export", "l_system.rendering.renderer")
+"""The modules whose import time is measured, from the core to the GUI."""
+SCALING_EXAMPLES = tuple(name for name in EXAMPLES if name.startswith("BracketedOlSystemFig124"))
+"""The bracketed examples the parallel geometry is benchmarked on."""
+DEFAULT_SCALING_DEPTH_OFFSETS = (2, 3)
+DEFAULT_WORKERS = (1, 2, 4)
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """The measurements of one stage of one example at one depth."""
+
+    example: str
+    depth: int
+    stage: str
+    seconds: float
+    """The best wall time of all the repeats."""
+    symbols: int
+    """The length of the expanded state."""
+    symbols_per_second: float
+    peak_bytes: int
+    """The peak memory allocated during the stage, as traced by `tracemalloc`."""
+
+    @property
+    def key(self) -> tuple[str, int, str]:
+        return self.example, self.depth, self.stage
+
+
+@dataclass(frozen=True)
+class Regression:
+    """A stage that got slower than its baseline by more than the threshold."""
+
+    current: BenchmarkResult
+    baseline: BenchmarkResult
+
+    @property
+    def slowdown(self) -> float:
+        """How many times slower the current run is."""
+        return self.current.seconds / self.baseline.seconds
+
+
+@dataclass(frozen=True)
+class ScalingResult:
+    """The parallel geometry of one example at one depth, with one number of workers."""
+
+    example: str
+    depth: int
+    workers: int
+    seconds: float
+    """The best wall time of all the repeats."""
+    segments: int
+    speedup: float
+    """How many times faster than `compute_geometry` in a single process."""
+    max_error: float
+    """The largest difference between a coordinate and the one computed by `compute_geometry`."""
+
+
+def measure(func: Callable[[], object], repeat: int) -> tuple[float, int, object]:
+    """
+    Measures the best wall time of `func` over `repeat` runs, followed by one traced run for its peak memory.
+
+    Args:
+        func: The function to measure.
+        repeat: How many times to time the function.
+
+    Returns:
+        The best wall time in seconds, the peak traced memory in bytes and the result of `func`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def measure_startup(module: str, repeat: int = 3) -> tuple[float, bool]:
+    """
+    Measures how long importing a module takes in a fresh interpreter.
+
+    Args:
+        module: The module to import, e.g. `l_system.base`.
+        repeat: How many interpreters are started, the best time is kept.
+
+    Returns:
+        The best import time in seconds and whether the import pulled in `tkinter`.
+    """
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start, 'tkinter' in sys.modules)"
+    )
+    # The child interpreter must find the same packages, even when this one was started with a modified `sys.path`
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(p for p in sys.path if p)}
+    best, imports_tk = float("inf"), False
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True, env=env
+        ).stdout
+        seconds, imports_tk = output.split()
+        best = min(best, float(seconds))
+    return best, imports_tk == "True"
+
+
+def benchmark_example(
+    name: str,
+    lsystem: Lsystem,
+    turtle_configuration: TurtleConfiguration,
+    depths: Sequence[int],
+    repeat: int = 3,
+    stages: Sequence[str] = STAGES,
+) -> list[BenchmarkResult]:
+    """
+    Benchmarks the stages of one example.
+
+    Args:
+        name: The name of the example.
+        lsystem: The L-System of the example.
+        turtle_configuration: The turtle configuration of the example.
+        depths: The number of recursions to benchmark.
+        repeat: How many times every stage is timed.
+        stages: Which of the `STAGES` to run.
+
+    Returns:
+        The `BenchmarkResult` of every stage at every depth.
+    """
+    for stage in stages:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage '{stage}', expected one of {STAGES}.")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for depth in depths:
+            state = lsystem.apply(depth)
+            funcs = {
+                "apply": partial(lsystem.apply, depth),
+                "bounding_box": partial(compute_bounding_box, state, turtle_configuration),
+                "geometry": partial(compute_geometry, state, turtle_configuration),
+            }
+            if "export" in stages:
+                geometry = compute_geometry(state, turtle_configuration)
+                funcs["export"] = partial(export_png, geometry, turtle_configuration, Path(tmp_dir) / f"{name}.png")
+
+            for stage in stages:
+                seconds, peak, _ = measure(funcs[stage], repeat)
+                results.append(
+                    BenchmarkResult(name, depth, stage, seconds, len(state), len(state) / max(seconds, 1e-12), peak)
+                )
+    return results
+
+
+def benchmark_scaling(
+    name: str,
+    lsystem: Lsystem,
+    turtle_configuration: TurtleConfiguration,
+    depths: Sequence[int],
+    workers: Sequence[int] = DEFAULT_WORKERS,
+    repeat: int = 3,
+) -> list[ScalingResult]:
+    """
+    Benchmarks the parallel geometry of one example against `compute_geometry`.
+
+    Args:
+        name: The name of the example.
+        lsystem: The L-System of the example.
+        turtle_configuration: The turtle configuration of the example.
+        depths: The number of recursions to benchmark.
+        workers: The numbers of worker processes to benchmark.
+        repeat: How many times the geometry is timed.
+
+    Returns:
+        The `ScalingResult` of every number of workers at every depth.
+    """
+    results = []
+    for depth in depths:
+        state = lsystem.apply(depth)
+        serial, _, expected = measure(partial(compute_geometry, state, turtle_configuration), repeat)
+        for count in workers:
+            # The workers are started whatever the size of the state, so every row times the same path
+            seconds, _, geometry = measure(
+                partial(compute_geometry_parallel, state, turtle_configuration, count, min_moves=0), repeat
+            )
+            error = float(np.abs(geometry.segments - expected.segments).max(initial=0.0))
+            results.append(ScalingResult(name, depth, count, seconds, len(geometry), serial / seconds, error))
+    return results
+
+
+def compare(
+    results: Sequence[BenchmarkResult], baseline: Sequence[BenchmarkResult], threshold: float = DEFAULT_THRESHOLD
+) -> list[Regression]:
+    """
+    Compares a run against a baseline run.
+
+    Args:
+        results: The current run.
+        baseline: The baseline run.
+        threshold: The relative slowdown above which a stage is flagged, e.g. `0.25` for 25 % slower.
+
+    Returns:
+        The stages that regressed.
+    """
+    baseline_map = {b.key: b for b in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_map.get(result.key)
+        if previous is not None and result.seconds > previous.seconds * (1 + threshold):
+            regressions.append(Regression(result, previous))
+    return regressions
+
+
+def load_history(path: Path) -> list[dict]:
+    """
+    Loads the previous runs of the benchmark.
+
+    Args:
+        path: The JSON history file.
+
+    Returns:
+        The runs of the history, oldest first. Empty if the file doesn't exist.
+    """
+    if not path.exists():
+        return []
+    with open(path) as fd:
+        return json.load(fd)["runs"]
+
+
+def append_history(path: Path, results: Sequence[BenchmarkResult], startup: dict[str, float] | None = None) -> None:
+    """
+    Appends a run to the history file.
+
+    Args:
+        path: The JSON history file.
+        results: The results of the run.
+        startup: The import time in seconds of the `STARTUP_MODULES`.
+    """
+    runs = load_history(path)
+    runs.append(
+        {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "startup": startup or {},
+            "results": [asdict(r) for r in results],
+        }
+    )
+    with open(path, "w") as fd:
+        json.dump({"runs": runs}, fd, indent=2)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="l_system.benchmark", description="Benchmark the L-System pipeline.")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY, help="The JSON history file.")
+    parser.add_argument("--examples", nargs="*", help="Only run these examples. (default: all)")
+    parser.add_argument(
+        "--depth-offsets",
+        type=int,
+        nargs="+",
+        help=(
+            "Depths to run, relative to the `recursions` of every example."
+            f" (default: {DEFAULT_DEPTH_OFFSETS}, {DEFAULT_SCALING_DEPTH_OFFSETS} with --scaling)"
+        ),
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Which stages to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="How many times every stage is timed.")
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative slowdown flagged as regression."
+    )
+    parser.add_argument("--no-startup", action="store_true", help="Don't measure the startup time.")
+    parser.add_argument("--no-save", action="store_true", help="Don't append this run to the history.")
+    parser.add_argument(
+        "--scaling",
+        action="store_true",
+        help="Benchmark the parallel geometry of the bracketed examples instead, without a history.",
+    )
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=DEFAULT_WORKERS, help="The numbers of workers run with --scaling."
+    )
+    args = parser.parse_args(argv)
+
+    if args.scaling:
+        print(
+            f"{'example':<26} {'depth':>5} {'workers':>7} {'seconds':>10} {'segments':>10} {'speedup':>8} {'error':>8}"
+        )
+        for name in SCALING_EXAMPLES:
+            if args.examples and name not in args.examples:
+                continue
+            lsystem, turtle_configuration = EXAMPLES[name]
+            offsets = args.depth_offsets or DEFAULT_SCALING_DEPTH_OFFSETS
+            depths = sorted({max(lsystem.recursions + offset, 0) for offset in offsets})
+            for r in benchmark_scaling(name, lsystem, turtle_configuration, depths, args.workers, args.repeat):
+                print(
+                    f"{r.example:<26} {r.depth:>5} {r.workers:>7} {r.seconds:>10.5f} {r.segments:>10} "
+                    f"{r.speedup:>7.2f}x {r.max_error:>8.1e}"
+                )
+        return 0
+
+    startup = {}
+    if not args.no_startup:
+        print(f"{'module':<28} {'import seconds':>14} {'tkinter':>8}")
+        for module in STARTUP_MODULES:
+            seconds, imports_tk = measure_startup(module, args.repeat)
+            startup[module] = seconds
+            print(f"{module:<28} {seconds:>14.4f} {'yes' if imports_tk else 'no':>8}")
+        print()
+
+    results = []
+    for name in EXAMPLES:
+        if args.examples and name not in args.examples:
+            continue
+        lsystem, turtle_configuration = EXAMPLES[name]
+        depths = sorted({max(lsystem.recursions + offset, 0) for offset in args.depth_offsets or DEFAULT_DEPTH_OFFSETS})
+        results += benchmark_example(name, lsystem, turtle_configuration, depths, args.repeat, args.stages)
+
+    print(f"{'example':<26} {'depth':>5} {'stage':<12} {'seconds':>10} {'symbols/s':>12} {'peak MiB':>9}")
+    for r in results:
+        print(
+            f"{r.example:<26} {r.depth:>5} {r.stage:<12} {r.seconds:>10.5f} {r.symbols_per_second:>12.0f} "
+            f"{r.peak_bytes / 2**20:>9.2f}"
+        )
+
+    history = load_history(args.history)
+    regressions = []
+    if history:
+        baseline = [BenchmarkResult(**r) for r in history[-1]["results"]]
+        regressions = compare(results, baseline, args.threshold)
+        print(f"\nCompared against the baseline of {history[-1]['timestamp']}: {len(regressions)} regression(s).")
+        for reg in regressions:
+            r = reg.current
+            print(f"REGRESSION {r.example} depth={r.depth} {r.stage}: {reg.slowdown:.2f}x slower")
+
+    if not args.no_save:
+        append_history(args.history, results, startup)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
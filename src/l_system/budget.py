@@ -0,0 +1,297 @@
+"""
+Resource budgets for expanding and interpreting L-Systems. A budget aborts the work before a state or a drawing grows
+too large.
+
+A `Budget` can bound four things:
+
+- the number of symbols of a state,
+- the bytes of a state held in memory,
+- the wall time of a call,
+- the number of segments drawn.
+
+The size of the next generation is predicted before every rewrite. The prediction uses the number of occurrences of
+every symbol in the current generation. The `GrowthModel` of a grammar counts how many of every symbol the successor of
+a symbol contains. The counts of the next generation are then a vector-matrix product over the alphabet, so no symbol of
+the state is touched. When a prediction exceeds the budget, `BudgetExceeded` is raised before the next state is
+allocated.
+
+A budget is passed per call, e.g. `lsystem.apply_array(20, budget=Budget(max_symbols=10**8))`, or set for the whole
+process:
+
+```python
+with limits(Budget(max_bytes=2**30, max_seconds=30)):
+    lsystem.apply()
+```
+
+A call without a budget uses `default_budget()`, which is unbounded unless it was set by `limits` or
+`set_default_budget`. The default budget is a context variable, so the `limits` of concurrent threads (or asyncio
+tasks) don't affect each other. A new thread starts with an unbounded default budget, unless it runs in a copy of the
+context of its creator (`contextvars.copy_context()`).
+"""
+
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+SYMBOLS = "symbols"
+BYTES = "bytes"
+SECONDS = "seconds"
+SEGMENTS = "segments"
+
+SEGMENT_BYTES = 4 * 8
+"""The memory used by a segment of a `Geometry`, four `float64` coordinates."""
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised when expanding or interpreting an L-System would exceed its `Budget`."""
+
+    def __init__(self, resource: str, required: float, limit: float, generation: int | None = None):
+        """
+        Args:
+            resource: The exceeded resource, `symbols`, `bytes`, `seconds` or `segments`.
+            required: How much of the resource the call needs, predicted or measured.
+            limit: The budget of the resource.
+            generation: The generation that would exceed the budget, if it happened while expanding.
+        """
+        self.resource = resource
+        self.required = required
+        self.limit = limit
+        self.generation = generation
+        where = "" if generation is None else f" at generation {generation}"
+        super().__init__(f"the {resource} budget would be exceeded{where}: {required:,} > {limit:,}")
+
+    def __reduce__(self):
+        # Raised in worker processes too, so it must be rebuilt from its attributes when unpickled
+        return type(self), (self.resource, self.required, self.limit, self.generation)
+
+
+@dataclass(frozen=True)
+class Budget:
+    """The resources an expansion or an interpretation may use, `None` for unbounded ones."""
+
+    max_symbols: int | None = None
+    """The maximum number of symbols of a state."""
+    max_bytes: int | None = None
+    """The maximum memory of a state held in memory (or of a geometry). Streamed states are not bound by it, since only
+    chunks of them are ever held in memory."""
+    max_seconds: float | None = None
+    """The maximum wall time of a call, checked between generations and chunks."""
+    max_segments: int | None = None
+    """The maximum number of segments drawn, checked before the state is interpreted."""
+    degrade: bool = False
+    """Callers that have a streaming path take it instead of raising when `max_bytes` would be exceeded, e.g.
+    `l_system.server.render_request` streams the state twice instead of holding its geometry in memory."""
+
+    @property
+    def bounded(self) -> bool:
+        """Whether any resource is bounded."""
+        return any(v is not None for v in (self.max_symbols, self.max_bytes, self.max_seconds, self.max_segments))
+
+    def check(self, resource: str, required: float, generation: int | None = None) -> None:
+        """
+        Checks a resource against the budget.
+
+        Args:
+            resource: `symbols`, `bytes`, `seconds` or `segments`.
+            required: How much of the resource is needed.
+            generation: The generation that needs it, if any.
+
+        Raises:
+            BudgetExceeded: If `required` is over the budget of the resource.
+        """
+        limit = getattr(self, f"max_{resource}")
+        if limit is not None and required > limit:
+            raise BudgetExceeded(resource, required, limit, generation)
+
+
+UNBOUNDED = Budget()
+
+_default_budget: ContextVar[Budget] = ContextVar("default_budget", default=UNBOUNDED)
+
+
+def default_budget() -> Budget:
+    """
+    Returns:
+        The budget of the calls that aren't given one, in the current context.
+    """
+    return _default_budget.get()
+
+
+def set_default_budget(budget: Budget | None) -> None:
+    """
+    Sets the budget of the calls that aren't given one, in the current context.
+
+    Args:
+        budget: The new default budget, `None` to remove all bounds.
+    """
+    _default_budget.set(budget or UNBOUNDED)
+
+
+@contextmanager
+def limits(budget: Budget) -> Iterator[Budget]:
+    """
+    Sets the default budget for the duration of a `with` block.
+
+    Args:
+        budget: The budget of the calls that aren't given one.
+
+    Yields:
+        The budget.
+    """
+    token = _default_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _default_budget.reset(token)
+
+
+def resolve(budget: Budget | None) -> Budget:
+    """
+    Args:
+        budget: The budget of a call, if any.
+
+    Returns:
+        `budget`, or the default one when it's `None`.
+    """
+    return _default_budget.get() if budget is None else budget
+
+
+@dataclass(frozen=True)
+class GrowthModel:
+    """How the number of occurrences of every symbol changes from one generation to the next."""
+
+    symbols: str
+    """The symbol table, row and column `i` of `successors` describe `symbols[i]`."""
+    successors: np.ndarray
+    """A `(k, k)` array, `successors[i, j]` is how many times symbol `j` occurs in the successor of symbol `i`."""
+    axiom: np.ndarray
+    """The `(k,)` number of occurrences of every symbol in the axiom."""
+    bytes_per_symbol: int | None = 1
+    """The memory used by a symbol of the state, `None` if it can't be predicted (e.g. for run-length states)."""
+    exact: bool = True
+    """Whether the predictions are exact, otherwise they are upper bounds (e.g. with conditional productions) and the
+    symbols of the state are counted again before every generation."""
+
+    def step(self, counts: np.ndarray) -> np.ndarray:
+        """
+        Predicts the next generation.
+
+        Args:
+            counts: The number of occurrences of every symbol in a generation.
+
+        Returns:
+            The number of occurrences of every symbol in the next generation.
+        """
+        # Python integers, so that predictions of huge generations don't overflow
+        return counts.astype(object) @ self.successors.astype(object)
+
+    def count(self, state: str | np.ndarray) -> np.ndarray:
+        """
+        Args:
+            state: A string of symbols, or the symbol ids of a state.
+
+        Returns:
+            The number of occurrences of every symbol.
+        """
+        if isinstance(state, str):
+            return np.array([state.count(s) for s in self.symbols], dtype=np.int64)
+        return np.bincount(state, minlength=len(self.symbols))
+
+
+def growth_model(axiom: str, productions: dict[str, str]) -> GrowthModel:
+    """
+    Builds the growth model of a grammar. Like the rewrite loop of `Lsystem.apply`, only single symbol predecessors
+    are rewritten.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System.
+
+    Returns:
+        The exact `GrowthModel` of the grammar.
+    """
+    productions = {k: v for k, v in productions.items() if isinstance(k, str) and len(k) == 1}
+    symbols = "".join(sorted(set(axiom).union(*productions.values(), productions)))
+    index = {s: i for i, s in enumerate(symbols)}
+    successors = np.eye(len(symbols), dtype=np.int64)
+    for symbol, successor in productions.items():
+        successors[index[symbol]] = 0
+        for s in successor:
+            successors[index[symbol], index[s]] += 1
+    counts = np.zeros(len(symbols), dtype=np.int64)
+    for s in axiom:
+        counts[index[s]] += 1
+    return GrowthModel(symbols, successors, counts)
+
+
+@functools.lru_cache(maxsize=None)
+def growth_model_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> GrowthModel:
+    """
+    Same as `growth_model`, but the model is built only once per grammar.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System as `(symbol, successor)` pairs.
+
+    Returns:
+        The `GrowthModel` of the grammar.
+    """
+    return growth_model(axiom, dict(productions))
+
+
+class Governor:
+    """Enforces a budget on one expansion, generation by generation."""
+
+    def __init__(self, budget: Budget, model: GrowthModel, resident: bool = True, counts: np.ndarray | None = None):
+        """
+        Args:
+            budget: The budget of the expansion.
+            model: The growth model of the grammar.
+            resident: Whether the whole state is held in memory, otherwise `max_bytes` isn't enforced.
+            counts: The number of occurrences of every symbol in the state the expansion starts from, defaults to the
+                ones of the axiom.
+        """
+        self.budget = budget
+        self.model = model
+        self.predicts = budget.max_symbols is not None or (resident and budget.max_bytes is not None)
+        self.resident = resident
+        self.counts = model.axiom if counts is None else counts
+        self.start = time.monotonic()
+
+    def check_time(self, generation: int | None = None) -> None:
+        """
+        Args:
+            generation: The last generation that was rewritten, if any.
+
+        Raises:
+            BudgetExceeded: If the call is past its wall time budget.
+        """
+        if self.budget.max_seconds is not None:
+            self.budget.check(SECONDS, round(time.monotonic() - self.start, 3), generation)
+
+    def before_rewrite(self, generation: int, ids: np.ndarray | None = None) -> None:
+        """
+        Checks the predicted size of a generation before it is rewritten from the previous one.
+
+        Args:
+            generation: The generation about to be rewritten.
+            ids: The symbol ids of the previous generation, needed when the predictions of the model aren't exact.
+
+        Raises:
+            BudgetExceeded: If rewriting the generation would exceed the budget.
+        """
+        self.check_time(generation - 1)
+        if not self.predicts:
+            return
+        if not self.model.exact and ids is not None:
+            self.counts = self.model.count(ids)
+        self.counts = self.model.step(self.counts)
+        symbols = int(self.counts.sum())
+        self.budget.check(SYMBOLS, symbols, generation)
+        if self.resident and self.model.bytes_per_symbol is not None:
+            self.budget.check(BYTES, symbols * self.model.bytes_per_symbol, generation)
@@ -0,0 +1,100 @@
+"""
+A least recently used cache bounded by the total size of its values, rather than by their number. It keeps the
+expanded states of `l_system.expansion.ExpansionCache` and the rendered images of `l_system.server.ResultCache`.
+
+```python
+cache = BoundedCache(max_bytes=2**20, sizeof=len)
+cache.put("koch", b"...")
+data = cache.get("koch")
+```
+"""
+
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Iterator, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+DEFAULT_CACHE_BYTES = 256 * 2**20
+"""The default bound of the total size of the cached values."""
+
+
+class BoundedCache(Generic[K, V]):
+    """
+    A least recently used cache, bounded by the total size of its values in bytes. It isn't thread-safe, the callers
+    sharing it between threads hold their own lock.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, sizeof: Callable[[V], int] = len):
+        """
+        Args:
+            max_bytes: The bound of the total size of the cached values, the least recently used ones are evicted.
+            sizeof: Returns the size of a value in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._sizeof = sizeof
+        self._values: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._values
+
+    def __iter__(self) -> Iterator[K]:
+        """Iterate over the keys, from the least to the most recently used."""
+        return iter(self._values)
+
+    def get(self, key: K) -> V | None:
+        """
+        Args:
+            key: The key of the value.
+
+        Returns:
+            The cached value, which becomes the most recently used one, `None` if it isn't cached.
+        """
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+        return value
+
+    def peek(self, key: K) -> V | None:
+        """
+        Args:
+            key: The key of the value.
+
+        Returns:
+            The cached value without marking it as used, `None` if it isn't cached.
+        """
+        return self._values.get(key)
+
+    def put(self, key: K, value: V) -> int:
+        """
+        Caches a value, unless it's already cached or larger than the whole cache.
+
+        Args:
+            key: The key of the value.
+            value: The value.
+
+        Returns:
+            The number of least recently used values evicted to make room for it.
+        """
+        nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes or key in self._values:
+            return 0
+        self._values[key] = value
+        self.size += nbytes
+        evicted = 0
+        while self.size > self.max_bytes:
+            _, oldest = self._values.popitem(last=False)
+            self.size -= self._sizeof(oldest)
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def clear(self) -> None:
+        """Evicts all the values, they aren't counted as evictions."""
+        self._values.clear()
+        self.size = 0
@@ -0,0 +1,166 @@
+"""
+Grammar-specialized rewriting of L-Systems.
+
+The reference rewrite loop of `Lsystem.apply` looks up every symbol of the state in the `productions` dictionary. Most
+grammars have only one or two symbols that are rewritten, so the grammar compiler inspects the `axiom`, `productions`
+and `constants` of an L-System and generates a rewrite function with one of the following strategies:
+
+Strategy         When
+   replace       At most `MAX_REPLACE_SYMBOLS` rewritten symbols: chained `str.replace` calls (memcpy speed).
+   gather        A byte sized alphabet: a NumPy gather from a flattened table of successors.
+   translate     Any other single character alphabet: a `str.translate` table.
+   reference     Unusual grammars (e.g. multi-character predecessors): the reference loop of `Lsystem.apply`.
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+REPLACE = "replace"
+GATHER = "gather"
+TRANSLATE = "translate"
+REFERENCE = "reference"
+
+MAX_REPLACE_SYMBOLS = 4
+"""Above this many rewritten symbols the chained `str.replace` passes get slower than a single table pass."""
+
+
+@dataclass(frozen=True)
+class CompiledGrammar:
+    """A rewrite function generated for a specific grammar."""
+
+    strategy: str
+    """The strategy that was chosen for the grammar, one of `replace`, `gather`, `translate` or `reference`."""
+    source: str
+    """The source code of the generated `rewrite` function."""
+    rewrite: Callable[[str], str]
+    """Applies the production rules once on a state."""
+
+
+def reference_rewrite(state: str, productions: dict[str, str]) -> str:
+    """
+    Applies the `productions` once on a state by looking up every symbol.
+
+    Args:
+        state: The current state (string of symbols) of the L-System.
+        productions: The production rules of the L-System.
+
+    Returns:
+        The next state of the L-System.
+    """
+    next_state = []
+    for s in state:
+        next_v = productions.get(s)
+        next_state += next_v if next_v is not None else s
+    return "".join(next_state)
+
+
+def gather_table(productions: dict[str, str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flattens the production rules of a byte sized alphabet to a table of successors.
+
+    Args:
+        productions: The production rules, keys and values must be encodable to `latin-1`.
+
+    Returns:
+        The successor length and the successor offset in the table for each of the 256 symbol ids, followed by the
+            flattened table itself. Symbols without a production are their own successor.
+    """
+    lengths = np.ones(256, dtype=np.int64)
+    starts = np.arange(256, dtype=np.int64)
+    table = bytearray(range(256))
+    for symbol, successor in productions.items():
+        starts[ord(symbol)] = len(table)
+        lengths[ord(symbol)] = len(successor)
+        table += successor.encode('latin-1')
+    return lengths, starts, np.frombuffer(bytes(table), dtype=np.uint8)
+
+
+def gather_rewrite(ids: np.ndarray, lengths: np.ndarray, starts: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """
+    Rewrites an array of symbol ids with a vectorized gather: no Python loop runs over the symbols.
+
+    Args:
+        ids: The current state as an array of symbol ids.
+        lengths: The successor length of every symbol id.
+        starts: The offset of the successor of every symbol id in `table`.
+        table: The flattened successors.
+
+    Returns:
+        The next state as an array of symbol ids.
+    """
+    successor_lengths = lengths[ids]
+    ends = np.cumsum(successor_lengths)
+    if not len(ends):
+        return table[:0]
+    # Output position `j` of a successor copies `table[starts[id] + j - offset]`, where `offset` is where it begins.
+    shifts = np.repeat(starts[ids] - (ends - successor_lengths), successor_lengths)
+    return table[shifts + np.arange(ends[-1], dtype=np.int64)]
+
+
+def _placeholders(count: int, used: set[str]) -> list[str]:
+    candidates = (chr(c) for c in range(0x110000) if chr(c) not in used)
+    return [next(candidates) for _ in range(count)]
+
+
+def compile_grammar(axiom: str, productions: dict[str, str]) -> CompiledGrammar:
+    """
+    Generates a rewrite function specialized for a grammar.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System.
+
+    Returns:
+        The `CompiledGrammar`, see the module documentation for the strategies.
+    """
+    namespace: dict = {'np': np, 'gather_rewrite': gather_rewrite, 'reference_rewrite': reference_rewrite}
+    is_usual = all(isinstance(k, str) and len(k) == 1 and isinstance(v, str) for k, v in productions.items())
+    rewritten = {k: v for k, v in productions.items() if k != v} if is_usual else {}
+    used = set(axiom).union(*productions.values(), productions) if is_usual else set()
+
+    if not rewritten:
+        strategy = REFERENCE
+        namespace['PRODUCTIONS'] = productions
+        body = ["    return reference_rewrite(state, PRODUCTIONS)"]
+    elif len(rewritten) <= MAX_REPLACE_SYMBOLS:
+        # Park all but the last rewritten symbol on placeholders so that successors are never rewritten twice.
+        strategy = REPLACE
+        *parked, (last, last_successor) = rewritten.items()
+        placeholders = _placeholders(len(parked), used)
+        calls = [f".replace({s!r}, {p!r})" for (s, _), p in zip(parked, placeholders)]
+        calls.append(f".replace({last!r}, {last_successor!r})")
+        calls += [f".replace({p!r}, {successor!r})" for (_, successor), p in zip(parked, placeholders)]
+        body = ["    return state" + "".join(calls)]
+    elif all(ord(s) < 256 for s in used):
+        strategy = GATHER
+        namespace['LENGTHS'], namespace['STARTS'], namespace['TABLE'] = gather_table(rewritten)
+        body = [
+            "    ids = np.frombuffer(state.encode('latin-1'), dtype=np.uint8)",
+            "    return gather_rewrite(ids, LENGTHS, STARTS, TABLE).tobytes().decode('latin-1')",
+        ]
+    else:
+        strategy = TRANSLATE
+        namespace['TABLE'] = str.maketrans(rewritten)
+        body = ["    return state.translate(TABLE)"]
+
+    source = "\n".join([f"def rewrite(state):  # strategy: {strategy}"] + body) + "\n"
+    exec(compile(source, f"<{strategy} rewrite>", "exec"), namespace)  # noqa: S102
+    return CompiledGrammar(strategy, source, namespace['rewrite'])
+
+
+@functools.lru_cache(maxsize=None)
+def compile_grammar_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> CompiledGrammar:
+    """
+    Same as `compile_grammar`, but the rewrite function is generated only once per grammar.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System as `(symbol, successor)` pairs.
+
+    Returns:
+        The `CompiledGrammar` of the grammar.
+    """
+    return compile_grammar(axiom, dict(productions))
@@ -0,0 +1,183 @@
+"""
+Immutable expansion results of L-Systems, shared between threads.
+
+`Lsystem.apply` stores the expanded state on the instance. The examples of `l_system.registry.EXAMPLES` are singletons,
+so two renders of the same example (e.g. the GUI and an exporter thread) overwrite each other's state. `expand` never
+modifies the L-System. It returns an `Expansion` whose arrays are read-only and keeps it in a thread-safe
+`ExpansionCache`, keyed by the fingerprint of the grammar and the depth:
+
+- A thread asking for an expansion that another thread is computing waits for it, instead of computing it again.
+- A deeper expansion continues from the deepest cached generation of the same grammar.
+
+```python
+lsystem, turtle_conf = EXAMPLES['DragonCurve']
+expansion = expand(lsystem, 16)
+geometry = compute_geometry(expansion.state, turtle_conf)
+```
+"""
+
+import dataclasses
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from l_system.base import Lsystem
+from l_system.budget import Budget
+from l_system.cache import DEFAULT_CACHE_BYTES, BoundedCache
+from l_system.parametric import Module, ModuleStream
+from l_system.serialization import grammar_fingerprint
+from l_system.streaming import iter_generations
+from l_system.symbol_array import SymbolArray
+
+
+@dataclass(frozen=True)
+class Expansion:
+    """The state of an L-System after `depth` recursions. Its arrays are read-only, so it can be shared."""
+
+    state: SymbolArray | ModuleStream
+    """The expanded state, `ModuleStream` for parametric L-Systems."""
+    depth: int
+    """The number of recursions."""
+    fingerprint: bytes
+    """The `grammar_fingerprint` of the L-System."""
+
+    def __len__(self) -> int:
+        """Returns the number of symbols (modules) of the state."""
+        return len(self.state)
+
+    def __iter__(self) -> Iterable[str | Module]:
+        """Iterate over the symbols, or the `(symbol, parameters)` modules of parametric L-Systems."""
+        yield from self.state
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the state."""
+        return self.state.nbytes
+
+
+def _freeze(state: SymbolArray | ModuleStream) -> SymbolArray | ModuleStream:
+    """Makes the arrays of a state read-only, they are never written once rewritten."""
+    for f in dataclasses.fields(state):
+        value = getattr(state, f.name)
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+    return state
+
+
+class ExpansionCache:
+    """
+    A thread-safe, least recently used cache of expansions, bounded by the total size of their states. Concurrent
+    requests for the same expansion are computed once.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            max_bytes: The bound of the total size of the cached states, the least recently used ones are evicted.
+        """
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._expansions: BoundedCache[tuple[bytes, int], Expansion] = BoundedCache(max_bytes, lambda e: e.nbytes)
+        self._in_flight: dict[tuple[bytes, int], Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._expansions)
+
+    def __contains__(self, key: tuple[bytes, int]) -> bool:
+        return key in self._expansions
+
+    @property
+    def max_bytes(self) -> int:
+        """The bound of the total size of the cached states."""
+        return self._expansions.max_bytes
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached states."""
+        return self._expansions.size
+
+    def clear(self) -> None:
+        """Evicts all the expansions, the ones being computed are not cached."""
+        with self._lock:
+            self._expansions.clear()
+
+    def expand(self, lsystem: Lsystem, n: int | None = None, budget: Budget | None = None) -> Expansion:
+        """
+        Expands an L-System without modifying it, unless the expansion is cached or being computed by another thread.
+
+        Args:
+            lsystem: The L-System to expand.
+            n: The number of recursions, defaults to `lsystem.recursions`.
+            budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`. A coalesced
+                request shares the result, or the error, of the request computing it.
+
+        Returns:
+            The `Expansion`.
+
+        Raises:
+            BudgetExceeded: If the expansion would exceed the `budget`.
+        """
+        n = lsystem.recursions if n is None else n
+        fingerprint = grammar_fingerprint(lsystem.axiom, lsystem.productions)
+        key = (fingerprint, n)
+        with self._lock:
+            expansion = self._expansions.get(key)
+            if expansion is not None:
+                self.counters["hits"] += 1
+                return expansion
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+            else:
+                self.counters["misses"] += 1
+                self._in_flight[key] = owned = Future()
+                start = self._deepest(fingerprint, n)
+        if future is not None:
+            return future.result()
+
+        try:
+            # The lock isn't held while rewriting, so other expansions go on
+            resume = None if start is None else (start.depth, start.state)
+            *_, (depth, state) = iter_generations(lsystem, n, budget, resume)
+            expansion = Expansion(_freeze(state), depth, fingerprint)
+        except BaseException as exc:
+            with self._lock:
+                del self._in_flight[key]
+            owned.set_exception(exc)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self.counters["evictions"] += self._expansions.put(key, expansion)
+        owned.set_result(expansion)
+        return expansion
+
+    def _deepest(self, fingerprint: bytes, n: int) -> Expansion | None:
+        """The deepest cached expansion of a grammar not deeper than `n`, the lock must be held."""
+        depths = [depth for f, depth in self._expansions if f == fingerprint and depth < n]
+        return self._expansions.peek((fingerprint, max(depths))) if depths else None
+
+
+EXPANSIONS = ExpansionCache()
+"""The cache shared by the calls of `expand`."""
+
+
+def expand(lsystem: Lsystem, n: int | None = None, budget: Budget | None = None) -> Expansion:
+    """
+    Expands an L-System without modifying it, sharing the result through `EXPANSIONS` (see
+    `ExpansionCache.expand`).
+
+    Args:
+        lsystem: The L-System to expand.
+        n: The number of recursions, defaults to `lsystem.recursions`.
+        budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`.
+
+    Returns:
+        The `Expansion`.
+
+    Raises:
+        BudgetExceeded: If the expansion would exceed the `budget`.
+    """
+    return EXPANSIONS.expand(lsystem, n, budget)
@@ -0,0 +1,442 @@
+"""
+Parametric L-Systems, where every symbol (module) may carry numeric parameters, e.g. `F(l) -> F(l*0.5)[+F(l*0.7)]`.
+
+Production rules are written as a dictionary, just like for `Lsystem`, where the keys are the predecessor modules with
+an optional condition after a `:` and the values are the successor modules:
+
+```python
+productions = {
+    'A(l) : l >= 1': 'F(l)[+(30)A(l*0.6)][-(30)A(l*0.6)]',
+}
+```
+
+The rules are compiled once per grammar into a generated Python function that rewrites all the modules of a
+generation at once with NumPy, so the parameter expressions are never interpreted module by module. The state is kept
+in a columnar `ModuleStream` (symbol ids plus parameter arrays) instead of a list of module objects.
+"""
+
+import ast
+import functools
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+import numpy as np
+import tqdm
+
+from l_system import profiling
+from l_system.base import Lsystem
+from l_system.budget import Budget, GrowthModel
+
+Module = tuple[str, tuple[float, ...]]
+
+_NUMPY_FUNCTIONS = {
+    'sin': 'np.sin',
+    'cos': 'np.cos',
+    'tan': 'np.tan',
+    'asin': 'np.arcsin',
+    'acos': 'np.arccos',
+    'atan': 'np.arctan',
+    'sqrt': 'np.sqrt',
+    'exp': 'np.exp',
+    'log': 'np.log',
+    'abs': 'np.abs',
+    'floor': 'np.floor',
+    'ceil': 'np.ceil',
+}
+_NUMPY_CONSTANTS = {'pi': 'np.pi', 'e': 'np.e'}
+
+
+@dataclass(frozen=True)
+class ModuleStream:
+    """A columnar string of parametric modules."""
+
+    symbols: str
+    """The symbol table, the symbol of module `i` is `symbols[ids[i]]`."""
+    ids: np.ndarray
+    """A `(n,)` array with the symbol id of every module."""
+    arity: np.ndarray
+    """A `(n,)` array with the number of parameters of every module."""
+    params: np.ndarray
+    """A `(n, max_arity)` float array with the parameters of every module, unused columns are `NaN`."""
+
+    def __len__(self) -> int:
+        """Returns the number of modules."""
+        return len(self.ids)
+
+    def __iter__(self) -> Iterable[Module]:
+        """Iterate over the modules as `(symbol, parameters)` tuples."""
+        for i, a, p in zip(self.ids.tolist(), self.arity.tolist(), self.params.tolist()):
+            yield self.symbols[i], tuple(p[:a])
+
+    def __getitem__(self, index: slice) -> "ModuleStream":
+        """Returns a slice of the modules, sharing their arrays."""
+        return ModuleStream(self.symbols, self.ids[index], self.arity[index], self.params[index])
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the symbol ids and the parameters."""
+        return self.ids.nbytes + self.arity.nbytes + self.params.nbytes
+
+    def __str__(self) -> str:
+        return "".join(s if not p else f"{s}({','.join(f'{v:g}' for v in p)})" for s, p in self)
+
+
+@dataclass(frozen=True)
+class CompiledProductions:
+    """Production rules compiled to a Python function that rewrites a whole `ModuleStream` at once."""
+
+    symbols: str
+    """The symbol table of the grammar."""
+    axiom: ModuleStream
+    """The parsed axiom."""
+    source: str
+    """The source code of the generated `rewrite` function."""
+    rewrite: Callable[[ModuleStream], ModuleStream]
+    """Applies the production rules once on a `ModuleStream`."""
+
+
+def split_modules(text: str) -> list[tuple[str, list[str]]]:
+    """
+    Splits a string of modules to symbols and their (unparsed) parameter expressions.
+
+    Args:
+        text: A string of modules, e.g. `F(l*0.5)[+F(l*0.7)]`.
+
+    Returns:
+        A list of `(symbol, expressions)` tuples.
+
+    Raises:
+        ValueError: If the parentheses of `text` are not balanced.
+    """
+    modules = []
+    i = 0
+    while i < len(text):
+        symbol = text[i]
+        i += 1
+        if symbol.isspace():
+            continue
+        if symbol in '()':
+            raise ValueError(f"Unexpected '{symbol}' in '{text}'.")
+        expressions = []
+        if i < len(text) and text[i] == '(':
+            nesting, start = 0, i + 1
+            for j in range(i, len(text)):
+                if text[j] == '(':
+                    nesting += 1
+                elif text[j] == ')':
+                    nesting -= 1
+                elif text[j] == ',' and nesting == 1:
+                    expressions.append(text[start:j].strip())
+                    start = j + 1
+                if nesting == 0:
+                    expressions.append(text[start:j].strip())
+                    i = j + 1
+                    break
+            else:
+                raise ValueError(f"Unbalanced parentheses in '{text}'.")
+        modules.append((symbol, expressions))
+    return modules
+
+
+class _ExpressionTranslator(ast.NodeTransformer):
+    """Translates a parameter expression to NumPy code operating on whole parameter columns."""
+
+    def __init__(self, variables: dict[str, str]):
+        self.variables = variables
+
+    def generic_visit(self, node: ast.AST) -> ast.AST:
+        allowed = (
+            ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.Call, ast.Name, ast.Constant,
+            ast.operator, ast.unaryop, ast.cmpop, ast.boolop, ast.Load,
+        )  # fmt: skip
+        if not isinstance(node, allowed):
+            raise ValueError(f"Unsupported expression: '{ast.unparse(node)}'.")
+        return super().generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in self.variables:
+            return ast.Name(self.variables[node.id], ast.Load())
+        if node.id in _NUMPY_CONSTANTS:
+            return ast.parse(_NUMPY_CONSTANTS[node.id], mode='eval').body
+        raise ValueError(f"Unknown name '{node.id}'.")
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if not isinstance(node.func, ast.Name) or node.func.id not in _NUMPY_FUNCTIONS or node.keywords:
+            raise ValueError(f"Unsupported function call: '{ast.unparse(node)}'.")
+        func = ast.parse(_NUMPY_FUNCTIONS[node.func.id], mode='eval').body
+        return ast.Call(func, [self.visit(arg) for arg in node.args], [])
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> ast.AST:
+        if isinstance(node.op, ast.Not):
+            return _numpy_call('logical_not', [self.visit(node.operand)])
+        return self.generic_visit(node)
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> ast.AST:
+        func = 'logical_and' if isinstance(node.op, ast.And) else 'logical_or'
+        values = [self.visit(v) for v in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = _numpy_call(func, [result, value])
+        return result
+
+    def visit_Compare(self, node: ast.Compare) -> ast.AST:
+        # NumPy arrays can't be chained, `a < b < c` becomes `logical_and(a < b, b < c)`.
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        result = None
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            comparison = ast.Compare(left, [op], [right])
+            result = comparison if result is None else _numpy_call('logical_and', [result, comparison])
+        return result
+
+
+def _numpy_call(func: str, args: list[ast.AST]) -> ast.Call:
+    return ast.Call(ast.Attribute(ast.Name('np', ast.Load()), func, ast.Load()), args, [])
+
+
+def translate_expression(expression: str, variables: dict[str, str]) -> str:
+    """
+    Translates a parameter expression to NumPy source code.
+
+    Args:
+        expression: A Python arithmetic expression, e.g. `l * 0.5` or `l > 1 and w < 2`.
+        variables: Maps the formal parameters used in the expression to the names of their columns.
+
+    Returns:
+        The source code of the translated expression.
+
+    Raises:
+        ValueError: If the expression uses unknown names or unsupported syntax.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid expression: '{expression}'.") from exc
+    return ast.unparse(_ExpressionTranslator(variables).visit(tree))
+
+
+def _parse_predecessor(predecessor: str) -> tuple[str, list[str], str | None]:
+    """Parses a predecessor such as `F(l, w) : l > 1` to its symbol, formal parameters and condition."""
+    module, _, condition = predecessor.partition(':')
+    modules = split_modules(module)
+    if len(modules) != 1:
+        raise ValueError(f"A predecessor must be a single module, got: '{predecessor}'.")
+    symbol, formals = modules[0]
+    for formal in formals:
+        if not formal.isidentifier():
+            raise ValueError(f"Formal parameters must be names, got '{formal}' in '{predecessor}'.")
+    return symbol, formals, condition.strip() or None
+
+
+def _pack(symbols: str, modules: list[tuple[str, list[float]]], width: int) -> ModuleStream:
+    index = {s: i for i, s in enumerate(symbols)}
+    ids = np.array([index[s] for s, _ in modules], dtype=np.uint8 if len(symbols) <= 256 else np.int32)
+    arity = np.array([len(p) for _, p in modules], dtype=np.uint8)
+    params = np.full((len(modules), width), np.nan)
+    for i, (_, p) in enumerate(modules):
+        params[i, : len(p)] = p
+    return ModuleStream(symbols, ids, arity, params)
+
+
+def compile_productions(axiom: str, productions: dict[str, str]) -> CompiledProductions:
+    """
+    Compiles parametric production rules to a Python function that rewrites whole generations with NumPy.
+
+    Rules are matched by symbol and number of parameters. When more than one rule matches a module, the first one
+    whose condition holds is applied; modules without a matching rule are copied unchanged.
+
+    Args:
+        axiom: The initial string of modules, parameters must be constant expressions.
+        productions: A dictionary of the production rules, e.g. `{'F(l) : l > 1': 'F(l*0.5)[+F(l*0.7)]'}`.
+
+    Returns:
+        The `CompiledProductions` of the grammar.
+
+    Raises:
+        ValueError: If the axiom or the production rules can't be parsed.
+    """
+    axiom_modules = split_modules(axiom)
+    rules = []
+    for predecessor, successor in productions.items():
+        symbol, formals, condition = _parse_predecessor(predecessor)
+        rules.append((predecessor, symbol, formals, condition, split_modules(successor)))
+
+    used = {s for s, _ in axiom_modules}
+    for _, symbol, _, _, successor in rules:
+        used |= {symbol} | {s for s, _ in successor}
+    symbols = "".join(sorted(used))
+    arities = [len(p) for _, p in axiom_modules] + [len(e) for r in rules for _, e in r[4]]
+    width = max(arities + [len(r[2]) for r in rules] + [0])
+
+    # Parse the axiom by evaluating its (constant) parameter expressions.
+    axiom_values = [
+        (s, [float(eval(translate_expression(e, {}), {'np': np})) for e in p]) for s, p in axiom_modules  # noqa: S307
+    ]
+
+    lines = [
+        "def rewrite(stream):",
+        "    ids, arity, params = stream.ids, stream.arity, stream.params",
+        "    free = np.ones(len(ids), dtype=bool)",
+        "    counts = np.ones(len(ids), dtype=np.int64)",
+    ]
+    for r, (predecessor, symbol, formals, condition, successor) in enumerate(rules):
+        variables = {f: f"p{r}_{f}" for f in formals}
+        lines.append(f"    # {predecessor} -> {productions[predecessor]}")
+        lines.append(
+            f"    idx{r} = np.flatnonzero(free & (ids == {symbols.index(symbol)}) & (arity == {len(formals)}))"
+        )
+        if condition:
+            lines.extend(f"    {v} = params[idx{r}, {j}]" for j, v in enumerate(variables.values()))
+            cond = translate_expression(condition, variables)
+            lines.append(f"    idx{r} = idx{r}[np.broadcast_to(np.asarray({cond}, dtype=bool), idx{r}.shape)]")
+        lines.append(f"    free[idx{r}] = False")
+        lines.append(f"    counts[idx{r}] = {len(successor)}")
+
+    lines += [
+        "    offsets = np.cumsum(counts) - counts",
+        "    total = int(counts.sum())",
+        "    out_ids = np.empty(total, dtype=ids.dtype)",
+        "    out_arity = np.empty(total, dtype=arity.dtype)",
+        "    out_params = np.full((total, params.shape[1]), np.nan)",
+        "    o = offsets[free]",
+        "    out_ids[o] = ids[free]",
+        "    out_arity[o] = arity[free]",
+        "    out_params[o] = params[free]",
+    ]
+    for r, (_, _, formals, _, successor) in enumerate(rules):
+        variables = {f: f"p{r}_{f}" for f in formals}
+        lines.append(f"    o = offsets[idx{r}]")
+        lines.extend(f"    {v} = params[idx{r}, {j}]" for j, v in enumerate(variables.values()))
+        for k, (s, expressions) in enumerate(successor):
+            lines.append(f"    out_ids[o + {k}] = {symbols.index(s)}")
+            lines.append(f"    out_arity[o + {k}] = {len(expressions)}")
+            for j, e in enumerate(expressions):
+                lines.append(f"    out_params[o + {k}, {j}] = {translate_expression(e, variables)}")
+    lines.append("    return ModuleStream(stream.symbols, out_ids, out_arity, out_params)")
+
+    source = "\n".join(lines) + "\n"
+    namespace = {'np': np, 'ModuleStream': ModuleStream}
+    exec(compile(source, "<parametric productions>", "exec"), namespace)  # noqa: S102
+    return CompiledProductions(symbols, _pack(symbols, axiom_values, width), source, namespace['rewrite'])
+
+
+@functools.lru_cache(maxsize=None)
+def _compile_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> CompiledProductions:
+    return compile_productions(axiom, dict(productions))
+
+
+@functools.lru_cache(maxsize=None)
+def _growth_model_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> GrowthModel:
+    """
+    An upper bound of the growth of a parametric grammar: a symbol may be rewritten by any of its rules, or by none if
+    their conditions fail, so every successor count is the largest of its alternatives.
+    """
+    compiled = _compile_cached(axiom, productions)
+    symbols = compiled.symbols
+    successors = np.eye(len(symbols), dtype=np.int64)
+    for predecessor, successor in productions:
+        counts = np.zeros(len(symbols), dtype=np.int64)
+        for s, _ in split_modules(successor):
+            counts[symbols.index(s)] += 1
+        row = symbols.index(_parse_predecessor(predecessor)[0])
+        successors[row] = np.maximum(successors[row], counts)
+    stream = compiled.axiom
+    bytes_per_module = stream.ids.itemsize + stream.arity.itemsize + stream.params.shape[1] * stream.params.itemsize
+    return GrowthModel(symbols, successors, np.bincount(stream.ids, minlength=len(symbols)), bytes_per_module, False)
+
+
+class ParametricLsystem(Lsystem):
+    """Parametric L-Systems need to inherit this ABC, `productions` keys may hold a condition after a `:`."""
+
+    _state: ModuleStream
+
+    def __init__(self):
+        self._state = self.compiled.axiom
+
+    @property
+    def compiled(self) -> CompiledProductions:
+        """
+        Returns:
+            The production rules compiled to Python code, compiled once per grammar.
+        """
+        return _compile_cached(self.axiom, tuple(self.productions.items()))
+
+    @property
+    def growth_model(self) -> GrowthModel:
+        """
+        Returns:
+            An upper bound of the growth of the L-System, the modules are counted again before every rewrite.
+        """
+        return _growth_model_cached(self.axiom, tuple(self.productions.items()))
+
+    @property
+    def rewrite_strategy(self) -> str:
+        """
+        Returns:
+            Parametric L-Systems are always rewritten by their compiled production rules.
+        """
+        return "parametric"
+
+    @property
+    def state(self) -> ModuleStream:
+        """
+        Returns:
+            The current state of the L-System as a `ModuleStream`.
+        """
+        return self._state
+
+    @property
+    def alphabet(self) -> str:
+        """
+        Returns:
+            The symbols of the L-System that are rewritten by the `productions` (rules).
+        """
+        return "".join(dict.fromkeys(_parse_predecessor(p)[0] for p in self.productions))
+
+    @property
+    def constants(self) -> str:
+        """
+        Returns:
+            The symbols of the L-System that cannot be replaced by the production rules.
+        """
+        alphabet = self.alphabet
+        return "".join(s for s in self.compiled.symbols if s not in alphabet)
+
+    def apply(self, n: int | None = None, reset_state: bool = True, budget: Budget | None = None) -> ModuleStream:
+        """
+        Apply the compiled production rules iteratively `n` times.
+
+        Args:
+            n: How many times to apply the `productions` (rules) on the L-System's state. If set to `None` then the
+                `productions` (rules) will be applied as many times as defined by the `recursions` property.
+            reset_state: If set to `True` it will reset the state of the L-System to its `axiom` prior to applying any
+                `productions` (rules).
+            budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`.
+
+        Returns:
+            Returns the updated state of the L-System as a `ModuleStream`.
+
+        Raises:
+            BudgetExceeded: If the next generation could exceed the `budget`, the state is left at the last generation
+                that fits.
+        """
+        n_recursions = self.recursions if n is None else n
+        if reset_state:
+            self.reset_state()
+        governor = self.governor(budget)
+
+        rewrite = self.compiled.rewrite
+        with profiling.span("expansion"):
+            for generation in tqdm.tqdm(range(1, n_recursions + 1), desc="Applying the L-System production rules."):
+                if governor:
+                    governor.before_rewrite(generation, self._state.ids)
+                self._state = rewrite(self._state)
+        profiling.count("symbols", len(self._state))
+        return self._state
+
+    def reset_state(self) -> None:
+        """Resets the state of the L-System to it's `axiom`."""
+        self._state = self.compiled.axiom
+
+    def __iter__(self) -> Iterable[Module]:
+        """Iterate over the L-System's state as `(symbol, parameters)` modules."""
+        yield from self._state
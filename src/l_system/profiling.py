@@ -0,0 +1,204 @@
+"""
+Lightweight instrumentation of the L-System pipeline.
+
+The pipeline reports named timing spans (`expansion`, `geometry`, `framing`, `drawing`, `export`) and counters
+(`symbols`, `segments`, `canvas_items`) to the registered observers:
+
+```python
+profiler = Profiler()
+with observe(profiler):
+    lsystem.apply()
+profiler.write_json(Path("report.json"))
+```
+
+When no observer is registered, `span` returns a shared no-op context manager and `count` returns immediately, so the
+overhead of the instrumentation is a function call and a list truthiness check.
+"""
+
+import cProfile
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+class Observer:
+    """Base class of the profiling observers, subclasses override the callbacks they are interested in."""
+
+    def span_started(self, name: str) -> None:
+        """Called when the span `name` starts."""
+
+    def span_finished(self, name: str, seconds: float) -> None:
+        """Called when the span `name` finishes after `seconds`."""
+
+    def counted(self, name: str, value: int) -> None:
+        """Called when `value` is added to the counter `name`."""
+
+
+_observers: list[Observer] = []
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        for observer in _observers:
+            observer.span_started(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        seconds = time.perf_counter() - self.start
+        for observer in _observers:
+            observer.span_finished(self.name, seconds)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str) -> _Span | _NullSpan:
+    """
+    A context manager timing a named span of work.
+
+    Args:
+        name: The name of the span, e.g. `expansion`.
+
+    Returns:
+        A context manager reporting the span to the observers, a no-op when there are no observers.
+    """
+    return _Span(name) if _observers else _NULL_SPAN
+
+
+def count(name: str, value: int = 1) -> None:
+    """
+    Adds `value` to a named counter.
+
+    Args:
+        name: The name of the counter, e.g. `symbols`.
+        value: How much to add to the counter.
+    """
+    if _observers:
+        for observer in _observers:
+            observer.counted(name, value)
+
+
+def add_observer(observer: Observer) -> None:
+    """Registers an observer."""
+    _observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    """Unregisters an observer."""
+    _observers.remove(observer)
+
+
+@contextmanager
+def observe(observer: Observer) -> Iterator[Observer]:
+    """
+    Registers an observer for the duration of a `with` block.
+
+    Args:
+        observer: The observer to register.
+
+    Yields:
+        The registered observer.
+    """
+    add_observer(observer)
+    try:
+        yield observer
+    finally:
+        remove_observer(observer)
+
+
+def peak_rss() -> int | None:
+    """
+    Returns:
+        The peak resident set size of the process in bytes, `None` if it can't be measured on this platform.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Profiler(Observer):
+    """An observer aggregating spans and counters to a structured report."""
+
+    def __init__(self, cprofile_spans: set[str] | None = None):
+        """
+        Args:
+            cprofile_spans: The names of the spans (hot loops) to run under `cProfile`, e.g. `{"expansion"}`.
+        """
+        self.spans: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, int] = {}
+        self.cprofile_spans = cprofile_spans or set()
+        self.cprofile = cProfile.Profile() if self.cprofile_spans else None
+        self._active_cprofile_spans = 0
+
+    def span_started(self, name: str) -> None:
+        if name in self.cprofile_spans:
+            if self._active_cprofile_spans == 0:
+                self.cprofile.enable()
+            self._active_cprofile_spans += 1
+
+    def span_finished(self, name: str, seconds: float) -> None:
+        if name in self.cprofile_spans:
+            self._active_cprofile_spans -= 1
+            if self._active_cprofile_spans == 0:
+                self.cprofile.disable()
+        stats = self.spans.setdefault(name, {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["calls"] += 1
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def counted(self, name: str, value: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> dict:
+        """
+        Returns:
+            The spans, counters and peak resident set size of the process.
+        """
+        return {"spans": self.spans, "counters": self.counters, "peak_rss_bytes": peak_rss()}
+
+    def write_json(self, path: Path) -> None:
+        """
+        Writes the report to a JSON file.
+
+        Args:
+            path: Where the report will be stored.
+        """
+        with open(path, "w") as fd:
+            json.dump(self.report(), fd, indent=2)
+
+    def write_cprofile_stats(self, path: Path) -> None:
+        """
+        Writes the `cProfile` stats of the profiled spans, they can be inspected with `pstats` or `snakeviz`.
+
+        Args:
+            path: Where the stats will be stored.
+        """
+        if self.cprofile is None:
+            raise ValueError("No spans were profiled with cProfile.")
+        self.cprofile.dump_stats(path)
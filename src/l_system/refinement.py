@@ -0,0 +1,111 @@
+"""
+Progressive refinement of an L-System: the low generations are shown at once, while the deeper ones are computed in
+a background thread.
+
+Every generation is rewritten from the previous one (see `l_system.streaming.iter_generations`), so the last generation
+costs exactly as much as expanding it directly. The geometry and the `SegmentIndex` of every generation are computed
+in the thread too, the consumer only has to draw the latest generation:
+
+```python
+refinement = Refinement(lsystem, turtle_conf).start()
+while refinement.running:
+    generation = refinement.latest()
+    ...
+refinement.stop()
+```
+"""
+
+import contextvars
+import queue
+import threading
+from dataclasses import dataclass
+
+from l_system.base import Lsystem
+from l_system.parametric import ModuleStream
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import Geometry, compute_geometry
+from l_system.rendering.spatial import SegmentIndex
+from l_system.streaming import iter_generations
+from l_system.symbol_array import SymbolArray
+
+
+@dataclass(frozen=True)
+class Generation:
+    """A generation of an L-System, ready to be drawn."""
+
+    depth: int
+    """The number of recursions."""
+    state: SymbolArray | ModuleStream
+    """The expanded state."""
+    geometry: Geometry
+    """The segments drawn by the turtle."""
+    index: SegmentIndex
+    """The spatial index over the segments."""
+
+
+class Refinement:
+    """Computes the generations of an L-System in a background thread, until the last one or until stopped."""
+
+    def __init__(self, lsystem: Lsystem, turtle_configuration: TurtleConfiguration, depth: int | None = None):
+        """
+        Args:
+            lsystem: The L-System to refine, its state is not modified.
+            turtle_configuration: Interpret the generations according to this `TurtleConfiguration`.
+            depth: The last generation, defaults to `lsystem.recursions`.
+        """
+        self.lsystem = lsystem
+        self.turtle_configuration = turtle_configuration
+        self.depth = lsystem.recursions if depth is None else depth
+        self.results: queue.Queue[Generation] = queue.Queue()
+        self.error: Exception | None = None
+        """The error that ended the refinement early, e.g. a `KeyError` for a symbol without a turtle move."""
+        self._stop = threading.Event()
+        # The thread runs in a copy of the context of its creator, e.g. to inherit its default budget
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._run,), name=f"refine-{lsystem.name()}", daemon=True
+        )
+
+    def start(self) -> "Refinement":
+        """Starts computing the generations, returns the refinement itself."""
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops at the current level, the generation being computed is discarded."""
+        self._stop.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        """Waits for the thread to finish."""
+        self._thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        """Whether generations are still being computed."""
+        return self._thread.is_alive()
+
+    def latest(self) -> Generation | None:
+        """
+        Returns:
+            The deepest generation computed since the last call, skipping the ones in between, or `None`.
+        """
+        generation = None
+        while True:
+            try:
+                generation = self.results.get_nowait()
+            except queue.Empty:
+                return generation
+
+    def _run(self) -> None:
+        try:
+            for depth, state in iter_generations(self.lsystem, self.depth):
+                if self._stop.is_set():
+                    return
+                geometry = compute_geometry(state, self.turtle_configuration)
+                index = SegmentIndex.build(geometry)
+                if self._stop.is_set():
+                    return
+                self.results.put(Generation(depth, state, geometry, index))
+        except Exception as exc:
+            # The consumer is in another thread, it checks `error` once the refinement has stopped
+            self.error = exc
@@ -0,0 +1,82 @@
+"""
+A lazy registry of the example L-Systems.
+
+Every example is registered by the name of its `Lsystem` class and the module that defines it along with its
+`DEFAULT_TURTLE_CONFIG`. Modules are only imported, and the L-Systems only instantiated, the first time an example is
+looked up, so listing the examples or importing `l_system` for headless use does not pay for all of them.
+"""
+
+import importlib
+from typing import Iterator, Mapping, Tuple
+
+from l_system.base import Lsystem
+from l_system.rendering.configuration import TurtleConfiguration
+
+Example = Tuple[Lsystem, TurtleConfiguration]
+
+EXAMPLE_MODULES: dict[str, str] = {
+    'DragonCurve': "examples.dragon_curve",
+    'SierpinskiGask': "examples.sierpinski_gask",
+    'KochIsland': "examples.koch_island",
+    'HexagonalGosperCurve': "examples.hexagonal_gosper_curve",
+    'IslandsAndLakes': "examples.islands_and_lakes",
+    'BracketedOlSystemFig124a': "examples.bracketed_ol_system_fig1_24a",
+    'BracketedOlSystemFig124b': "examples.bracketed_ol_system_fig1_24b",
+    'BracketedOlSystemFig124c': "examples.bracketed_ol_system_fig1_24c",
+    'BracketedOlSystemFig124d': "examples.bracketed_ol_system_fig1_24d",
+    'BracketedOlSystemFig124f': "examples.bracketed_ol_system_fig1_24f",
+    'QuadraticSnowFlakeCurve': "examples.koch_curves_fig1_7b",
+    'KochCurvesFig19a': "examples.koch_curves_fig1_9a",
+    'KochCurvesFig19b': "examples.koch_curves_fig1_9b",
+    'KochCurvesFig19c': "examples.koch_curves_fig1_9c",
+    'KochCurvesFig19d': "examples.koch_curves_fig1_9d",
+    'KochCurvesFig19e': "examples.koch_curves_fig1_9e",
+    'KochCurvesFig19f': "examples.koch_curves_fig1_9f",
+    'ParametricBinaryTree': "examples.parametric_tree",
+}
+"""The module of every example, keyed by the name of its `Lsystem` class, in the order they are listed in the GUI."""
+
+
+class ExampleRegistry(Mapping[str, Example]):
+    """A read-only mapping of example names to `(L-System, turtle configuration)` pairs, resolved on first use."""
+
+    def __init__(self, modules: Mapping[str, str]):
+        """
+        Args:
+            modules: The module of every example, keyed by the name of its `Lsystem` class.
+        """
+        self._modules = dict(modules)
+        self._resolved: dict[str, Example] = {}
+
+    def __getitem__(self, name: str) -> Example:
+        if name not in self._resolved:
+            module = importlib.import_module(self._modules[name])
+            self._resolved[name] = (getattr(module, name)(), module.DEFAULT_TURTLE_CONFIG)
+        return self._resolved[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._modules)
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def register(self, name: str, module: str) -> None:
+        """
+        Registers an example.
+
+        Args:
+            name: The name of the `Lsystem` class of the example.
+            module: The module defining the class and its `DEFAULT_TURTLE_CONFIG`.
+        """
+        self._modules[name] = module
+        self._resolved.pop(name, None)
+
+    def is_resolved(self, name: str) -> bool:
+        """Whether the example `name` has already been imported and instantiated."""
+        return name in self._resolved
+
+
+EXAMPLES = ExampleRegistry(EXAMPLE_MODULES)
+"""The registry of all the examples."""
+
+DEFAULT_EXAMPLE = 'DragonCurve'
@@ -0,0 +1,140 @@
+"""
+Headless growth animations of L-Systems, rendered with Pillow in a process pool and saved as GIF or APNG files.
+
+Two kinds of growth are supported:
+
+- `progress` draws one generation as the turtle would, every frame adds the next segments to the previous frame. The
+    frames are split into one contiguous block per worker, a worker rasterizes the segments before its block once and
+    then only draws the new segments of every frame onto a copy of the previous one.
+- `depth` shows one generation per frame, every generation is rewritten from the previous one (see
+    `iter_generations`) and framed by its own bounding box.
+
+```python
+frames = growth_frames(lsystem, turtle_conf, mode="progress", frames=60, size=(400, 400))
+write_animation(frames, Path("dragon.gif"), duration=40)
+```
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from l_system import profiling
+from l_system.base import Lsystem
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import DEFAULT_SIZE, rasterize_window
+from l_system.rendering.geometry import compute_geometry, world_coordinates
+from l_system.streaming import iter_generations
+
+MODES = ("progress", "depth")
+"""The kinds of growth, see the module documentation."""
+
+FORMATS = {".gif": "GIF", ".png": "PNG", ".apng": "PNG"}
+"""The Pillow format of the animation by file suffix, PNG files are animated (APNG)."""
+
+
+def _render_block(
+    segments: np.ndarray,
+    stops: list[int],
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> list[Image.Image]:
+    """Renders the frames showing the first `stops[i]` segments, every frame drawn on top of the previous one."""
+    image = rasterize_window([segments[: stops[0]]], world, turtle_configuration, size)
+    frames = [image.copy()]
+    for previous, stop in zip(stops, stops[1:]):
+        image = rasterize_window([segments[previous:stop]], world, turtle_configuration, size, image)
+        frames.append(image.copy())
+    return frames
+
+
+def _render_frame(
+    segments: np.ndarray,
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> list[Image.Image]:
+    return [rasterize_window([segments], world, turtle_configuration, size)]
+
+
+def growth_frames(
+    lsystem: Lsystem,
+    turtle_configuration: TurtleConfiguration,
+    depth: int | None = None,
+    mode: str = "progress",
+    frames: int = 60,
+    size: tuple[int, int] = DEFAULT_SIZE,
+    workers: int | None = None,
+) -> list[Image.Image]:
+    """
+    Renders the frames of a growth animation.
+
+    Args:
+        lsystem: The L-System to animate, its state is not modified.
+        turtle_configuration: Interpret the L-System according to this `TurtleConfiguration`.
+        depth: The number of recursions, defaults to `lsystem.recursions`.
+        mode: `progress` to draw the last generation segment by segment, `depth` for a frame per generation.
+        frames: The number of frames of a `progress` animation, a `depth` animation has `depth + 1` frames.
+        size: The `(width, height)` of the frames in pixels.
+        workers: The number of worker processes, defaults to the number of CPUs. With one worker the frames are
+            rendered in this process.
+
+    Returns:
+        The RGB frames in order.
+
+    Raises:
+        ValueError: If `mode` is not one of `MODES`.
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    if mode not in MODES:
+        raise ValueError(f"unknown growth mode '{mode}', expected one of {', '.join(MODES)}")
+    workers = workers or os.cpu_count() or 1
+    depth = lsystem.recursions if depth is None else depth
+
+    if mode == "depth":
+        tasks = []
+        for _, state in iter_generations(lsystem, depth):
+            geometry = compute_geometry(state, turtle_configuration)
+            tasks.append((geometry.segments, world_coordinates(geometry.bounding_box), turtle_configuration, size))
+        render = _render_frame
+    else:
+        ((_, state),) = deque(iter_generations(lsystem, depth), maxlen=1)
+        geometry = compute_geometry(state, turtle_configuration)
+        world = world_coordinates(geometry.bounding_box)
+        stops = np.linspace(0, len(geometry), frames + 1).round().astype(int)[1:].tolist()
+        # A block of frames per worker, its first frame is rasterized from scratch and the rest incrementally
+        blocks = [block.tolist() for block in np.array_split(stops, min(workers, frames)) if len(block)]
+        tasks = [(geometry.segments[: block[-1]], block, world, turtle_configuration, size) for block in blocks]
+        render = _render_block
+
+    with profiling.span("export"):
+        if workers == 1:
+            return [frame for task in tasks for frame in render(*task)]
+        with ProcessPoolExecutor(workers) as pool:
+            return [frame for block in pool.map(render, *zip(*tasks)) for frame in block]
+
+
+def write_animation(frames: list[Image.Image], path: Path, duration: int = 50, hold: int = 1000) -> None:
+    """
+    Saves frames to an animated GIF or PNG (APNG) file, looping forever.
+
+    Args:
+        frames: The frames in order.
+        path: Where the animation will be stored, its suffix selects the format (see `FORMATS`).
+        duration: How long every frame is shown, in milliseconds.
+        hold: How long the last frame is shown before the animation restarts, in milliseconds.
+
+    Raises:
+        ValueError: If the suffix of `path` is not one of `FORMATS`.
+    """
+    fmt = FORMATS.get(path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f"unsupported animation format '{path.suffix}', expected one of {', '.join(FORMATS)}")
+    durations = [duration] * (len(frames) - 1) + [hold]
+    with profiling.span("export"):
+        frames[0].save(path, format=fmt, save_all=True, append_images=frames[1:], duration=durations, loop=0)
@@ -0,0 +1,146 @@
+"""
+A drawing backend writing the precomputed geometry of an L-System straight to a Tk canvas, without `turtle.RawTurtle`.
+
+The turtle replays every move through its own bookkeeping and configures a canvas item per pen stroke. Instead, the
+segments are chained to polylines (see `polylines`), mapped to canvas coordinates with NumPy and created with one
+multi-point `create_line` call per polyline, up to `MAX_LINE_POINTS` points per item. The lines of a `Drawing` are drawn
+in batches of equal width and color (`Drawing.line_groups`), after its polygons and before its dots, like the exporters.
+
+The canvas is only duck-typed (`create_line`, `create_polygon` and `create_oval`), so this module never imports
+`tkinter`:
+
+```python
+world = world_coordinates(geometry.bounding_box)
+draw_items(canvas, canvas_items(geometry, turtle_conf, world, (width, height)), tags="lsystem")
+```
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import to_pixels
+from l_system.rendering.geometry import Drawing, Geometry, polylines
+
+MAX_LINE_POINTS = 2048
+"""Longer polylines are split to several canvas items, Tk redraws items with huge coordinate lists slowly."""
+
+ANIMATION_BATCH = 64
+"""How many canvas items are created between two screen updates when animating."""
+
+
+def to_hex(color: tuple[float, float, float]) -> str:
+    """Converts a `(R, G, B)` color in `[0, 1]` to a Tk color string."""
+    return "#{:02x}{:02x}{:02x}".format(*(int(round(255 * c)) for c in color))
+
+
+@dataclass(frozen=True)
+class CanvasItem:
+    """A canvas item to create, e.g. `canvas.create_line(*coordinates, **options)`."""
+
+    kind: str
+    """`line`, `polygon` or `oval`."""
+    coordinates: list[float]
+    """The flat `x0, y0, x1, y1, ...` canvas coordinates."""
+    options: dict = field(default_factory=dict)
+    """The options of the item, e.g. its `fill` and `width`."""
+
+    def create(self, canvas, tags: str = "") -> int:
+        """
+        Creates the item.
+
+        Args:
+            canvas: A `tk.Canvas`, or anything with its `create_*` methods.
+            tags: The tags of the item.
+
+        Returns:
+            The id of the created item.
+        """
+        return getattr(canvas, f"create_{self.kind}")(*self.coordinates, tags=tags, **self.options)
+
+
+def _lines(segments: np.ndarray, to_canvas: Callable, max_points: int) -> Iterator[list[float]]:
+    for line in polylines(segments):
+        points = to_canvas(line)
+        # Consecutive pieces share a point, so the polyline stays connected
+        for i in range(0, len(points) - 1, max_points - 1):
+            yield points[i : i + max_points].ravel().tolist()
+
+
+def canvas_items(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    world: tuple[float, float, float, float],
+    size: tuple[int, int],
+    origin: tuple[float, float] = (0.0, 0.0),
+    max_points: int = MAX_LINE_POINTS,
+) -> Iterator[CanvasItem]:
+    """
+    Converts the geometry of an L-System to canvas items.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground color and the palette.
+        world: The `(llx, lly, urx, ury)` world coordinates of the corners of the window.
+        size: The `(width, height)` of the window in pixels.
+        origin: The canvas coordinates of the upper left corner of the window, e.g. `(canvas.canvasx(0),
+            canvas.canvasy(0))`.
+        max_points: The maximum number of points of a line item, longer polylines are split.
+
+    Yields:
+        The items in drawing order.
+    """
+
+    def to_canvas(points: np.ndarray) -> np.ndarray:
+        return to_pixels(points.reshape(-1, 2), world, size) + np.asarray(origin)
+
+    if isinstance(geometry, Geometry):
+        fill = to_hex(turtle_configuration.fg_color)
+        for coordinates in _lines(geometry.segments, to_canvas, max_points):
+            yield CanvasItem("line", coordinates, {"fill": fill, "width": 1})
+        return
+
+    for vertices, color in zip(geometry.polygons(), geometry.polygon_colors):
+        options = {"fill": to_hex(turtle_configuration.color(color)), "outline": ""}
+        yield CanvasItem("polygon", to_canvas(vertices).ravel().tolist(), options)
+    for width, color, segments in geometry.line_groups():
+        if width <= 0:
+            continue
+        options = {"fill": to_hex(turtle_configuration.color(color)), "width": max(1, round(width))}
+        for coordinates in _lines(segments, to_canvas, max_points):
+            yield CanvasItem("line", coordinates, options)
+    for (x, y), radius, color in zip(to_canvas(geometry.dots), geometry.dot_radii, geometry.dot_colors):
+        options = {"fill": to_hex(turtle_configuration.color(color)), "outline": ""}
+        yield CanvasItem("oval", [x - radius, y - radius, x + radius, y + radius], options)
+
+
+def draw_items(
+    canvas,
+    items: Iterable[CanvasItem],
+    tags: str = "",
+    on_batch: Callable[[int], None] | None = None,
+    batch_size: int = ANIMATION_BATCH,
+) -> int:
+    """
+    Creates canvas items, optionally calling back after every batch so that the drawing can be animated.
+
+    Args:
+        canvas: A `tk.Canvas`, or anything with its `create_*` methods.
+        items: The items to create, e.g. from `canvas_items`.
+        tags: The tags of every item, to delete them together.
+        on_batch: Called with the number of items created so far after every `batch_size` items, e.g. to update the
+            screen.
+        batch_size: The number of items of a batch.
+
+    Returns:
+        The number of created items.
+    """
+    count = 0
+    for item in items:
+        item.create(canvas, tags)
+        count += 1
+        if on_batch is not None and count % batch_size == 0:
+            on_batch(count)
+    return count
@@ -0,0 +1,61 @@
+"""
+The configuration of the turtle and its bounding box.
+
+They are kept apart from `l_system.rendering.turtle` so that headless code (geometry, exporters, benchmarks and the
+examples) never imports `tkinter`.
+"""
+
+from dataclasses import astuple, dataclass, field
+
+
+@dataclass
+class TurtleConfiguration:
+    """Turtle graphics configuration used by the L-System renderer class."""
+
+    forward_step: int = 3
+    """This value represents the distance the turtle will travel."""
+    angle: float = 90
+    """Rotation angle in degrees of the turtle."""
+    initial_heading_angle: int = 0
+    """Initial [orientation](https://docs.python.org/3/library/turtle.html#turtle.setheading) of the turtle."""
+    speed: int = 0
+    """The turtle's drawing [speed](https://docs.python.org/3/library/turtle.html#turtle.speed), 0 is the fastest."""
+    fg_color: tuple[float, float, float] = (0.76, 0.71, 0.55)
+    """The turtle's drawing color in (R, G, B) format."""
+    bg_color: tuple[float, float, float] = (0.0, 0.0, 0.0)
+    """The background color (window color) in (R, G, B) format."""
+    turtle_move_mapper: dict[str, str] = field(default_factory=dict)
+    """A dictionary that maps L-System symbols to turtle moves."""
+    line_width: float = 1.0
+    """The initial line width in pixels, it's also the radius of the dots drawn by `@`."""
+    line_width_increment: float = 1.0
+    """How much `#` increments and `!` decrements the line width."""
+    length_scale_factor: float = 1.5
+    """How much `>` multiplies and `<` divides the line length."""
+    angle_increment: float = 5.0
+    """How much `)` increments and `(` decrements the turning angle, in degrees."""
+    palette: tuple[tuple[float, float, float], ...] = ()
+    """The colors selected by the color index `'` increments, in (R, G, B) format. Empty to always use `fg_color`."""
+
+    def color(self, index: int) -> tuple[float, float, float]:
+        """
+        Args:
+            index: A color index.
+
+        Returns:
+            The color of the palette at `index` (wrapping around), `fg_color` if the palette is empty.
+        """
+        return self.palette[index % len(self.palette)] if self.palette else self.fg_color
+
+
+@dataclass(frozen=False)
+class TurtleBoundingBox:
+    """A bounding box of the area the turtle has drawn to."""
+
+    x_min: float
+    y_min: float
+    x_max: float
+    y_max: float
+
+    def to_tuple(self):
+        return astuple(self)
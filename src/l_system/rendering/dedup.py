@@ -0,0 +1,307 @@
+"""
+Removes the segments an L-System draws more than once before they are drawn or exported.
+
+Many grammars retrace their own edges: the Sierpinski gasket and the islands and lakes walk along shared sides, and a
+bracketed plant returns along its stem after every `]` to draw the next branch over it. `deduplicate` drops the
+segments that add nothing to the drawing:
+
+- segments of zero length,
+- exact duplicates, drawn in either direction,
+- collinear segments that overlap, which are merged into a single segment, as are consecutive segments that continue
+  each other (e.g. the moves of `FF`).
+
+The end points are snapped to integer keys first: floating point drawings are quantized to `RESOLUTION` of their
+extent, the exact coordinates of a `LatticeGeometry` are used as they are. A segment is then oriented along a positive
+direction, and its line is identified by its primitive integer direction and its offset from the origin, or for
+floating point drawings by clustering the angles and offsets of the segments within the rounding of the keys. Sorting
+the pieces of every line by their position along it finds the overlaps, all with NumPy.
+
+```python
+geometry, report = deduplicate(compute_geometry(lsystem.apply(), turtle_conf))
+print(report)
+```
+"""
+
+from dataclasses import dataclass, replace
+from typing import TypeVar
+
+import numpy as np
+
+from l_system import profiling
+from l_system.rendering.geometry import Drawing, Geometry, LatticeGeometry
+
+RESOLUTION = 1e-9
+"""The end points of floating point drawings are snapped to this fraction of their extent, which absorbs the rounding
+errors of the turtle and keeps the integer keys (and the products of the line offsets) far from overflowing."""
+
+T = TypeVar("T", Geometry, LatticeGeometry, Drawing)
+
+
+@dataclass(frozen=True)
+class DedupReport:
+    """How many segments `deduplicate` dropped, and why."""
+
+    segments: int
+    """The number of segments before the deduplication."""
+    empty: int
+    """The segments of zero length."""
+    duplicates: int
+    """The segments drawn before, in either direction."""
+    merged: int
+    """The collinear segments merged into an overlapping one, or into the previous segment they continue."""
+
+    @property
+    def dropped(self) -> int:
+        """The number of segments dropped."""
+        return self.empty + self.duplicates + self.merged
+
+    @property
+    def remaining(self) -> int:
+        """The number of segments left."""
+        return self.segments - self.dropped
+
+    def __str__(self) -> str:
+        return (
+            f"dropped {self.dropped:,} of {self.segments:,} segments ({self.duplicates:,} duplicates, {self.merged:,}"
+            f" merged collinear, {self.empty:,} empty)"
+        )
+
+
+def _quantize(segments: np.ndarray, resolution: float) -> np.ndarray:
+    """Snaps floating point `(n, 4)` segments to `(n, 2, 2)` integer end points."""
+    points = np.asarray(segments, dtype=np.float64).reshape(-1, 2)
+    if not len(points):
+        return np.zeros((0, 2, 2), dtype=np.int64)
+    origin = points.min(axis=0)
+    spacing = float((points.max(axis=0) - origin).max()) * resolution or resolution
+    return np.rint((points - origin) / spacing).astype(np.int64).reshape(-1, 2, 2)
+
+
+def _pack(columns: np.ndarray) -> np.ndarray:
+    """Packs integer columns into as few `int64` keys as their ranges allow, keeping their lexicographic order."""
+    keys, span = [], 0
+    for column in columns:
+        column = column - column.min()
+        size = int(column.max()) + 1
+        if keys and span * size < 2**62:
+            keys[-1] = keys[-1] * size + column
+            span *= size
+        else:
+            keys.append(column)
+            span = size
+    return np.array(keys).reshape(len(keys), columns.shape[1])
+
+
+def _groups(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Groups equal values (or rows), a lot faster than `np.unique(rows, axis=0)`, which compares the rows as bytes.
+
+    Returns:
+        The group id of every row, numbered in the sorted order of the rows, and the index of the first row of every
+            group.
+    """
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    columns = _pack(rows.reshape(len(rows), -1).T)
+    order = np.lexsort(columns[::-1]) if len(columns) > 1 else np.argsort(columns[0], kind='stable')
+    changes = np.any(columns[:, order[1:]] != columns[:, order[:-1]], axis=0)
+    starts = np.concatenate([[True], changes])
+    ids = np.empty(len(order), dtype=np.int64)
+    ids[order] = np.cumsum(starts) - 1
+    # The sort is stable, so the first row of every group in sorted order is its first occurrence
+    return ids, order[starts]
+
+
+def _lattice_lines(tails: np.ndarray, heads: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Identifies the lines of oriented segments with exact integer end points.
+
+    Returns:
+        A `(n, 3)` array of the primitive direction and the offset of the line of every segment, and the positions of
+            its tail and head along the line.
+    """
+    deltas = heads - tails
+    directions = deltas // np.gcd(deltas[:, 0], deltas[:, 1])[:, None]
+    offsets = directions[:, 0] * tails[:, 1] - directions[:, 1] * tails[:, 0]
+    lines = np.concatenate([directions, offsets[:, None]], axis=1)
+    return lines, (tails * directions).sum(axis=1), (heads * directions).sum(axis=1)
+
+
+def _clusters(values: np.ndarray, slack: np.ndarray | float, groups: np.ndarray | None = None) -> np.ndarray:
+    """
+    Clusters values known up to a slack: sorted, two neighbours are in the same cluster when their intervals overlap.
+
+    Args:
+        values: The `(n,)` values.
+        slack: The uncertainty of every value, or of all of them.
+        groups: Optional `(n,)` ids, values of different groups are never in the same cluster.
+
+    Returns:
+        The cluster id of every value, numbered in sorted order.
+    """
+    groups = np.zeros(len(values), dtype=np.int64) if groups is None else groups
+    slack = np.broadcast_to(slack, values.shape)
+    order = np.lexsort((values, groups))
+    gaps = np.diff(values[order]) > slack[order[1:]] + slack[order[:-1]]
+    starts = np.concatenate([[True], gaps | (groups[order[1:]] != groups[order[:-1]])])
+    ids = np.empty(len(order), dtype=np.int64)
+    ids[order] = np.cumsum(starts) - 1
+    return ids
+
+
+def _float_lines(
+    tails: np.ndarray, heads: np.ndarray, segments: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Identifies the lines of oriented segments with quantized end points, within the rounding of their coordinates.
+
+    The primitive direction of quantized end points tells nothing about lines that aren't axis aligned or diagonal, so
+    the direction is the angle of the floating point segment, which the turtle computes a lot more accurately than
+    the quantization. The angles and then the perpendicular offsets of the segments are clustered, every value known
+    up to the quantization step.
+
+    Args:
+        tails: The `(n, 2)` quantized tails of the oriented segments.
+        heads: The `(n, 2)` quantized heads.
+        segments: The `(n, 4)` floating point segments, in the same orientation.
+
+    Returns:
+        A `(n, 1)` array of the line of every segment, and the positions of its tail and head along the line.
+    """
+    angles = np.arctan2(segments[:, 3] - segments[:, 1], segments[:, 2] - segments[:, 0])
+    # An end point is off by up to half a step, which turns a segment by up to one step over its length
+    slack = 1 / np.hypot(*(heads - tails).T)
+    # The oriented segments point to the right or straight up, up to the rounding: the nearly vertical ones pointing
+    # down are turned to meet the ones pointing up
+    angles = np.where(angles < slack - np.pi / 2, angles + np.pi, angles)
+    directions = _clusters(angles, slack)
+    mean = np.bincount(directions, weights=angles) / np.bincount(directions)
+    unit = np.stack([np.cos(mean), np.sin(mean)], axis=1)[directions]
+    offsets = unit[:, 0] * tails[:, 1] - unit[:, 1] * tails[:, 0]
+    lines = _clusters(offsets, 1.0, directions)
+    return lines[:, None], np.rint((tails * unit).sum(axis=1)), np.rint((heads * unit).sum(axis=1))
+
+
+def _merge(
+    keys: np.ndarray, attributes: np.ndarray, merge_collinear: bool, segments: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, DedupReport]:
+    """
+    Finds the segments left by the deduplication.
+
+    Args:
+        keys: A `(n, 2, 2)` integer array with the end points of every segment.
+        attributes: A `(n, k)` integer array, segments with different attributes are never merged.
+        merge_collinear: Whether to merge the overlapping collinear segments too.
+        segments: The `(n, 4)` floating point segments the keys were quantized from, whose lines are identified
+            within the rounding of the keys. `None` when the keys are exact, their lines are identified exactly.
+
+    Returns:
+        The indices of the first and last end points (into `keys.reshape(-1, 2)`) and the source segment of every
+            remaining segment, followed by the report. The segments are in the order they are first drawn, and keep the
+            direction their source was drawn in.
+    """
+    n, points = len(keys), keys.reshape(-1, 2)
+    deltas = keys[:, 1] - keys[:, 0]
+    valid = np.flatnonzero(np.any(deltas != 0, axis=1))
+    deltas, keys, attributes = deltas[valid], keys[valid], attributes[valid]
+    # Orient every segment along a positive direction, so that reversed duplicates and collinear pieces match
+    flip = (deltas[:, 0] < 0) | ((deltas[:, 0] == 0) & (deltas[:, 1] < 0))
+    tails = np.where(flip[:, None], keys[:, 1], keys[:, 0])
+    heads = np.where(flip[:, None], keys[:, 0], keys[:, 1])
+
+    unique = np.sort(_groups(np.concatenate([attributes, tails, heads], axis=1))[1])
+    first, last, source = unique, unique, unique
+    if merge_collinear and len(unique):
+        if segments is None:
+            lines, tail_positions, head_positions = _lattice_lines(tails[unique], heads[unique])
+        else:
+            oriented = segments[valid[unique]]
+            oriented = np.where(flip[unique, None], oriented[:, [2, 3, 0, 1]], oriented)
+            lines, tail_positions, head_positions = _float_lines(tails[unique], heads[unique], oriented)
+        lines = _groups(np.concatenate([attributes[unique], lines], axis=1))[0]
+        # The ranks of the (line, position along the line) of both end points: the pieces of a line are contiguous in
+        # rank order, so a running maximum of the ranks of the heads finds where the overlapping runs end
+        positions = np.concatenate([tail_positions, head_positions]).astype(np.int64)
+        ranks = _groups(np.stack([np.concatenate([lines, lines]), positions], axis=1))[0]
+        tail_ranks, head_ranks = ranks[: len(unique)], ranks[len(unique) :]
+        order = np.argsort(tail_ranks, kind='stable')
+        reach = np.maximum.accumulate(head_ranks[order])
+        # Pieces that only touch are left apart, merging them would break the polylines they belong to
+        breaks = np.flatnonzero(np.concatenate([[True], tail_ranks[order][1:] >= reach[:-1]]))
+        runs = np.repeat(np.arange(len(breaks)), np.diff(np.append(breaks, len(order))))
+        furthest = np.lexsort((head_ranks[order], runs))[np.append(breaks[1:], len(order)) - 1]
+        # `unique` is in drawing order, so the smallest position of a run is its first drawn piece
+        drawn_first = np.minimum.reduceat(order, breaks)
+        by_drawing = np.argsort(drawn_first)
+        first, last = unique[order[breaks]][by_drawing], unique[order[furthest]][by_drawing]
+        source = unique[drawn_first][by_drawing]
+        line_of = np.empty(len(valid), dtype=np.int64)
+        line_of[unique] = lines
+
+    tail_points, head_points = 2 * valid + flip, 2 * valid + 1 - flip
+    reverse = flip[source]
+    starts = np.where(reverse, head_points[last], tail_points[first])
+    ends = np.where(reverse, tail_points[first], head_points[last])
+    if merge_collinear and len(starts):
+        starts, ends, source = _join(points, starts, ends, source, line_of)
+    report = DedupReport(n, n - len(valid), len(valid) - len(unique), len(unique) - len(source))
+    return starts, ends, valid[source], report
+
+
+def _join(
+    points: np.ndarray, starts: np.ndarray, ends: np.ndarray, source: np.ndarray, line_of: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Joins the consecutive segments that continue each other, e.g. the moves of `FF`. The overlapping pieces of a line
+    are merged already, so a segment on the same line that starts where the previous one ends continues it.
+    """
+    lines = line_of[source]
+    continues = np.all(points[starts[1:]] == points[ends[:-1]], axis=1) & (lines[1:] == lines[:-1])
+    breaks = np.flatnonzero(np.concatenate([[True], ~continues]))
+    return starts[breaks], ends[np.append(breaks[1:], len(ends)) - 1], source[breaks]
+
+
+def deduplicate(geometry: T, merge_collinear: bool = True, resolution: float = RESOLUTION) -> tuple[T, DedupReport]:
+    """
+    Drops the empty, duplicate and (optionally) overlapping collinear segments of a drawing.
+
+    Args:
+        geometry: A `Geometry`, a `LatticeGeometry`, whose exact coordinates are compared as they are, or a `Drawing`,
+            whose segments are only merged with segments of the same width and color. Its dots and polygons are kept.
+        merge_collinear: Whether to merge the overlapping collinear segments, and the consecutive segments continuing
+            each other, otherwise only the empty segments and the exact duplicates are dropped.
+        resolution: The fraction of the extent of a floating point drawing its end points are snapped to.
+
+    Returns:
+        The deduplicated drawing, of the same type, and the report of the dropped segments. The segments are in the
+            order they were first drawn.
+    """
+    with profiling.span("dedup"):
+        segments = geometry.geometry.segments if isinstance(geometry, Drawing) else geometry.segments
+        if isinstance(geometry, LatticeGeometry):
+            keys = segments.reshape(-1, 2, 2).astype(np.int64)
+        else:
+            keys = _quantize(segments, resolution)
+        attributes = np.zeros((len(keys), 0), dtype=np.int64)
+        if isinstance(geometry, Drawing):
+            attributes = np.stack([_groups(geometry.widths)[0], _groups(geometry.colors)[0]], axis=1)
+
+        exact = isinstance(geometry, LatticeGeometry)
+        starts, ends, source, report = _merge(keys, attributes, merge_collinear, None if exact else segments)
+        points = segments.reshape(-1, 2)
+        deduplicated = np.concatenate([points[starts], points[ends]], axis=1)
+        if isinstance(geometry, LatticeGeometry):
+            result = replace(geometry, segments=deduplicated)
+        elif isinstance(geometry, Drawing):
+            lengths = np.hypot(deduplicated[:, 2] - deduplicated[:, 0], deduplicated[:, 3] - deduplicated[:, 1])
+            result = replace(
+                geometry,
+                geometry=Geometry(deduplicated, geometry.geometry.bounding_box),
+                widths=geometry.widths[source],
+                colors=geometry.colors[source],
+                lengths=lengths,
+            )
+        else:
+            result = Geometry(deduplicated, geometry.bounding_box)
+    profiling.count("segments_dropped", report.dropped)
+    return result, report
@@ -0,0 +1,359 @@
+"""
+Headless exporters of the geometry of an L-System, they never touch Tk.
+
+The drawing is framed with the same world coordinates as the on-screen renderer (see `world_coordinates`), so the
+exported images look like the window of `LSystemRenderer`. The `write_*` exporters consume the segments in chunks, as
+produced by `l_system.streaming.iter_geometry`, so the geometry of a streamed L-System never has to be resident.
+
+A chunk can also be a `Drawing` (see `compute_drawing`), whose polygons, lines and dots are drawn with their own widths
+and colors. The lines are drawn in batches of equal attributes (`Drawing.line_groups`), so the pen is only changed once
+per group; the polygons are drawn first and the dots last.
+"""
+
+from pathlib import Path
+from typing import Iterable, TextIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from l_system import profiling
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.geometry import Drawing, Geometry, polylines, world_coordinates
+
+DEFAULT_SIZE = (800, 800)
+EPS_MAX_PATH_POINTS = 1000
+"""Longer polylines are split to several PostScript paths."""
+
+
+def to_rgb(color: tuple[float, float, float]) -> tuple[int, int, int]:
+    """
+    Converts a `(R, G, B)` color in `[0, 1]` to 8 bit integers.
+
+    Args:
+        color: The color in `(R, G, B)` format.
+
+    Returns:
+        The color as 8 bit integers.
+    """
+    r, g, b = (int(round(255 * c)) for c in color)
+    return r, g, b
+
+
+def to_pixels(points: np.ndarray, world: tuple[float, float, float, float], size: tuple[int, int]) -> np.ndarray:
+    """
+    Maps world coordinates to pixel coordinates, with the y axis pointing down.
+
+    Args:
+        points: A `(..., 2)` array of points in world coordinates.
+        world: The `(llx, lly, urx, ury)` world coordinates of the image corners.
+        size: The `(width, height)` of the image in pixels.
+
+    Returns:
+        The points in pixel coordinates.
+    """
+    llx, lly, urx, ury = world
+    width, height = size
+    scale = np.array([width / ((urx - llx) or 1.0), -height / ((ury - lly) or 1.0)])
+    return (points - np.array([llx, ury])) * scale
+
+
+def _chunks(geometry: Geometry | Drawing) -> tuple[list[np.ndarray | Drawing], TurtleBoundingBox]:
+    if isinstance(geometry, Drawing):
+        return [geometry], geometry.geometry.bounding_box
+    return [geometry.segments], geometry.bounding_box
+
+
+def render_image(
+    geometry: Geometry | Drawing, turtle_configuration: TurtleConfiguration, size: tuple[int, int] = DEFAULT_SIZE
+) -> Image.Image:
+    """
+    Rasterizes the geometry of an L-System with Pillow.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        size: The `(width, height)` of the image in pixels.
+
+    Returns:
+        The rendered RGB image.
+    """
+    return _rasterize(*_chunks(geometry), turtle_configuration, size)
+
+
+def _rasterize(
+    segment_chunks: Iterable[np.ndarray | Drawing],
+    bounding_box: TurtleBoundingBox,
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> Image.Image:
+    return rasterize_window(segment_chunks, world_coordinates(bounding_box), turtle_configuration, size)
+
+
+def rasterize_window(
+    segment_chunks: Iterable[np.ndarray | Drawing],
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+    image: Image.Image | None = None,
+) -> Image.Image:
+    """
+    Rasterizes streamed line segments within a window of world coordinates, e.g. one tile of a larger image.
+
+    Args:
+        segment_chunks: `(n, 4)` arrays of the line segments `(x0, y0, x1, y1)` drawn by the turtle, or `Drawing`s.
+        world: The `(llx, lly, urx, ury)` world coordinates of the image corners.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        size: The `(width, height)` of the image in pixels.
+        image: An image of `size` to draw on, e.g. the previous frame of an animation, instead of a blank one.
+
+    Returns:
+        The rendered RGB image, `image` if given.
+    """
+    if image is None:
+        image = Image.new("RGB", size, to_rgb(turtle_configuration.bg_color))
+    draw = ImageDraw.Draw(image)
+    fill = to_rgb(turtle_configuration.fg_color)
+    for segments in segment_chunks:
+        with profiling.span("export"):
+            if isinstance(segments, Drawing):
+                _rasterize_drawing(draw, segments, world, turtle_configuration, size)
+                continue
+            for line in polylines(segments):
+                draw.line(to_pixels(line, world, size).ravel().tolist(), fill=fill, width=1)
+    return image
+
+
+def _rasterize_drawing(
+    draw: ImageDraw.ImageDraw,
+    drawing: Drawing,
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> None:
+    for vertices, color in zip(drawing.polygons(), drawing.polygon_colors):
+        fill = to_rgb(turtle_configuration.color(color))
+        draw.polygon(to_pixels(vertices, world, size).ravel().tolist(), fill=fill)
+    for width, color, segments in drawing.line_groups():
+        if width <= 0:
+            continue
+        fill, width = to_rgb(turtle_configuration.color(color)), max(1, round(width))
+        for line in polylines(segments):
+            draw.line(to_pixels(line, world, size).ravel().tolist(), fill=fill, width=width)
+    for (x, y), radius, color in zip(to_pixels(drawing.dots, world, size), drawing.dot_radii, drawing.dot_colors):
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=to_rgb(turtle_configuration.color(color)))
+
+
+def write_png(
+    segment_chunks: Iterable[np.ndarray | Drawing],
+    bounding_box: TurtleBoundingBox,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves streamed line segments to a PNG image.
+
+    Args:
+        segment_chunks: `(n, 4)` arrays of the line segments `(x0, y0, x1, y1)` drawn by the turtle, or `Drawing`s.
+        bounding_box: The area visited by the turtle, used to frame the image.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in pixels.
+    """
+    image = _rasterize(segment_chunks, bounding_box, turtle_configuration, size)
+    with profiling.span("export"):
+        image.save(path, format="PNG")
+
+
+def _svg_points(points: np.ndarray) -> str:
+    return " ".join(f"{x:.2f},{y:.2f}" for x, y in points.tolist())
+
+
+def _svg_drawing(
+    fd: TextIO,
+    drawing: Drawing,
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> None:
+    for vertices, color in zip(drawing.polygons(), drawing.polygon_colors):
+        fill = to_rgb(turtle_configuration.color(color))
+        fd.write(f'<path d="M{_svg_points(to_pixels(vertices, world, size))}Z" fill="rgb{fill}" stroke="none"/>\n')
+    for width, color, segments in drawing.line_groups():
+        stroke = to_rgb(turtle_configuration.color(color))
+        fd.write(f'<g fill="none" stroke="rgb{stroke}" stroke-width="{width:g}">\n')
+        for line in polylines(segments):
+            fd.write(f'<path d="M{_svg_points(to_pixels(line, world, size))}"/>\n')
+        fd.write("</g>\n")
+    for (x, y), radius, color in zip(to_pixels(drawing.dots, world, size), drawing.dot_radii, drawing.dot_colors):
+        fill = to_rgb(turtle_configuration.color(color))
+        fd.write(f'<circle cx="{x:.2f}" cy="{y:.2f}" r="{radius:g}" fill="rgb{fill}"/>\n')
+
+
+def write_svg(
+    segment_chunks: Iterable[np.ndarray | Drawing],
+    bounding_box: TurtleBoundingBox,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves streamed line segments to an SVG image, one `<path>` element per polyline.
+
+    Args:
+        segment_chunks: `(n, 4)` arrays of the line segments `(x0, y0, x1, y1)` drawn by the turtle, or `Drawing`s.
+        bounding_box: The area visited by the turtle, used to frame the image.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in pixels.
+    """
+    world = world_coordinates(bounding_box)
+    width, height = size
+    with open(path, "w") as fd:
+        fd.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n'
+        )
+        fd.write(f'<rect width="100%" height="100%" fill="rgb{to_rgb(turtle_configuration.bg_color)}"/>\n')
+        fd.write(f'<g fill="none" stroke="rgb{to_rgb(turtle_configuration.fg_color)}" stroke-width="1">\n')
+        for segments in segment_chunks:
+            with profiling.span("export"):
+                if isinstance(segments, Drawing):
+                    _svg_drawing(fd, segments, world, turtle_configuration, size)
+                    continue
+                for line in polylines(segments):
+                    fd.write(f'<path d="M{_svg_points(to_pixels(line, world, size))}"/>\n')
+        fd.write("</g>\n</svg>\n")
+
+
+def _eps_points(points: np.ndarray, height: int) -> np.ndarray:
+    # PostScript's y axis points up
+    points[:, 1] = height - points[:, 1]
+    return points
+
+
+def _eps_polyline(fd: TextIO, points: np.ndarray) -> None:
+    # Keep the paths short, some interpreters limit the number of points of a path
+    for i in range(0, len(points) - 1, EPS_MAX_PATH_POINTS - 1):
+        path_points = points[i : i + EPS_MAX_PATH_POINTS].tolist()
+        fd.write("{:.2f} {:.2f} moveto ".format(*path_points[0]))
+        fd.write(" ".join(f"{x:.2f} {y:.2f} lineto" for x, y in path_points[1:]))
+        fd.write(" stroke\n")
+
+
+def _eps_drawing(
+    fd: TextIO,
+    drawing: Drawing,
+    world: tuple[float, float, float, float],
+    turtle_configuration: TurtleConfiguration,
+    size: tuple[int, int],
+) -> None:
+    height = size[1]
+    for vertices, color in zip(drawing.polygons(), drawing.polygon_colors):
+        points = _eps_points(to_pixels(vertices, world, size), height).tolist()
+        fd.write("{:.3f} {:.3f} {:.3f} setrgbcolor ".format(*turtle_configuration.color(color)))
+        fd.write("{:.2f} {:.2f} moveto ".format(*points[0]))
+        fd.write("".join(f"{x:.2f} {y:.2f} lineto " for x, y in points[1:]))
+        fd.write("closepath fill\n")
+    for width, color, segments in drawing.line_groups():
+        fd.write("{:.3f} {:.3f} {:.3f} setrgbcolor ".format(*turtle_configuration.color(color)))
+        fd.write(f"{width:g} setlinewidth\n")
+        for line in polylines(segments):
+            _eps_polyline(fd, _eps_points(to_pixels(line, world, size), height))
+    dots = _eps_points(to_pixels(drawing.dots, world, size), height)
+    for (x, y), radius, color in zip(dots, drawing.dot_radii, drawing.dot_colors):
+        fd.write("{:.3f} {:.3f} {:.3f} setrgbcolor ".format(*turtle_configuration.color(color)))
+        fd.write(f"newpath {x:.2f} {y:.2f} {radius:g} 0 360 arc fill\n")
+
+
+def write_eps(
+    segment_chunks: Iterable[np.ndarray | Drawing],
+    bounding_box: TurtleBoundingBox,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves streamed line segments to an Encapsulated PostScript file, without the Tk canvas of `LSystemTurtle`.
+
+    Args:
+        segment_chunks: `(n, 4)` arrays of the line segments `(x0, y0, x1, y1)` drawn by the turtle, or `Drawing`s.
+        bounding_box: The area visited by the turtle, used to frame the image.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in points.
+    """
+    world = world_coordinates(bounding_box)
+    width, height = size
+    with open(path, "w") as fd:
+        fd.write(f"%!PS-Adobe-3.0 EPSF-3.0\n%%BoundingBox: 0 0 {width} {height}\n%%EndComments\n")
+        fd.write("{:.3f} {:.3f} {:.3f} setrgbcolor 0 0 {} {} rectfill\n".format(*turtle_configuration.bg_color, *size))
+        fd.write(
+            "{:.3f} {:.3f} {:.3f} setrgbcolor 1 setlinewidth 1 setlinejoin\n".format(*turtle_configuration.fg_color)
+        )
+        for segments in segment_chunks:
+            with profiling.span("export"):
+                if isinstance(segments, Drawing):
+                    _eps_drawing(fd, segments, world, turtle_configuration, size)
+                    continue
+                for line in polylines(segments):
+                    _eps_polyline(fd, _eps_points(to_pixels(line, world, size), height))
+        fd.write("showpage\n%%EOF\n")
+
+
+EXPORTERS = {"png": write_png, "svg": write_svg, "eps": write_eps}
+"""The streaming exporters by file format."""
+
+
+def export_png(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves the geometry of an L-System to a PNG image.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in pixels.
+    """
+    write_png(*_chunks(geometry), turtle_configuration, path, size)
+
+
+def export_svg(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves the geometry of an L-System to an SVG image, one `<path>` element per polyline.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in pixels.
+    """
+    write_svg(*_chunks(geometry), turtle_configuration, path, size)
+
+
+def export_eps(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> None:
+    """
+    Saves the geometry of an L-System to an Encapsulated PostScript file.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in points.
+    """
+    write_eps(*_chunks(geometry), turtle_configuration, path, size)
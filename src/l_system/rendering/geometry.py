@@ -0,0 +1,1052 @@
+"""
+A vectorized (NumPy) interpreter of the turtle moves of an L-System.
+
+Instead of replaying every symbol through `turtle.RawTurtle`, the whole state is translated into arrays of move
+codes and interpreted with prefix sums. The `[` and `]` symbols are handled by scoping the prefix sums: every `]`
+receives a correction that cancels everything accumulated inside its branch, so the turtle returns to the heading and
+position it had at the matching `[`, exactly like `LSystemTurtle.push_turtle_state` and
+`LSystemTurtle.pop_turtle_state`.
+
+The supported moves are the ones of `LSystemTurtle` and the rest of the symbols described in
+https://paulbourke.net/fractals/lsys/:
+
+Character        Meaning
+   F	         Move forward by line length drawing a line
+   f	         Move forward by line length without drawing a line
+   +	         Turn left by turning angle
+   -	         Turn right by turning angle
+   [	         Push current drawing state onto stack
+   ]	         Pop current drawing state from the stack
+   |	         Reverse direction (ie: turn by 180 degrees)
+   #	         Increment the line width by line width increment
+   !	         Decrement the line width by line width increment
+   @	         Draw a dot with line width radius
+   {	         Open a polygon
+   }	         Close a polygon and fill it with fill colour
+   >	         Multiply the line length by the line length scale factor
+   <	         Divide the line length by the line length scale factor
+   &	         Swap the meaning of + and -
+   (	         Decrement turning angle by turning angle increment
+   )	         Increment turning angle by turning angle increment
+   '	         Increment the color index
+
+The line width, length scale, turning angle, swap and color index are part of the drawing state: they are scoped
+prefix sums of the counts of their symbols (`CHANNELS`), so they are computed for all the moves at once too. Instead
+of per-move pen changes, `compute_drawing` returns the width, color and length of every segment, the dots and the
+polygons as flat arrays, so the backends can draw them in batches.
+
+Most of the examples only turn by 90° or 60° and move by the forward step. Their turtle never leaves a lattice: the
+Gaussian integers `a + bi` for 90°, the Eisenstein integers `a + bω` (`ω = e^(iπ/3)`) for 60°. `lattice_trace`
+detects such states and interprets them with integer coordinates and a table of the unit step along every heading, so
+no trigonometric function is evaluated and the positions are exact, however long the state is.
+"""
+
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from l_system import profiling
+from l_system.budget import BYTES, SEGMENT_BYTES, SEGMENTS, Budget, resolve
+from l_system.parametric import ModuleStream
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.run_length import RunLengthState
+from l_system.symbol_array import SymbolArray
+
+DRAW, MOVE, LEFT, RIGHT, PUSH, POP = range(6)
+REVERSE, WIDER, NARROWER, DOT, POLYGON_BEGIN, POLYGON_END, LONGER, SHORTER, SWAP, ANGLE_DOWN, ANGLE_UP, NEXT_COLOR = (
+    range(11, 23)
+)
+UNKNOWN = 255
+
+TURTLE_MOVES: dict[str, int] = {
+    'F': DRAW,
+    'f': MOVE,
+    '+': LEFT,
+    '-': RIGHT,
+    '[': PUSH,
+    ']': POP,
+    '|': REVERSE,
+    '#': WIDER,
+    '!': NARROWER,
+    '@': DOT,
+    '{': POLYGON_BEGIN,
+    '}': POLYGON_END,
+    '>': LONGER,
+    '<': SHORTER,
+    '&': SWAP,
+    '(': ANGLE_DOWN,
+    ')': ANGLE_UP,
+    "'": NEXT_COLOR,
+}
+"""Maps the supported turtle moves to the move codes used by the interpreter."""
+
+WIDTH, SCALE, ANGLE, PARITY, COLOR = range(5)
+N_CHANNELS = 5
+CHANNELS: dict[int, tuple[int, int]] = {
+    WIDER: (WIDTH, 1),
+    NARROWER: (WIDTH, -1),
+    LONGER: (SCALE, 1),
+    SHORTER: (SCALE, -1),
+    ANGLE_UP: (ANGLE, 1),
+    ANGLE_DOWN: (ANGLE, -1),
+    SWAP: (PARITY, 1),
+    NEXT_COLOR: (COLOR, 1),
+}
+"""The channel of the drawing state every move code changes, and by how many increments."""
+
+_CHANNEL_INCREMENTS = np.zeros((256, N_CHANNELS))
+for _code, (_channel, _increment) in CHANNELS.items():
+    _CHANNEL_INCREMENTS[_code, _channel] = _increment
+_IS_MODIFIER = _CHANNEL_INCREMENTS.any(axis=1)
+
+SWEEP_BATCH_VALUES = 1 << 22
+"""How many `(move, angle)` headings `compute_sweep` computes at once, bounding its temporary arrays."""
+
+LATTICE_TOLERANCE = 1e-9
+"""How far (in degrees or forward steps) a turn or a forward move may be from the lattice, to absorb rounding."""
+
+
+@dataclass(frozen=True, eq=False)
+class Lattice:
+    """The points reachable by a turtle whose headings are multiples of `angle` and whose moves are whole steps."""
+
+    name: str
+    angle: int
+    """The angle in degrees between consecutive headings."""
+    directions: np.ndarray
+    """A `(360 // angle, 2)` integer array with the lattice coordinates of a unit step along every heading."""
+    basis: np.ndarray
+    """A `(2, 2)` array with the cartesian coordinates of the two unit vectors of the lattice."""
+
+    def to_cartesian(self, points: np.ndarray, forward_step: float) -> np.ndarray:
+        """
+        Args:
+            points: A `(..., 2)` array of lattice coordinates.
+            forward_step: The length of a unit step.
+
+        Returns:
+            The `(..., 2)` cartesian coordinates of the points.
+        """
+        return points @ (forward_step * self.basis)
+
+
+GAUSSIAN = Lattice("gaussian", 90, np.array([[1, 0], [0, 1], [-1, 0], [0, -1]]), np.eye(2))
+EISENSTEIN = Lattice(
+    "eisenstein",
+    60,
+    np.array([[1, 0], [0, 1], [-1, 1], [-1, 0], [0, -1], [1, -1]]),
+    np.array([[1.0, 0.0], [0.5, np.sqrt(3) / 2]]),
+)
+LATTICES = (GAUSSIAN, EISENSTEIN)
+"""The lattices tried by `lattice_trace`, in order."""
+
+
+@dataclass(frozen=True)
+class Geometry:
+    """The line segments drawn by the turtle while interpreting an L-System."""
+
+    segments: np.ndarray
+    """A `(n, 4)` float array where every row is a drawn line `(x0, y0, x1, y1)`."""
+    bounding_box: TurtleBoundingBox
+    """The area visited by the turtle, including its starting position."""
+
+    def __len__(self) -> int:
+        """Returns the number of drawn line segments."""
+        return len(self.segments)
+
+
+@dataclass(frozen=True)
+class Drawing:
+    """The geometry of an L-System along with the attributes of everything the turtle draws, as flat arrays."""
+
+    geometry: Geometry
+    """The drawn line segments."""
+    widths: np.ndarray
+    """The line width of every segment."""
+    colors: np.ndarray
+    """The color index of every segment, see `TurtleConfiguration.color`."""
+    lengths: np.ndarray
+    """The length of every segment."""
+    dots: np.ndarray
+    """A `(m, 2)` array with the center of every dot drawn by `@`."""
+    dot_radii: np.ndarray
+    """The radius of every dot."""
+    dot_colors: np.ndarray
+    """The color index of every dot."""
+    polygon_vertices: np.ndarray
+    """A `(v, 2)` array with the vertices of all the polygons, polygon `i` is
+    `polygon_vertices[polygon_offsets[i]:polygon_offsets[i + 1]]`."""
+    polygon_offsets: np.ndarray
+    """A `(p + 1,)` array with the index range of the vertices of every polygon."""
+    polygon_colors: np.ndarray
+    """The color index of every polygon."""
+
+    def __len__(self) -> int:
+        """Returns the number of drawn line segments."""
+        return len(self.geometry)
+
+    def line_groups(self) -> Iterator[tuple[float, int, np.ndarray]]:
+        """
+        Groups the segments by their attributes, so that a backend only sets the pen once per group.
+
+        Yields:
+            The width, the color index and the `(k, 4)` segments of every group, the segments in drawing order.
+        """
+        order = np.lexsort((self.colors, self.widths))
+        widths, colors = self.widths[order], self.colors[order]
+        breaks = np.flatnonzero((widths[1:] != widths[:-1]) | (colors[1:] != colors[:-1])) + 1
+        for group in np.split(order, breaks) if len(order) else []:
+            yield float(self.widths[group[0]]), int(self.colors[group[0]]), self.geometry.segments[group]
+
+    def polygons(self) -> list[np.ndarray]:
+        """
+        Returns:
+            The `(k, 2)` vertices of every polygon.
+        """
+        return np.split(self.polygon_vertices, self.polygon_offsets[1:-1])
+
+
+@dataclass(frozen=True)
+class LatticeGeometry:
+    """The line segments drawn by a turtle that stays on a lattice (see `lattice_trace`), in exact integer coordinates.
+    Equal segments have equal coordinates, so they can be hashed and compared exactly."""
+
+    lattice: Lattice
+    """The lattice of the coordinates."""
+    forward_step: float
+    """The length of a unit step of the lattice."""
+    segments: np.ndarray
+    """A `(n, 4)` integer array where every row is a drawn line `(a0, b0, a1, b1)` in lattice coordinates."""
+    bounding_box: TurtleBoundingBox
+    """The area visited by the turtle, including its starting position."""
+
+    def __len__(self) -> int:
+        """Returns the number of drawn line segments."""
+        return len(self.segments)
+
+    def to_geometry(self) -> Geometry:
+        """
+        Returns:
+            The segments in cartesian coordinates.
+        """
+        points = self.lattice.to_cartesian(self.segments.reshape(-1, 2, 2), self.forward_step)
+        return Geometry(points.reshape(-1, 4), self.bounding_box)
+
+
+@dataclass(frozen=True)
+class TurtleState:
+    """The state of the turtle between two chunks of a streamed L-System."""
+
+    heading: float
+    """The heading in degrees."""
+    position: np.ndarray
+    """The `(x, y)` position."""
+    channels: np.ndarray
+    """The increments of the line width, length scale, turning angle, swap and color index, see `CHANNELS`."""
+    stack: np.ndarray
+    """A `(k, 3 + len(channels))` array of the pushed `(heading, x, y, *channels)` states that have not been popped
+    yet, the oldest first."""
+
+    @classmethod
+    def initial(cls, turtle_configuration: TurtleConfiguration) -> "TurtleState":
+        """
+        Args:
+            turtle_configuration: Provides the `initial_heading_angle` of the turtle.
+
+        Returns:
+            The state of the turtle before the first move.
+        """
+        heading = float(turtle_configuration.initial_heading_angle)
+        return cls(heading, np.zeros(2), np.zeros(N_CHANNELS), np.zeros((0, 3 + N_CHANNELS)))
+
+
+def intern_symbols(state: str) -> tuple[np.ndarray, str]:
+    """
+    Converts a string of symbols to an array of small integer ids.
+
+    Args:
+        state: A string of symbols (the state of an L-System).
+
+    Returns:
+        A tuple of the symbol ids and the symbol table, where `symbols[ids[i]] == state[i]`.
+    """
+    symbols = "".join(sorted(set(state)))
+    if len(symbols) <= 256 and all(ord(s) < 256 for s in symbols):
+        # Fast path: the latin-1 encoding is already a table of byte sized ids.
+        codes = np.frombuffer(state.encode('latin-1'), dtype=np.uint8)
+        lookup = np.zeros(256, dtype=np.uint8)
+        lookup[[ord(s) for s in symbols]] = np.arange(len(symbols), dtype=np.uint8)
+        return lookup[codes], symbols
+
+    index = {s: i for i, s in enumerate(symbols)}
+    return np.fromiter((index[s] for s in state), dtype=np.int32, count=len(state)), symbols
+
+
+def move_codes(
+    symbols: Sequence[str], turtle_move_mapper: dict[str, str], turtle_moves: dict[str, int] = TURTLE_MOVES
+) -> np.ndarray:
+    """
+    Translates a symbol table to turtle move codes.
+
+    Args:
+        symbols: The symbol table of a state.
+        turtle_move_mapper: A dictionary that maps L-System symbols to turtle moves.
+        turtle_moves: The move code of every supported turtle move.
+
+    Returns:
+        An array with the move code of every symbol, `UNKNOWN` for symbols without a turtle move.
+    """
+    codes = np.full(max(len(symbols), 1), UNKNOWN, dtype=np.uint8)
+    for i, s in enumerate(symbols):
+        codes[i] = turtle_moves.get(turtle_move_mapper.get(s, s), UNKNOWN)
+    return codes
+
+
+def world_coordinates(bounding_box: TurtleBoundingBox) -> tuple[float, float, float, float]:
+    """
+    Frames a bounding box, making sure the whole L-System is visible in the window.
+
+    Args:
+        bounding_box: The area visited by the turtle.
+
+    Returns:
+        The `(llx, lly, urx, ury)` world coordinates of the lower left and upper right corners of the window, as used by
+            `turtle.TurtleScreen.setworldcoordinates`.
+    """
+    minx, miny, maxx, maxy = bounding_box.to_tuple()
+    w = maxx - minx
+    h = maxy - miny
+    epsilon = 0.00001
+    r = max(w, h) / (min(w, h) + epsilon)
+    if maxx - minx > maxy - miny:
+        return minx, miny - 1, maxx, (maxy - 1) * r
+    return minx, miny, maxx * r, maxy
+
+
+def polylines(segments: np.ndarray) -> list[np.ndarray]:
+    """
+    Chains consecutive segments that share an end point into polylines.
+
+    Args:
+        segments: A `(n, 4)` array of line segments `(x0, y0, x1, y1)`.
+
+    Returns:
+        A list of `(k, 2)` arrays of points, one per polyline.
+    """
+    if not len(segments):
+        return []
+    breaks = np.flatnonzero(np.any(segments[1:, :2] != segments[:-1, 2:], axis=1)) + 1
+    return [np.concatenate([chunk[:1, :2], chunk[:, 2:]]) for chunk in np.split(segments, breaks)]
+
+
+def _branches(moves: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int] | None:
+    """
+    Finds the branches of an array of move codes, to scope prefix sums (see `scoped_cumsum`).
+
+    Returns:
+        The positions of the `]`, the moves owned directly by a branch, the branch owning each of them, the branch
+            closed by every `]` and the number of branches. `None` when there is no `]`.
+
+    Raises:
+        IndexError: If a `]` has no matching `[`.
+    """
+    is_pop = moves == POP
+    if not is_pop.any():
+        return None
+    is_push = moves == PUSH
+    depth = np.cumsum(is_push, dtype=np.int64) - np.cumsum(is_pop, dtype=np.int64)
+    if depth.min() < 0:
+        raise IndexError("pop from empty list")
+
+    pop_pos = np.flatnonzero(is_pop)
+    n = len(moves)
+    push_pos = np.flatnonzero(is_push)
+    # Every move belongs to the innermost `[` that is open while it runs, which is the last `[` before it that
+    # opened its depth level. Sorting the pushes by (depth, position) lets us find it with a binary search.
+    keys = depth[push_pos] * (n + 1) + push_pos
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+
+    owned = np.flatnonzero(~is_push & ~is_pop & (depth > 0))
+    owner = order[np.searchsorted(keys, depth[owned] * (n + 1) + owned, side='right') - 1]
+    closes = order[np.searchsorted(keys, (depth[pop_pos] + 1) * (n + 1) + pop_pos, side='right') - 1]
+    return pop_pos, owned, owner, closes, len(push_pos)
+
+
+def scoped_cumsum(increments: np.ndarray, moves: np.ndarray, initial: np.ndarray | float = 0.0) -> np.ndarray:
+    """
+    A prefix sum of `increments` that is restored at every `]` to its value at the matching `[`.
+
+    Args:
+        increments: A `(n,)` or `(n, k)` array with the increment of every move.
+        moves: A `(n,)` array of move codes.
+        initial: The value before the first move.
+
+    Returns:
+        An array of `n + 1` rows, where row `i` is the value before move `i` and the last row is the final value.
+
+    Raises:
+        IndexError: If a `]` has no matching `[`.
+    """
+    branches = _branches(moves)
+    weights = np.array(increments, dtype=np.float64, copy=True)
+    if branches is not None:
+        pop_pos, owned, owner, closes, count = branches
+        # The net change inside a branch is the sum of the moves it owns directly, nested branches cancel out.
+        owned_weights = weights[owned].reshape(len(owned), -1)
+        branch_sums = np.stack(
+            [np.bincount(owner, weights=column, minlength=count) for column in owned_weights.T], axis=1
+        )
+        weights[pop_pos] = -branch_sums[closes].reshape((len(pop_pos),) + weights.shape[1:])
+
+    values = np.empty((len(weights) + 1,) + weights.shape[1:], dtype=np.float64)
+    values[0] = initial
+    np.cumsum(weights, axis=0, out=values[1:])
+    values[1:] += initial
+    return values
+
+
+def _scoped_rows(weights: np.ndarray, branches: tuple | None) -> np.ndarray:
+    """`scoped_cumsum` of every row of a `(k, n)` array (overwritten), starting from zero, see `_branches`."""
+    if branches is not None:
+        pop_pos, owned, owner, closes, count = branches
+        for row in weights:
+            row[pop_pos] = -np.bincount(owner, weights=row[owned], minlength=count)[closes]
+    values = np.zeros((len(weights), weights.shape[1] + 1))
+    np.cumsum(weights, axis=1, out=values[:, 1:])
+    return values
+
+
+def _run(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    turtle_state: TurtleState,
+    steps: np.ndarray | None,
+    angles: np.ndarray | None,
+    carry: bool = True,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray | None, TurtleState | None]:
+    """
+    Runs the turtle over an array of move codes, continuing from `turtle_state`.
+
+    The carried state is replayed as a synthetic prefix: a jump to every pushed state followed by a `[`, and a jump to
+    the current state. The `]` of the moves then restore the pushed states exactly like `scoped_cumsum` does within a
+    single array.
+
+    Returns:
+        The `(n + 1,)` headings, the `(n + 1, 2)` positions and the `(n + 1, N_CHANNELS)` channels (`None` when no
+            move changes them) before every move and after the last one, followed by the state of the turtle after the
+            last move (`None` unless `carry`).
+    """
+    if len(moves) and moves.max() == UNKNOWN:
+        raise KeyError("Found symbols that are not turtle moves!")
+
+    heading_and_position = [turtle_state.heading, *turtle_state.position]
+    carried = np.vstack([turtle_state.stack, [[*heading_and_position, *turtle_state.channels]]])
+    jumps = np.diff(carried, axis=0, prepend=np.zeros((1, 3 + N_CHANNELS)))
+    k = len(turtle_state.stack)
+    prefix = 2 * k + 1
+    all_moves = np.concatenate([np.tile(np.array([MOVE, PUSH], dtype=np.uint8), k), [MOVE], moves]).astype(np.uint8)
+
+    angles = turtle_configuration.angle if angles is None else angles
+    steps = turtle_configuration.forward_step if steps is None else steps
+    channels = None
+    if carried[:, 3:].any() or _IS_MODIFIER[moves].any():
+        increments = np.zeros((len(all_moves), N_CHANNELS))
+        increments[:prefix:2] = jumps[:, 3:]
+        increments[prefix:] = _CHANNEL_INCREMENTS[moves]
+        channels = scoped_cumsum(increments, all_moves)
+        current = channels[prefix:-1]
+        angles = angles + turtle_configuration.angle_increment * current[:, ANGLE]
+        # `&` swaps the meaning of `+` and `-`, every odd number of swaps turns the other way
+        angles = angles * (1 - 2 * (current[:, PARITY] % 2))
+        steps = steps * turtle_configuration.length_scale_factor ** current[:, SCALE]
+
+    turns = np.zeros(len(all_moves))
+    turns[:prefix:2] = jumps[:, 0]
+    turns[prefix:] = np.where(moves == LEFT, angles, 0.0) - np.where(moves == RIGHT, angles, 0.0)
+    turns[prefix:] += np.where(moves == REVERSE, 180.0, 0.0)
+    headings = scoped_cumsum(turns, all_moves)
+
+    distances = np.where((moves == DRAW) | (moves == MOVE), steps, 0.0)
+    radians = np.radians(headings[prefix:-1])
+    deltas = np.zeros((len(all_moves), 2))
+    deltas[:prefix:2] = jumps[:, 1:3]
+    deltas[prefix:] = np.stack([distances * np.cos(radians), distances * np.sin(radians)], axis=1)
+    positions = scoped_cumsum(deltas, all_moves, np.zeros(2))
+
+    next_state = None
+    if carry:
+        # The open `[` of every depth level is the last `[` that reached it, any later `]` closing it would have to be
+        # followed by another `[` to reach the final depth again.
+        is_push = all_moves == PUSH
+        depth = np.cumsum(is_push, dtype=np.int64) - np.cumsum(all_moves == POP, dtype=np.int64)
+        push_pos = np.flatnonzero(is_push)
+        n = len(all_moves)
+        keys = np.sort(depth[push_pos] * (n + 1) + push_pos)
+        levels = np.arange(1, depth[-1] + 1)
+        open_pos = keys[np.searchsorted(keys, (levels + 1) * (n + 1)) - 1] % (n + 1)
+        final_channels = np.zeros((len(all_moves) + 1, N_CHANNELS)) if channels is None else channels
+        stack = np.concatenate([headings[open_pos, None], positions[open_pos], final_channels[open_pos]], axis=1)
+        next_state = TurtleState(float(headings[-1]), positions[-1], final_channels[-1], stack)
+
+    chunk_channels = None if channels is None else channels[prefix:]
+    return headings[prefix:], positions[prefix:], chunk_channels, next_state
+
+
+def trace(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Computes the positions of the turtle while it interprets an array of turtle move codes.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+
+    Returns:
+        A `(n + 1, 2)` array, where row `i` is the position of the turtle before move `i`. Exact when the turtle stays
+            on a lattice, see `lattice_trace`.
+    """
+    on_lattice = lattice_trace(moves, turtle_configuration, steps, angles)
+    if on_lattice is not None:
+        lattice, points = on_lattice
+        return lattice.to_cartesian(points, turtle_configuration.forward_step)
+    initial = TurtleState.initial(turtle_configuration)
+    return _run(moves, turtle_configuration, initial, steps, angles, carry=False)[1]
+
+
+def _whole(values: np.ndarray | float, unit: float) -> np.ndarray | None:
+    """`values` in `unit`s, `None` unless they are all whole."""
+    units = np.rint(np.asarray(values, dtype=np.float64) / unit)
+    return units if np.all(np.abs(units * unit - values) <= LATTICE_TOLERANCE) else None
+
+
+def _scoped_integers(increments: np.ndarray, branches: tuple | None, initial: int = 0) -> np.ndarray:
+    """`scoped_cumsum` of integer increments, exact in `int64`, see `_branches`."""
+    weights = increments.astype(np.int64)
+    if branches is not None:
+        pop_pos, owned, owner, closes, count = branches
+        # `bincount` sums in `float64`, which is exact for integers up to 2 ** 53
+        weights[pop_pos] = -np.bincount(owner, weights=weights[owned], minlength=count)[closes].astype(np.int64)
+    values = np.empty(len(weights) + 1, dtype=np.int64)
+    values[0] = initial
+    np.cumsum(weights, out=values[1:])
+    values[1:] += initial
+    return values
+
+
+def lattice_trace(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> tuple[Lattice, np.ndarray] | None:
+    """
+    Computes the positions of the turtle on a lattice, when its initial heading and all its turns are multiples of one
+    of the `LATTICES` angles and all its forward moves are whole multiples of the `forward_step`.
+
+    The heading is the scoped sum of the turns counted in lattice angles, modulo the number of directions, and every
+    forward move adds a whole number of unit steps along its heading. Both prefix sums only add integers, so they are
+    exact.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+
+    Returns:
+        The lattice and a `(n + 1, 2)` integer array, where row `i` is the position of the turtle before move `i` in
+            lattice coordinates. `None` if the turtle leaves the lattices.
+
+    Raises:
+        KeyError: If a move code is `UNKNOWN`.
+    """
+    if len(moves) and moves.max() == UNKNOWN:
+        raise KeyError("Found symbols that are not turtle moves!")
+    if not turtle_configuration.forward_step:
+        return None
+
+    angles = turtle_configuration.angle if angles is None else angles
+    steps = turtle_configuration.forward_step if steps is None else steps
+    if _IS_MODIFIER[moves].any():
+        channels = scoped_cumsum(_CHANNEL_INCREMENTS[moves], moves)[:-1]
+        angles = angles + turtle_configuration.angle_increment * channels[:, ANGLE]
+        angles = angles * (1 - 2 * (channels[:, PARITY] % 2))
+        steps = steps * turtle_configuration.length_scale_factor ** channels[:, SCALE]
+
+    forward = (moves == DRAW) | (moves == MOVE)
+    lengths = None
+    if np.ndim(steps):
+        lengths = _whole(np.where(forward, steps, 0.0), turtle_configuration.forward_step)
+        if lengths is None:
+            return None
+    elif _whole(steps, turtle_configuration.forward_step) != 1:
+        return None
+
+    for lattice in LATTICES:
+        initial = _whole(turtle_configuration.initial_heading_angle, lattice.angle)
+        if initial is None:
+            continue
+        if np.ndim(angles):
+            turns = np.where(moves == LEFT, angles, 0.0) - np.where(moves == RIGHT, angles, 0.0)
+            units = _whole(turns + np.where(moves == REVERSE, 180.0, 0.0), lattice.angle)
+        elif (unit := _whole(angles, lattice.angle)) is not None:
+            # A table of the turn of every move code, so that a single lookup counts the turns
+            table = np.zeros(256, dtype=np.int64)
+            table[[LEFT, RIGHT, REVERSE]] = int(unit), -int(unit), 180 // lattice.angle
+            units = table[moves]
+        else:
+            units = None
+        if units is not None:
+            break
+    else:
+        return None
+
+    branches = _branches(moves)
+    headings = _scoped_integers(units, branches, int(initial))[:-1] % len(lattice.directions)
+    # Moves that don't go forward take the zero step of the last row
+    headings[~forward] = len(lattice.directions)
+    directions = np.vstack([lattice.directions, [0, 0]])
+    deltas = [directions[:, axis][headings] for axis in (0, 1)]
+    if lengths is not None:
+        deltas = [d * lengths.astype(np.int64) for d in deltas]
+    return lattice, np.stack([_scoped_integers(d, branches) for d in deltas], axis=1)
+
+
+def interpret(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> Geometry:
+    """
+    Interprets an array of turtle move codes.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+
+    Returns:
+        The `Geometry` drawn by the turtle.
+    """
+    positions = trace(moves, turtle_configuration, steps, angles)
+    drawn = np.flatnonzero(moves == DRAW)
+    segments = np.concatenate([positions[drawn], positions[drawn + 1]], axis=1)
+    return Geometry(segments, _bounding_box(positions))
+
+
+def interpret_chunk(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    turtle_state: TurtleState,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> tuple[Geometry, TurtleState]:
+    """
+    Interprets one chunk of the move codes of a streamed L-System, continuing from the state the previous chunk left the
+    turtle in.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step` and `angle` of the turtle.
+        turtle_state: The state of the turtle before the first move of the chunk.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+
+    Returns:
+        The `Geometry` drawn by the chunk and the state of the turtle after its last move.
+
+    Raises:
+        KeyError: If the chunk contains symbols that are not turtle moves.
+        IndexError: If a `]` has no matching `[`, in this chunk or the previous ones.
+    """
+    _, positions, _, next_state = _run(moves, turtle_configuration, turtle_state, steps, angles)
+    drawn = np.flatnonzero(moves == DRAW)
+    segments = np.concatenate([positions[drawn], positions[drawn + 1]], axis=1)
+    return Geometry(segments, _bounding_box(positions)), next_state
+
+
+def _polygons(moves: np.ndarray, positions: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Collects the vertices of the polygons: the position at every `{` and after every forward move of the innermost open
+    polygon. Polygons can be nested and a polygon that is never closed is kept.
+
+    Returns:
+        The `(v, 2)` vertices, the `(p + 1,)` offsets of the polygons and the position of their `{` in `moves`.
+
+    Raises:
+        IndexError: If a `}` has no matching `{`.
+    """
+    is_begin = moves == POLYGON_BEGIN
+    depth = np.cumsum(is_begin, dtype=np.int64) - np.cumsum(moves == POLYGON_END, dtype=np.int64)
+    if len(depth) and depth.min() < 0:
+        raise IndexError("Found a '}' without a matching '{'!")
+
+    begins = np.flatnonzero(is_begin)
+    n = len(moves)
+    keys = depth[begins] * (n + 1) + begins
+    order = np.argsort(keys, kind='stable')
+    forward = np.flatnonzero(((moves == DRAW) | (moves == MOVE)) & (depth > 0))
+    owner = order[np.searchsorted(keys[order], depth[forward] * (n + 1) + forward, side='right') - 1]
+
+    # Every polygon starts at its `{`, followed by its vertices in drawing order
+    vertex_owner = np.concatenate([np.arange(len(begins)), owner])
+    vertex_index = np.concatenate([begins, forward + 1])
+    vertex_index = vertex_index[np.lexsort((vertex_index, vertex_owner))]
+    offsets = np.zeros(len(begins) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=len(begins)) + 1, out=offsets[1:])
+    return positions[vertex_index], offsets, begins
+
+
+def interpret_drawing(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> Drawing:
+    """
+    Interprets an array of turtle move codes, along with the line width, color, dots and polygons of the drawing.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The turtle and the drawing attributes, e.g. `line_width` and `palette`.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+
+    Returns:
+        The `Drawing` of the turtle.
+
+    Raises:
+        KeyError: If there are symbols that are not turtle moves.
+        IndexError: If a `]` or `}` has no matching `[` or `{`.
+    """
+    initial = TurtleState.initial(turtle_configuration)
+    _, positions, channels, _ = _run(moves, turtle_configuration, initial, steps, angles, carry=False)
+    if channels is None:
+        channels = np.zeros((1, N_CHANNELS))
+        channel_index = np.zeros(len(moves), dtype=np.int64)
+    else:
+        channel_index = np.arange(len(moves))
+
+    def widths(at: np.ndarray) -> np.ndarray:
+        units = channels[channel_index[at], WIDTH]
+        return np.maximum(turtle_configuration.line_width + turtle_configuration.line_width_increment * units, 0.0)
+
+    def colors(at: np.ndarray) -> np.ndarray:
+        return channels[channel_index[at], COLOR].astype(np.int64)
+
+    drawn = np.flatnonzero(moves == DRAW)
+    segments = np.concatenate([positions[drawn], positions[drawn + 1]], axis=1)
+    dots = np.flatnonzero(moves == DOT)
+    vertices, offsets, begins = _polygons(moves, positions)
+    return Drawing(
+        geometry=Geometry(segments, _bounding_box(positions)),
+        widths=widths(drawn),
+        colors=colors(drawn),
+        lengths=np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]),
+        dots=positions[dots],
+        dot_radii=widths(dots),
+        dot_colors=colors(dots),
+        polygon_vertices=vertices,
+        polygon_offsets=offsets,
+        polygon_colors=colors(begins),
+    )
+
+
+def merge_bounding_boxes(bounding_boxes: Iterable[TurtleBoundingBox]) -> TurtleBoundingBox:
+    """
+    Args:
+        bounding_boxes: The bounding boxes of the chunks of a streamed L-System.
+
+    Returns:
+        The smallest bounding box containing all of them.
+    """
+    boxes = np.array([b.to_tuple() for b in bounding_boxes]).reshape(-1, 4)
+    if not len(boxes):
+        return TurtleBoundingBox(0, 0, 0, 0)
+    x_min, y_min = boxes[:, :2].min(axis=0)
+    x_max, y_max = boxes[:, 2:].max(axis=0)
+    return TurtleBoundingBox(float(x_min), float(y_min), float(x_max), float(y_max))
+
+
+def _bounding_box(positions: np.ndarray) -> TurtleBoundingBox:
+    x_min, y_min = positions.min(axis=0)
+    x_max, y_max = positions.max(axis=0)
+    return TurtleBoundingBox(float(x_min), float(y_min), float(x_max), float(y_max))
+
+
+def state_moves(
+    state: str | SymbolArray | RunLengthState | ModuleStream,
+    turtle_configuration: TurtleConfiguration,
+    turtle_moves: dict[str, int] = TURTLE_MOVES,
+) -> tuple[np.ndarray, np.ndarray | None, np.ndarray | None]:
+    """
+    Translates a state of an L-System to turtle move codes.
+
+    The first parameter of a parametric module is used as the distance of `F` and `f` and as the angle of `+` and
+    `-`, modules without parameters fall back to the `forward_step` and `angle` of the `turtle_configuration`.
+    A run of `k` identical forward moves or turns of a `RunLengthState` is interpreted as a single move `k` times as
+    long (or wide), the runs of the rest of the moves are repeated. So are the runs of turns of a state that changes the
+    turning angle with `(` or `)`, whose increment is added to every turn.
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream` (the state of an
+            L-System). Their symbol ids are interpreted directly, without any conversion.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+        turtle_moves: The move code of every supported turtle move.
+
+    Returns:
+        The move codes, followed by the distance of every forward move and the angle of every turn, `None` when they
+            are the defaults of the `turtle_configuration`.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    if isinstance(state, str):
+        ids, symbols = intern_symbols(state)
+    else:
+        ids, symbols = state.ids, state.symbols
+
+    codes = move_codes(symbols, turtle_configuration.turtle_move_mapper, turtle_moves)
+    used = np.zeros(len(codes), dtype=bool)
+    used[ids] = True
+    unknown = [s for s, c, u in zip(symbols, codes, used) if u and c == UNKNOWN]
+    if unknown:
+        raise KeyError(f"{unknown[0]} not found!")
+    moves = codes[ids]
+
+    if isinstance(state, RunLengthState):
+        # Only runs of forward moves and turns can be merged to a single move, the rest of the runs are expanded. The
+        # turning angle increment is added to every turn, so the runs of turns are expanded too when it may change.
+        turns = (moves == LEFT) | (moves == RIGHT)
+        if np.any((moves == ANGLE_DOWN) | (moves == ANGLE_UP)):
+            turns[:] = False
+        mergeable = (moves == DRAW) | (moves == MOVE) | turns
+        repeats = np.where(mergeable, 1, state.counts)
+        moves, counts = np.repeat(moves, repeats), np.repeat(np.where(mergeable, state.counts, 1), repeats)
+        return moves, counts * float(turtle_configuration.forward_step), counts * float(turtle_configuration.angle)
+
+    if not isinstance(state, ModuleStream) or state.params.shape[1] == 0:
+        return moves, None, None
+
+    first = np.where(state.arity > 0, state.params[:, 0], np.nan)
+    steps = np.where(np.isnan(first), turtle_configuration.forward_step, first)
+    angles = np.where(np.isnan(first), turtle_configuration.angle, first)
+    return moves, steps, angles
+
+
+def check_segments(moves: np.ndarray, budget: Budget | None = None) -> None:
+    """
+    Checks the segments drawn by turtle moves, and the memory of their coordinates, against a budget before the moves
+    are interpreted.
+
+    Args:
+        moves: The turtle move codes.
+        budget: The budget, defaults to `l_system.budget.default_budget()`.
+
+    Raises:
+        BudgetExceeded: If the segments would exceed the budget.
+    """
+    budget = resolve(budget)
+    if budget.max_segments is not None or budget.max_bytes is not None:
+        drawn = int(np.count_nonzero(moves == DRAW))
+        budget.check(SEGMENTS, drawn)
+        budget.check(BYTES, drawn * SEGMENT_BYTES)
+
+
+def compute_geometry(
+    state: str | SymbolArray | RunLengthState | ModuleStream,
+    turtle_configuration: TurtleConfiguration,
+    budget: Budget | None = None,
+) -> Geometry:
+    """
+    Computes the line segments the turtle draws for a state of an L-System (see `state_moves`).
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+        budget: The resources the interpretation may use, defaults to `l_system.budget.default_budget()`.
+
+    Returns:
+        The `Geometry` drawn by the turtle.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        BudgetExceeded: If the segments would exceed the `budget`, checked before the state is interpreted.
+    """
+    with profiling.span("geometry"):
+        moves, steps, angles = state_moves(state, turtle_configuration)
+        check_segments(moves, budget)
+        geometry = interpret(moves, turtle_configuration, steps, angles)
+    profiling.count("segments", len(geometry))
+    return geometry
+
+
+def compute_drawing(
+    state: str | SymbolArray | RunLengthState | ModuleStream,
+    turtle_configuration: TurtleConfiguration,
+    budget: Budget | None = None,
+) -> Drawing:
+    """
+    Computes everything the turtle draws for a state of an L-System (see `state_moves`), including the line widths,
+    colors, dots and polygons of the full turtle symbol set.
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+        budget: The resources the interpretation may use, defaults to `l_system.budget.default_budget()`.
+
+    Returns:
+        The `Drawing` of the turtle.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        BudgetExceeded: If the segments would exceed the `budget`, checked before the state is interpreted.
+    """
+    with profiling.span("geometry"):
+        moves, steps, angles = state_moves(state, turtle_configuration)
+        check_segments(moves, budget)
+        drawing = interpret_drawing(moves, turtle_configuration, steps, angles)
+    profiling.count("segments", len(drawing))
+    return drawing
+
+
+def compute_bounding_box(
+    state: str | SymbolArray | RunLengthState | ModuleStream, turtle_configuration: TurtleConfiguration
+) -> TurtleBoundingBox:
+    """
+    Computes the area visited by the turtle for a state of an L-System, without collecting the drawn segments.
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+
+    Returns:
+        The bounding box of the turtle, including its starting position.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    with profiling.span("bounding_box"):
+        moves, steps, angles = state_moves(state, turtle_configuration)
+        return _bounding_box(trace(moves, turtle_configuration, steps, angles))
+
+
+def compute_lattice_geometry(
+    state: str | SymbolArray | RunLengthState | ModuleStream, turtle_configuration: TurtleConfiguration
+) -> LatticeGeometry | None:
+    """
+    Computes the line segments the turtle draws for a state of an L-System in exact lattice coordinates.
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+
+    Returns:
+        The `LatticeGeometry` drawn by the turtle, `None` if the turtle leaves the lattices (see `lattice_trace`).
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    with profiling.span("geometry"):
+        moves, steps, angles = state_moves(state, turtle_configuration)
+        on_lattice = lattice_trace(moves, turtle_configuration, steps, angles)
+        if on_lattice is None:
+            return None
+        lattice, points = on_lattice
+        drawn = np.flatnonzero(moves == DRAW)
+        segments = np.concatenate([points[drawn], points[drawn + 1]], axis=1)
+        bounding_box = _bounding_box(lattice.to_cartesian(points, turtle_configuration.forward_step))
+    profiling.count("segments", len(segments))
+    return LatticeGeometry(lattice, turtle_configuration.forward_step, segments, bounding_box)
+
+
+def compute_sweep(
+    state: str | SymbolArray | RunLengthState | ModuleStream,
+    turtle_configuration: TurtleConfiguration,
+    angles: Sequence[float],
+    forward_steps: Sequence[float] | None = None,
+) -> Iterator[Geometry]:
+    """
+    Computes the line segments the turtle draws for a state of an L-System with every combination of turning angle and
+    forward step, sharing the work between them.
+
+    The heading before every move is `initial + a * angle + b`: `a` is the scoped count of the turns by the turning
+    angle and `b` the scoped sum of the rest of the turns (`|`, the parameters of parametric modules and the turning
+    angle increments). Neither depends on the angle, so they are computed once. The positions of a batch of angles are
+    then a single `(k, n)` scoped prefix sum. The distance of every move is linear in the forward step, so the steps
+    only scale the positions computed for an angle.
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`, except for its `angle` and
+            `forward_step`.
+        angles: The turning angles in degrees.
+        forward_steps: The forward steps, defaults to the `forward_step` of the `turtle_configuration`.
+
+    Yields:
+        The `Geometry` of every `(angle, forward_step)` combination, the steps varying fastest.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    forward_steps = [turtle_configuration.forward_step] if forward_steps is None else forward_steps
+    # The distance and the angle of every move are linear in `forward_step` and `angle`
+    moves, unit_steps, unit_angles = state_moves(state, replace(turtle_configuration, forward_step=1, angle=1))
+    if unit_steps is None:
+        proportional_steps, fixed_steps = np.ones(len(moves)), None
+        proportional_angles, fixed_angles = np.ones(len(moves)), np.zeros(len(moves))
+    else:
+        _, fixed_steps, fixed_angles = state_moves(state, replace(turtle_configuration, forward_step=0, angle=0))
+        proportional_steps, proportional_angles = unit_steps - fixed_steps, unit_angles - fixed_angles
+        fixed_steps = fixed_steps if fixed_steps.any() else None
+
+    direction = (moves == LEFT).astype(np.float64) - (moves == RIGHT)
+    if _IS_MODIFIER[moves].any():
+        channels = scoped_cumsum(_CHANNEL_INCREMENTS[moves], moves)[:-1]
+        fixed_angles = fixed_angles + turtle_configuration.angle_increment * channels[:, ANGLE]
+        direction *= 1 - 2 * (channels[:, PARITY] % 2)
+        scale = turtle_configuration.length_scale_factor ** channels[:, SCALE]
+        proportional_steps = proportional_steps * scale
+        fixed_steps = None if fixed_steps is None else fixed_steps * scale
+
+    with profiling.span("geometry"):
+        branches = _branches(moves)
+        turns = scoped_cumsum(direction * proportional_angles, moves)[:-1]
+        fixed_turns = np.where(moves == REVERSE, 180.0, 0.0) + direction * fixed_angles
+        headings = scoped_cumsum(fixed_turns, moves, float(turtle_configuration.initial_heading_angle))[:-1]
+        forward = (moves == DRAW) | (moves == MOVE)
+        distances = [np.where(forward, proportional_steps, 0.0)]
+        if fixed_steps is not None:
+            distances.append(np.where(forward, fixed_steps, 0.0))
+        drawn = np.flatnonzero(moves == DRAW)
+
+    batch = max(1, SWEEP_BATCH_VALUES // max(len(moves), 1))
+    for first in range(0, len(angles), batch):
+        with profiling.span("geometry"):
+            # A row per angle, so that the prefix sums run over contiguous memory
+            radians = np.radians(np.multiply.outer(np.asarray(angles[first : first + batch], dtype=np.float64), turns))
+            radians += np.radians(headings)
+            cos, sin = np.cos(radians), np.sin(radians)
+            # The `x` and `y` positions of every angle for the distances proportional to the forward step, then for the
+            # fixed ones
+            positions = [_scoped_rows(d * trig, branches) for d in distances for trig in (cos, sin)]
+        for k in range(len(radians)):
+            x, y = positions[0][k], positions[1][k]
+            for step in forward_steps:
+                px, py = step * x, step * y
+                if fixed_steps is not None:
+                    px, py = px + positions[2][k], py + positions[3][k]
+                segments = np.stack([px[drawn], py[drawn], px[drawn + 1], py[drawn + 1]], axis=1)
+                profiling.count("segments", len(segments))
+                bounding_box = TurtleBoundingBox(float(px.min()), float(py.min()), float(px.max()), float(py.max()))
+                yield Geometry(segments, bounding_box)
@@ -0,0 +1,313 @@
+"""
+A vectorized (NumPy) 3D interpreter of the turtle moves of an L-System.
+
+The orientation of the turtle is a frame of three unit vectors, its heading `H`, left `L` and up `U`, stored as the
+columns of a rotation matrix. Every rotating symbol right-multiplies the frame by a rotation about one of its own axes:
+
+Character        Meaning
+   F	         Move forward by line length drawing a line
+   f	         Move forward by line length without drawing a line
+   +	         Turn left by turning angle, around `U`
+   -	         Turn right by turning angle, around `U`
+   &	         Pitch down by turning angle, around `L`
+   ^	         Pitch up by turning angle, around `L`
+   \\	         Roll left by turning angle, around `H`
+   /	         Roll right by turning angle, around `H`
+   |	         Turn around, i.e. turn by 180 degrees around `U`
+   [	         Push current drawing state onto stack
+   ]	         Pop current drawing state from the stack
+
+The orientation after a move is the orientation after its parent move times the rotation of the move, where the parent
+of a `]` is the move preceding its matching `[`. These products along parent pointers are composed for all the moves at
+once by pointer jumping, with `O(log n)` batched `(n, 3, 3)` matrix products. The positions are then a scoped prefix sum
+of the steps along the headings, exactly like the 2D interpreter of `l_system.rendering.geometry`.
+
+The turtle starts at the origin in the `xy` plane, heading `initial_heading_angle` degrees from the `x` axis with `U`
+pointing to `+z`, so an L-System without 3D symbols draws the same segments (with `z = 0`) as in 2D.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from l_system import profiling
+from l_system.parametric import ModuleStream
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.geometry import (
+    DRAW,
+    LEFT,
+    MOVE,
+    POP,
+    PUSH,
+    RIGHT,
+    UNKNOWN,
+    Geometry,
+    scoped_cumsum,
+    state_moves,
+)
+from l_system.symbol_array import SymbolArray
+
+PITCH_DOWN, PITCH_UP, ROLL_LEFT, ROLL_RIGHT, TURN_AROUND = range(6, 11)
+
+TURTLE_MOVES_3D: dict[str, int] = {
+    'F': DRAW,
+    'f': MOVE,
+    '+': LEFT,
+    '-': RIGHT,
+    '[': PUSH,
+    ']': POP,
+    '&': PITCH_DOWN,
+    '^': PITCH_UP,
+    '\\': ROLL_LEFT,
+    '/': ROLL_RIGHT,
+    '|': TURN_AROUND,
+}
+"""Maps the supported 3D turtle moves to the move codes used by the interpreter."""
+
+_AXES = {LEFT: 2, RIGHT: 2, TURN_AROUND: 2, PITCH_DOWN: 1, PITCH_UP: 1, ROLL_LEFT: 0, ROLL_RIGHT: 0}
+"""The frame axis (`H`, `L` or `U`) every rotation turns around."""
+_SIGNS = {LEFT: 1.0, RIGHT: -1.0, TURN_AROUND: 1.0, PITCH_DOWN: 1.0, PITCH_UP: -1.0, ROLL_LEFT: 1.0, ROLL_RIGHT: -1.0}
+
+
+@dataclass(frozen=True)
+class Projection:
+    """Projects 3D geometry to the plane of the 2D renderers and exporters."""
+
+    azimuth: float = 0.0
+    """Rotation in degrees of the scene around the vertical (`y`) axis of the view."""
+    elevation: float = 0.0
+    """Rotation in degrees of the scene around the horizontal (`x`) axis of the view."""
+    distance: float | None = None
+    """The distance of a perspective camera from the center of the scene, `None` for an orthographic projection."""
+
+    def view_matrix(self) -> np.ndarray:
+        """
+        Returns:
+            The `(3, 3)` rotation of the scene, the view looks along `-z`.
+        """
+        a, e = np.radians(self.azimuth), np.radians(self.elevation)
+        azimuth = np.array([[np.cos(a), 0, np.sin(a)], [0, 1, 0], [-np.sin(a), 0, np.cos(a)]])
+        elevation = np.array([[1, 0, 0], [0, np.cos(e), -np.sin(e)], [0, np.sin(e), np.cos(e)]])
+        return elevation @ azimuth
+
+    def __call__(self, points: np.ndarray, center: np.ndarray) -> np.ndarray:
+        """
+        Projects points to the view plane.
+
+        Args:
+            points: A `(..., 3)` array of points.
+            center: The center of the scene, the perspective is relative to it.
+
+        Returns:
+            A `(..., 2)` array of projected points.
+
+        Raises:
+            ValueError: If a point is behind a perspective camera.
+        """
+        view = (points - center) @ self.view_matrix().T
+        if self.distance is None:
+            return view[..., :2] + center[:2]
+        depth = self.distance - view[..., 2]
+        if len(depth.ravel()) and depth.min() <= 0:
+            raise ValueError(f"The camera at distance {self.distance} is inside the scene, move it further away.")
+        return view[..., :2] * (self.distance / depth)[..., None] + center[:2]
+
+
+ORTHOGRAPHIC = Projection()
+"""An orthographic projection on the `xy` plane."""
+
+
+@dataclass(frozen=True)
+class Geometry3D:
+    """The 3D line segments drawn by the turtle while interpreting an L-System."""
+
+    segments: np.ndarray
+    """A `(n, 6)` float array where every row is a drawn line `(x0, y0, z0, x1, y1, z1)`."""
+    bounds: np.ndarray
+    """A `(2, 3)` array with the minimum and maximum coordinates visited by the turtle."""
+
+    def __len__(self) -> int:
+        """Returns the number of drawn line segments."""
+        return len(self.segments)
+
+    @property
+    def vertices(self) -> np.ndarray:
+        """A `(2 * n, 3)` view of the start and end points of the segments, two consecutive vertices per line."""
+        return self.segments.reshape(-1, 3)
+
+    def project(self, projection: Projection = ORTHOGRAPHIC) -> Geometry:
+        """
+        Projects the segments for the 2D renderers and exporters.
+
+        Args:
+            projection: The view of the scene.
+
+        Returns:
+            The projected `Geometry`, its bounding box is the one of the projected segments.
+        """
+        center = self.bounds.mean(axis=0)
+        segments = projection(self.segments.reshape(-1, 2, 3), center).reshape(-1, 4)
+        points = segments.reshape(-1, 2) if len(segments) else projection(self.bounds, center)
+        (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+        return Geometry(segments, TurtleBoundingBox(float(x_min), float(y_min), float(x_max), float(y_max)))
+
+
+def initial_frame(turtle_configuration: TurtleConfiguration) -> np.ndarray:
+    """
+    Args:
+        turtle_configuration: Provides the `initial_heading_angle` of the turtle.
+
+    Returns:
+        The `(3, 3)` frame of the turtle before the first move, with the `H`, `L` and `U` vectors as columns.
+    """
+    h = np.radians(turtle_configuration.initial_heading_angle)
+    return np.array([[np.cos(h), -np.sin(h), 0.0], [np.sin(h), np.cos(h), 0.0], [0.0, 0.0, 1.0]])
+
+
+def rotations(moves: np.ndarray, angles: np.ndarray | float) -> np.ndarray:
+    """
+    Computes the rotation of every move in the frame of the turtle.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        angles: The angle in degrees of every rotation, a scalar or a `(n,)` array.
+
+    Returns:
+        A `(n, 3, 3)` array of rotation matrices, the identity for moves that don't rotate the turtle.
+    """
+    angles = np.broadcast_to(np.asarray(angles, dtype=np.float64), moves.shape)
+    radians = np.zeros(len(moves))
+    axes = np.full(len(moves), -1)
+    for move, axis in _AXES.items():
+        selected = moves == move
+        radians[selected] = np.radians(180.0 if move == TURN_AROUND else angles[selected] * _SIGNS[move])
+        axes[selected] = axis
+
+    cos, sin = np.cos(radians), np.sin(radians)
+    matrices = np.zeros((len(moves), 3, 3))
+    matrices[:, 0, 0] = matrices[:, 1, 1] = matrices[:, 2, 2] = 1.0
+    # A positive turn around `U` moves `H` towards `L`, a positive pitch around `L` moves `H` towards `-U` and a
+    # positive roll around `H` moves `L` towards `U`. The columns of the matrices are the rotated `H`, `L` and `U` in
+    # the frame of the turtle.
+    for axis, (i, j) in ((2, (0, 1)), (1, (2, 0)), (0, (1, 2))):
+        selected = axes == axis
+        matrices[selected, i, i] = cos[selected]
+        matrices[selected, j, j] = cos[selected]
+        matrices[selected, j, i] = sin[selected]
+        matrices[selected, i, j] = -sin[selected]
+    return matrices
+
+
+def matching_pushes(moves: np.ndarray) -> np.ndarray:
+    """
+    Finds the `[` every `]` closes.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+
+    Returns:
+        The position of the matching `[` of every `]`, in the order of the `]`.
+
+    Raises:
+        IndexError: If a `]` has no matching `[`.
+    """
+    is_push = moves == PUSH
+    is_pop = moves == POP
+    depth = np.cumsum(is_push, dtype=np.int64) - np.cumsum(is_pop, dtype=np.int64)
+    if len(depth) and depth.min() < 0:
+        raise IndexError("pop from empty list")
+    n = len(moves)
+    push_pos, pop_pos = np.flatnonzero(is_push), np.flatnonzero(is_pop)
+    # The `[` closed by a `]` is the last `[` before it that opened the depth level the `]` returns from
+    keys = depth[push_pos] * (n + 1) + push_pos
+    order = np.argsort(keys, kind='stable')
+    return push_pos[order[np.searchsorted(keys[order], (depth[pop_pos] + 1) * (n + 1) + pop_pos, side='right') - 1]]
+
+
+def orientations(moves: np.ndarray, angles: np.ndarray | float, frame: np.ndarray) -> np.ndarray:
+    """
+    Computes the frame of the turtle before every move.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        angles: The angle in degrees of every rotation, a scalar or a `(n,)` array.
+        frame: The `(3, 3)` frame of the turtle before the first move.
+
+    Returns:
+        A `(n + 1, 3, 3)` array, where entry `i` is the frame before move `i` and the last entry is the final frame.
+    """
+    n = len(moves)
+    products = rotations(moves, angles)
+    parents = np.arange(n) - 1
+    pop_pos = np.flatnonzero(moves == POP)
+    parents[pop_pos] = matching_pushes(moves) - 1
+
+    # Pointer jumping: after every round `products[i]` is the product of the rotations from the (new) parent of `i`
+    # (exclusive) to `i` (inclusive), and the distance to the parent doubles.
+    active = np.flatnonzero(parents >= 0)
+    while len(active):
+        ancestors = parents[active]
+        products[active] = products[ancestors] @ products[active]
+        parents[active] = parents[ancestors]
+        active = active[parents[active] >= 0]
+
+    frames = np.empty((n + 1, 3, 3))
+    frames[0] = frame
+    frames[1:] = frame @ products
+    return frames
+
+
+def interpret3d(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+) -> Geometry3D:
+    """
+    Interprets an array of 3D turtle move codes.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every rotation, defaults to `angle`.
+
+    Returns:
+        The `Geometry3D` drawn by the turtle.
+    """
+    if len(moves) and moves.max() == UNKNOWN:
+        raise KeyError("Found symbols that are not turtle moves!")
+
+    angles = turtle_configuration.angle if angles is None else angles
+    headings = orientations(moves, angles, initial_frame(turtle_configuration))[:-1, :, 0]
+    steps = turtle_configuration.forward_step if steps is None else steps
+    distances = np.where((moves == DRAW) | (moves == MOVE), steps, 0.0)
+    positions = scoped_cumsum(distances[:, None] * headings, moves, np.zeros(3))
+
+    drawn = np.flatnonzero(moves == DRAW)
+    segments = np.concatenate([positions[drawn], positions[drawn + 1]], axis=1)
+    return Geometry3D(segments, np.stack([positions.min(axis=0), positions.max(axis=0)]))
+
+
+def compute_geometry3d(
+    state: str | SymbolArray | ModuleStream, turtle_configuration: TurtleConfiguration
+) -> Geometry3D:
+    """
+    Computes the 3D line segments the turtle draws for a state of an L-System.
+
+    Args:
+        state: A string of symbols, a `SymbolArray` or a `ModuleStream`, the first parameter of a module overrides the
+            distance of `F`, `f` and the angle of the rotations.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+
+    Returns:
+        The `Geometry3D` drawn by the turtle.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    with profiling.span("geometry"):
+        moves, steps, angles = state_moves(state, turtle_configuration, TURTLE_MOVES_3D)
+        geometry = interpret3d(moves, turtle_configuration, steps, angles)
+    profiling.count("segments", len(geometry))
+    return geometry
@@ -0,0 +1,397 @@
+"""
+Hierarchical instancing of the geometry of self-similar L-Systems.
+
+The symbols a symbol `X` expands to after `d` more generations are the same wherever `X` occurs, so the turtle draws
+the same shape every time, only rotated and translated. `build_instances` interprets every `(symbol, depth)` pair once,
+in the frame of a turtle starting at the origin and heading along the x axis: an `Instance` is the list of its child
+instances, each placed by a rigid transform `(heading, x, y)`, along with where it leaves the turtle. The whole drawing
+is the `InstanceTree` of the axiom, so memory and compute scale with the number of distinct `(symbol, depth)` pairs and
+the lengths of the successors instead of the number of symbols of the state.
+
+The segments of the small instances are cached in local coordinates. `InstanceTree.chunks` walks the tree down to the
+cached instances and transforms their vertex arrays in batches, yielding the segments in drawing order for the streaming
+exporters, and `write_instanced_svg` never expands the tree at all: every instance becomes a `<symbol>` drawn by a
+`<use>` element per placement.
+
+```python
+tree = build_instances(lsystem, turtle_conf, depth=16)
+write_instanced_svg(tree, turtle_conf, Path("dragon.svg"))
+write_png(tree.chunks(), tree.bounding_box, turtle_conf, Path("dragon.png"))
+```
+
+Only the rigid turtle moves (`F`, `f`, `+`, `-`, `[`, `]` and `|`) can be instanced, and the branches of every successor
+must be balanced; the rest of the L-Systems are interpreted by `compute_geometry`.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from l_system import profiling
+from l_system.base import Lsystem
+from l_system.parametric import ParametricLsystem
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.export import DEFAULT_SIZE, to_rgb
+from l_system.rendering.geometry import (
+    DRAW,
+    LEFT,
+    MOVE,
+    POP,
+    PUSH,
+    REVERSE,
+    RIGHT,
+    UNKNOWN,
+    Geometry,
+    move_codes,
+    polylines,
+    world_coordinates,
+)
+from l_system.symbol_array import CHUNK_SIZE
+
+CACHED_SEGMENTS = 4096
+"""The segments of the instances with at most this many segments are cached in local coordinates."""
+
+INLINE_SEGMENTS = 32
+"""The instances with at most this many segments are written as a single `<path>` by `write_instanced_svg`."""
+
+
+def _compose(transforms: np.ndarray, local: np.ndarray) -> np.ndarray:
+    """Applies the `(..., 3)` rigid transforms `(heading, x, y)` to the `(..., 3)` local transforms."""
+    radians = np.radians(transforms[..., 0])
+    cos, sin = np.cos(radians), np.sin(radians)
+    x, y = local[..., 1], local[..., 2]
+    return np.stack(
+        [
+            (transforms[..., 0] + local[..., 0]) % 360.0,
+            transforms[..., 1] + cos * x - sin * y,
+            transforms[..., 2] + sin * x + cos * y,
+        ],
+        axis=-1,
+    )
+
+
+def _place(points: np.ndarray, transforms: np.ndarray) -> np.ndarray:
+    """Applies `(m, 3)` rigid transforms to `(k, 2)` points, returning `(m, k, 2)` points."""
+    radians = np.radians(transforms[:, 0])
+    cos, sin = np.cos(radians)[:, None], np.sin(radians)[:, None]
+    x, y = points[:, 0], points[:, 1]
+    return np.stack([transforms[:, 1, None] + cos * x - sin * y, transforms[:, 2, None] + sin * x + cos * y], axis=-1)
+
+
+def _hull(points: np.ndarray) -> np.ndarray:
+    """The vertices of the convex hull of `(k, 2)` points (Andrew's monotone chain)."""
+    points = np.unique(points, axis=0)
+    if len(points) < 3:
+        return points
+
+    def chain(ordered: list[tuple[float, float]]) -> list[tuple[float, float]]:
+        result = []
+        for x, y in ordered:
+            while len(result) >= 2:
+                (ax, ay), (bx, by) = result[-2], result[-1]
+                if (bx - ax) * (y - ay) - (by - ay) * (x - ax) > 0:
+                    break
+                result.pop()
+            result.append((x, y))
+        return result[:-1]
+
+    ordered = points.tolist()
+    return np.array(chain(ordered) + chain(ordered[::-1]))
+
+
+@dataclass(frozen=True)
+class Instance:
+    """
+    The geometry of a symbol expanded to a remaining depth, in the frame of a turtle starting at the origin and heading
+    along the x axis.
+    """
+
+    symbol: str
+    depth: int
+    """The number of generations the symbol is expanded, 0 for the turtle moves."""
+    children: np.ndarray
+    """The indices of the instances placed by this instance that draw something, in drawing order."""
+    transforms: np.ndarray
+    """A `(k, 3)` array with the `(heading, x, y)` every child is placed at."""
+    end: np.ndarray
+    """The `(heading, x, y)` of the turtle after the instance."""
+    count: int
+    """The number of segments drawn by the instance."""
+    hull: np.ndarray
+    """A `(h, 2)` array with the convex hull of the positions visited by the turtle."""
+    segments: np.ndarray | None
+    """The `(count, 4)` segments in local coordinates, `None` unless `count <= CACHED_SEGMENTS`."""
+
+
+@dataclass(frozen=True)
+class InstanceTree:
+    """The instances of an L-System expanded to some depth, along with the root instance of its axiom."""
+
+    instances: list[Instance]
+    root: int
+    """The index of the instance of the axiom."""
+    origin: np.ndarray
+    """The `(heading, x, y)` the root instance is placed at, i.e. the initial state of the turtle."""
+
+    def __len__(self) -> int:
+        """Returns the number of drawn line segments."""
+        return self.instances[self.root].count
+
+    @property
+    def bounding_box(self) -> TurtleBoundingBox:
+        """The area visited by the turtle, including its starting position."""
+        corners = _place(self.instances[self.root].hull, self.origin[None])[0]
+        (x_min, y_min), (x_max, y_max) = corners.min(axis=0), corners.max(axis=0)
+        return TurtleBoundingBox(float(x_min), float(y_min), float(x_max), float(y_max))
+
+    def placements(self) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Walks the tree down to the instances whose segments are cached.
+
+        Yields:
+            The index of every placed instance with cached segments and its `(heading, x, y)` in world coordinates, in
+                drawing order.
+        """
+        pending = [(self.root, self.origin)]
+        while pending:
+            index, transform = pending.pop()
+            instance = self.instances[index]
+            if instance.segments is not None:
+                if instance.count:
+                    yield index, transform
+                continue
+            transforms = _compose(transform, instance.transforms)
+            pending.extend(zip(instance.children[::-1].tolist(), transforms[::-1]))
+
+    def _draw(self, placed: list[tuple[int, np.ndarray]]) -> np.ndarray:
+        """Transforms the cached segments of the placed instances, the instances placed the same way in one batch."""
+        indices = np.array([index for index, _ in placed])
+        transforms = np.array([transform for _, transform in placed])
+        counts = np.array([self.instances[index].count for index in indices])
+        offsets = np.cumsum(counts) - counts
+        segments = np.empty((counts.sum(), 4))
+        for index in np.unique(indices):
+            which = np.flatnonzero(indices == index)
+            local = self.instances[index].segments
+            rows = (offsets[which, None] + np.arange(len(local))).ravel()
+            segments[rows] = _place(local.reshape(-1, 2), transforms[which]).reshape(-1, 4)
+        return segments
+
+    def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+        """
+        Draws the tree by transforming the cached segments of the instances.
+
+        Args:
+            chunk_size: The approximate number of segments of a chunk.
+
+        Yields:
+            Consecutive `(n, 4)` arrays of the line segments `(x0, y0, x1, y1)` drawn by the turtle, in drawing order.
+        """
+        placed, size = [], 0
+        for index, transform in self.placements():
+            placed.append((index, transform))
+            size += self.instances[index].count
+            if size >= chunk_size:
+                with profiling.span("geometry"):
+                    segments = self._draw(placed)
+                yield segments
+                placed, size = [], 0
+        if placed:
+            with profiling.span("geometry"):
+                segments = self._draw(placed)
+            yield segments
+
+    def geometry(self) -> Geometry:
+        """
+        Returns:
+            The `Geometry` drawn by the turtle, the same segments as `compute_geometry` of the expanded state.
+        """
+        segments = np.concatenate([np.zeros((0, 4)), *self.chunks()])
+        return Geometry(segments, self.bounding_box)
+
+
+class _Builder:
+    """Interprets every `(symbol, depth)` pair of an L-System once."""
+
+    def __init__(self, productions: dict[str, str], turtle_configuration: TurtleConfiguration, cached_segments: int):
+        self.productions = productions
+        self.turtle_configuration = turtle_configuration
+        self.cached_segments = cached_segments
+        self.instances: list[Instance] = []
+        self.indices: dict[tuple[str, int], int] = {}
+
+    def _code(self, symbol: str) -> int:
+        code = int(move_codes([symbol], self.turtle_configuration.turtle_move_mapper)[0])
+        if code == UNKNOWN:
+            raise KeyError(f"{symbol} not found!")
+        if code not in (DRAW, MOVE, LEFT, RIGHT, PUSH, POP, REVERSE):
+            raise ValueError(f"symbol {symbol} is not a rigid turtle move, it can't be instanced")
+        return code
+
+    def _add(self, instance: Instance) -> int:
+        self.indices[instance.symbol, instance.depth] = len(self.instances)
+        self.instances.append(instance)
+        return len(self.instances) - 1
+
+    def leaf(self, symbol: str, code: int) -> int:
+        index = self.indices.get((symbol, 0))
+        if index is not None:
+            return index
+        step, angle = float(self.turtle_configuration.forward_step), float(self.turtle_configuration.angle)
+        forward = code in (DRAW, MOVE)
+        heading = {LEFT: angle, RIGHT: -angle, REVERSE: 180.0}.get(code, 0.0)
+        segments = np.array([[0.0, 0.0, step, 0.0]]) if code == DRAW else np.zeros((0, 4))
+        hull = np.array([[0.0, 0.0], [step, 0.0]]) if forward else np.zeros((1, 2))
+        return self._add(
+            Instance(
+                symbol,
+                0,
+                np.zeros(0, dtype=np.int64),
+                np.zeros((0, 3)),
+                np.array([heading, step if forward else 0.0, 0.0]),
+                len(segments),
+                hull,
+                segments,
+            )
+        )
+
+    def instance(self, symbol: str, depth: int) -> int:
+        if depth == 0 or symbol not in self.productions:
+            return self.leaf(symbol, self._code(symbol))
+        index = self.indices.get((symbol, depth))
+        if index is None:
+            index = self._add(self.expand(symbol, self.productions[symbol], depth))
+        return index
+
+    def expand(self, symbol: str, successor: str, depth: int) -> Instance:
+        """Places the instances of the symbols of `successor`, every one expanded `depth - 1` more times."""
+        state = np.zeros(3)
+        stack, children, transforms, points = [], [], [], [np.zeros((1, 2))]
+        for s in successor:
+            if depth == 1 or s not in self.productions:
+                code = self._code(s)
+                if code == PUSH:
+                    stack.append(state)
+                    continue
+                if code == POP:
+                    if not stack:
+                        raise ValueError(f"the ']' of {symbol} at depth {depth} has no matching '['")
+                    state = stack.pop()
+                    continue
+            index = self.instance(s, depth - 1)
+            child = self.instances[index]
+            if child.count:
+                children.append(index)
+                transforms.append(state)
+            points.append(_place(child.hull, state[None])[0])
+            state = _compose(state, child.end)
+        if stack:
+            raise ValueError(f"the '[' of {symbol} at depth {depth} are not closed")
+
+        children = np.array(children, dtype=np.int64)
+        transforms = np.array(transforms).reshape(-1, 3)
+        count = sum(self.instances[child].count for child in children)
+        segments = None
+        if count <= self.cached_segments:
+            local = [np.zeros((0, 4))]
+            for child, transform in zip(children, transforms):
+                local.append(_place(self.instances[child].segments.reshape(-1, 2), transform[None]).reshape(-1, 4))
+            segments = np.concatenate(local)
+        return Instance(symbol, depth, children, transforms, state, count, _hull(np.concatenate(points)), segments)
+
+
+def build_instances(
+    lsystem: Lsystem,
+    turtle_configuration: TurtleConfiguration,
+    depth: int | None = None,
+    cached_segments: int = CACHED_SEGMENTS,
+) -> InstanceTree:
+    """
+    Interprets an L-System as a tree of instances, without expanding its state.
+
+    Args:
+        lsystem: The L-System to interpret, its state is not modified.
+        turtle_configuration: The `forward_step`, `angle`, `initial_heading_angle` and `turtle_move_mapper` of the
+            turtle.
+        depth: The number of recursions, defaults to `lsystem.recursions`.
+        cached_segments: The segments of the instances with at most this many segments are cached.
+
+    Returns:
+        The `InstanceTree` of the L-System.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        ValueError: If the L-System is parametric, a symbol is not a rigid turtle move or the branches of a successor
+            are not balanced.
+    """
+    if isinstance(lsystem, ParametricLsystem):
+        raise ValueError("parametric L-Systems can't be instanced")
+    depth = lsystem.recursions if depth is None else depth
+    builder = _Builder(lsystem.productions, turtle_configuration, cached_segments)
+    with profiling.span("geometry"):
+        # The axiom is expanded like the successor of a virtual symbol
+        root = builder._add(builder.expand("", lsystem.axiom, depth + 1))
+    profiling.count("instances", len(builder.instances))
+    origin = np.array([float(turtle_configuration.initial_heading_angle), 0.0, 0.0])
+    return InstanceTree(builder.instances, root, origin)
+
+
+def _svg_transform(transform: np.ndarray) -> str:
+    heading, x, y = transform.tolist()
+    return f"translate({x:.10g} {y:.10g}) rotate({heading:.10g})"
+
+
+def write_instanced_svg(
+    tree: InstanceTree,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int] = DEFAULT_SIZE,
+    inline_segments: int = INLINE_SEGMENTS,
+) -> None:
+    """
+    Saves an instance tree to an SVG image, every instance is a `<symbol>` placed by `<use>` elements, so the size of
+    the file scales with the number of instances rather than the number of segments.
+
+    Args:
+        tree: The instances of the L-System.
+        turtle_configuration: Provides the foreground and background colors.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the image in pixels.
+        inline_segments: The instances with at most this many segments are drawn by a single `<path>`.
+    """
+    llx, lly, urx, ury = world_coordinates(tree.bounding_box)
+    width, height = size
+    sx, sy = width / ((urx - llx) or 1.0), -height / ((ury - lly) or 1.0)
+    written, pending = set(), [tree.root]
+    with open(path, "w") as fd:
+        fd.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n<defs>\n'
+        )
+        with profiling.span("export"):
+            while pending:
+                index = pending.pop()
+                if index in written:
+                    continue
+                written.add(index)
+                instance = tree.instances[index]
+                fd.write(f'<symbol id="i{index}" overflow="visible">\n')
+                if instance.segments is not None and instance.count <= inline_segments:
+                    for line in polylines(instance.segments):
+                        points = " ".join(f"{x:.6g},{y:.6g}" for x, y in line.tolist())
+                        fd.write(f'<path vector-effect="non-scaling-stroke" d="M{points}"/>\n')
+                else:
+                    for child, transform in zip(instance.children.tolist(), instance.transforms):
+                        fd.write(f'<use href="#i{child}" transform="{_svg_transform(transform)}"/>\n')
+                        pending.append(child)
+                fd.write("</symbol>\n")
+        fd.write("</defs>\n")
+        fd.write(f'<rect width="100%" height="100%" fill="rgb{to_rgb(turtle_configuration.bg_color)}"/>\n')
+        fd.write(
+            f'<g fill="none" stroke="rgb{to_rgb(turtle_configuration.fg_color)}" stroke-width="1" '
+            f'transform="matrix({sx:.10g} 0 0 {sy:.10g} {-llx * sx:.10g} {-ury * sy:.10g})">\n'
+        )
+        fd.write(f'<use href="#i{tree.root}" transform="{_svg_transform(tree.origin)}"/>\n')
+        fd.write("</g>\n</svg>\n")
@@ -0,0 +1,276 @@
+"""
+Interprets the states of bracketed L-Systems in a process pool, split at their top-level branches.
+
+A top-level `[ ... ]` branch returns the turtle to the state it had at its `[`, so the moves outside of the top-level
+branches, the trunk, can be interpreted on their own. The state of the trunk where a branch opens is the entry state
+of the branch, from which the rest of the state can be interpreted independently of what came before:
+
+- `split_branches` finds the top-level branches with a linear scan of the bracket depth,
+- `split_tasks` cuts the state at top-level `[` into ranges of about the same number of moves, and interprets the
+  trunk before the last cut for the heading, position and drawing state of the turtle at every cut,
+- the move codes are copied to shared memory once, and the workers interpret the ranges,
+- every worker writes its segments directly to their place in a shared output array, the `k`-th `F` of the state
+  drawing the `k`-th segment, so the segments are in the same order as the ones of `compute_geometry`.
+
+The segments match `compute_geometry`, and so `LSystemTurtle.push_turtle_state` and `LSystemTurtle.pop_turtle_state`,
+up to the rounding of the prefix sums, which are summed per range.
+
+```python
+geometry = compute_geometry_parallel(lsystem.apply(), turtle_conf, workers=4)
+```
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from l_system import profiling
+from l_system.budget import Budget
+from l_system.parametric import ModuleStream
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.geometry import (
+    DRAW,
+    N_CHANNELS,
+    POP,
+    PUSH,
+    Geometry,
+    TurtleState,
+    _bounding_box,
+    _run,
+    check_segments,
+    interpret,
+    merge_bounding_boxes,
+    state_moves,
+)
+from l_system.run_length import RunLengthState
+from l_system.symbol_array import SymbolArray
+
+MIN_PARALLEL_MOVES = 1 << 18
+"""States with fewer moves are interpreted in this process, starting the workers would take longer."""
+TASKS_PER_WORKER = 4
+"""The state is split into this many tasks per worker, so that a worker that is done early can take another."""
+
+
+def split_branches(moves: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the top-level branches of an array of move codes.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+
+    Returns:
+        A `(n,)` mask of the moves of the trunk, the moves outside of the top-level branches, and the positions of the
+            `[` opening every top-level branch.
+
+    Raises:
+        IndexError: If a `]` has no matching `[`.
+    """
+    depth = np.cumsum(moves == PUSH, dtype=np.int64) - np.cumsum(moves == POP, dtype=np.int64)
+    if len(depth) and depth.min() < 0:
+        raise IndexError("pop from empty list")
+    # The `]` closing a top-level branch is the only move of the branch back at depth 0
+    return (depth == 0) & (moves != POP), np.flatnonzero((moves == PUSH) & (depth == 1))
+
+
+def _interpret_range(
+    moves: np.ndarray,
+    steps: np.ndarray | None,
+    angles: np.ndarray | None,
+    turtle_configuration: TurtleConfiguration,
+    task: tuple[int, int, int, TurtleState],
+    segments: np.ndarray,
+) -> TurtleBoundingBox:
+    """
+    Interprets a range of whole top-level branches and the trunk moves between them, writing their segments to their
+    place in the output array.
+
+    Args:
+        moves: The move codes of the whole state, followed by its steps and angles (see `state_moves`).
+        turtle_configuration: The `forward_step` and `angle` of the turtle.
+        task: The first and last move (exclusive) of the range, the index of its first segment and the state of the
+            turtle before its first move.
+        segments: The `(n, 4)` output array of all the segments.
+
+    Returns:
+        The bounding box of the range.
+    """
+    start, stop, offset, entry = task
+    chunk = moves[start:stop]
+    chunk_steps = None if steps is None else steps[start:stop]
+    chunk_angles = None if angles is None else angles[start:stop]
+    positions = _run(chunk, turtle_configuration, entry, chunk_steps, chunk_angles, carry=False)[1]
+    drawn = np.flatnonzero(chunk == DRAW)
+    segments[offset : offset + len(drawn), :2] = positions[drawn]
+    segments[offset : offset + len(drawn), 2:] = positions[drawn + 1]
+    return _bounding_box(positions)
+
+
+def _share(array: np.ndarray) -> tuple[SharedMemory, tuple[str, tuple[int, ...], str]]:
+    """Copies an array to a new block of shared memory, returning the block and what a worker needs to attach it."""
+    memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, memory.buf)[...] = array
+    return memory, (memory.name, array.shape, array.dtype.str)
+
+
+def _attach(spec: tuple[str, tuple[int, ...], str] | None) -> tuple[SharedMemory | None, np.ndarray | None]:
+    """Attaches a worker to an array in shared memory (see `_share`)."""
+    if spec is None:
+        return None, None
+    name, shape, dtype = spec
+    memory = SharedMemory(name)
+    return memory, np.ndarray(shape, np.dtype(dtype), memory.buf)
+
+
+def _worker(
+    specs: tuple[tuple[str, tuple[int, ...], str] | None, ...],
+    turtle_configuration: TurtleConfiguration,
+    task: tuple[int, int, int, TurtleState],
+) -> TurtleBoundingBox:
+    """Interprets a range of top-level branches in a worker process, see `_interpret_range`."""
+    attached = [_attach(spec) for spec in specs]
+    moves, steps, angles, segments = (array for _, array in attached)
+    try:
+        return _interpret_range(moves, steps, angles, turtle_configuration, task, segments)
+    finally:
+        # The views must be released before the memory can be closed
+        del moves, steps, angles, segments
+        for memory, _ in attached:
+            if memory is not None:
+                memory.close()
+
+
+def split_tasks(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None,
+    angles: np.ndarray | None,
+    count: int,
+) -> list[tuple[int, int, int, TurtleState]]:
+    """
+    Splits an array of move codes at top-level `[` into ranges of about the same number of moves, which can be
+    interpreted independently of each other.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+        count: The maximum number of ranges.
+
+    Returns:
+        The first and last move (exclusive) of every range, the index of its first segment and the state of the turtle
+            before its first move, computed by interpreting the trunk.
+
+    Raises:
+        IndexError: If a `]` has no matching `[`.
+    """
+    trunk, opens = split_branches(moves)
+    targets = np.searchsorted(opens, np.linspace(0, len(moves), count + 1)[1:-1])
+    cuts = np.unique(np.concatenate([[0], opens[targets[targets < len(opens)]]]))
+    # The trunk is only interpreted up to the last cut, which gives the state of the turtle at every cut
+    entries = np.concatenate([[0], np.cumsum(trunk)])[cuts]
+    before = np.flatnonzero(trunk[: cuts[-1]])
+    headings, positions, channels, _ = _run(
+        moves[before],
+        turtle_configuration,
+        TurtleState.initial(turtle_configuration),
+        None if steps is None else steps[before],
+        None if angles is None else angles[before],
+        carry=False,
+    )
+    channels = np.zeros((len(positions), N_CHANNELS)) if channels is None else channels
+    offsets = np.concatenate([[0], np.cumsum(moves == DRAW)])
+    empty = np.zeros((0, 3 + N_CHANNELS))
+    return [
+        (int(start), int(stop), int(offsets[start]), TurtleState(float(headings[i]), positions[i], channels[i], empty))
+        for start, stop, i in zip(cuts, np.append(cuts[1:], len(moves)), entries)
+    ]
+
+
+def interpret_parallel(
+    moves: np.ndarray,
+    turtle_configuration: TurtleConfiguration,
+    steps: np.ndarray | None = None,
+    angles: np.ndarray | None = None,
+    workers: int | None = None,
+    min_moves: int = MIN_PARALLEL_MOVES,
+) -> Geometry:
+    """
+    Interprets an array of turtle move codes, the top-level branches in a process pool.
+
+    Args:
+        moves: A `(n,)` array of move codes.
+        turtle_configuration: The `forward_step`, `angle` and `initial_heading_angle` of the turtle.
+        steps: Optional `(n,)` array with the distance of every forward move, defaults to `forward_step`.
+        angles: Optional `(n,)` array with the angle in degrees of every turn, defaults to `angle`.
+        workers: The number of worker processes, defaults to the number of CPUs. With one worker, or fewer than
+            `min_moves` moves, the state is interpreted in this process by `interpret`.
+        min_moves: The minimum number of moves to start the workers for, see `MIN_PARALLEL_MOVES`.
+
+    Returns:
+        The `Geometry` drawn by the turtle.
+
+    Raises:
+        KeyError: If the moves contain symbols that are not turtle moves.
+        IndexError: If a `]` has no matching `[`.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(moves) < min_moves:
+        return interpret(moves, turtle_configuration, steps, angles)
+
+    tasks = split_tasks(moves, turtle_configuration, steps, angles, workers * TASKS_PER_WORKER)
+    segments = np.empty((int(np.count_nonzero(moves == DRAW)), 4))
+    shared = []
+    try:
+        specs = []
+        for array in (moves, steps, angles, segments):
+            if array is None:
+                specs.append(None)
+                continue
+            memory, spec = _share(array)
+            shared.append(memory)
+            specs.append(spec)
+        with ProcessPoolExecutor(workers) as pool:
+            bounding_boxes = list(pool.map(_worker, repeat(tuple(specs)), repeat(turtle_configuration), tasks))
+        segments[...] = np.ndarray(segments.shape, segments.dtype, shared[-1].buf)
+    finally:
+        for memory in shared:
+            memory.close()
+            memory.unlink()
+    return Geometry(segments, merge_bounding_boxes(bounding_boxes))
+
+
+def compute_geometry_parallel(
+    state: str | SymbolArray | RunLengthState | ModuleStream,
+    turtle_configuration: TurtleConfiguration,
+    workers: int | None = None,
+    budget: Budget | None = None,
+    min_moves: int = MIN_PARALLEL_MOVES,
+) -> Geometry:
+    """
+    Computes the line segments the turtle draws for a state of an L-System, like `compute_geometry`, interpreting its
+    top-level branches in a process pool (see `interpret_parallel`).
+
+    Args:
+        state: A string of symbols, a `SymbolArray`, a `RunLengthState` or a `ModuleStream`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+        workers: The number of worker processes, defaults to the number of CPUs.
+        budget: The resources the interpretation may use, defaults to `l_system.budget.default_budget()`.
+        min_moves: The minimum number of moves to start the workers for, see `MIN_PARALLEL_MOVES`.
+
+    Returns:
+        The `Geometry` drawn by the turtle.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        BudgetExceeded: If the segments would exceed the `budget`, checked before the state is interpreted.
+    """
+    with profiling.span("geometry"):
+        moves, steps, angles = state_moves(state, turtle_configuration)
+        check_segments(moves, budget)
+        geometry = interpret_parallel(moves, turtle_configuration, steps, angles, workers, min_moves)
+    profiling.count("segments", len(geometry))
+    return geometry
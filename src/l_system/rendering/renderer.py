@@ -8,99 +8,40 @@ from tkinter import ttk
 from typing import Dict, Tuple
 
 import tqdm
-from examples import (
-    bracketed_ol_system_fig1_24a,
-    bracketed_ol_system_fig1_24b,
-    bracketed_ol_system_fig1_24c,
-    bracketed_ol_system_fig1_24d,
-    bracketed_ol_system_fig1_24f,
-    dragon_curve,
-    hexagonal_gosper_curve,
-    islands_and_lakes,
-    koch_curves_fig1_7b,
-    koch_curves_fig1_9a,
-    koch_curves_fig1_9b,
-    koch_curves_fig1_9c,
-    koch_curves_fig1_9d,
-    koch_curves_fig1_9e,
-    koch_curves_fig1_9f,
-    koch_island,
-    sierpinski_gask,
-)
 
+from l_system import profiling
 from l_system.base import Lsystem
-from l_system.rendering.turtle import LSystemTurtle, TurtleConfiguration
-
-Example = Tuple[Lsystem, TurtleConfiguration]
-
-EXAMPLES_MAP: Dict[str, Example] = {
-    dragon_curve.DragonCurve.name(): (dragon_curve.DragonCurve(), dragon_curve.DEFAULT_TURTLE_CONFIG),
-    sierpinski_gask.SierpinskiGask.name(): (sierpinski_gask.SierpinskiGask(), sierpinski_gask.DEFAULT_TURTLE_CONFIG),
-    koch_island.KochIsland.name(): (koch_island.KochIsland(), koch_island.DEFAULT_TURTLE_CONFIG),
-    hexagonal_gosper_curve.HexagonalGosperCurve.name(): (
-        hexagonal_gosper_curve.HexagonalGosperCurve(),
-        hexagonal_gosper_curve.DEFAULT_TURTLE_CONFIG,
-    ),
-    islands_and_lakes.IslandsAndLakes.name(): (
-        islands_and_lakes.IslandsAndLakes(),
-        islands_and_lakes.DEFAULT_TURTLE_CONFIG,
-    ),
-    bracketed_ol_system_fig1_24a.BracketedOlSystemFig124a.name(): (
-        bracketed_ol_system_fig1_24a.BracketedOlSystemFig124a(),
-        bracketed_ol_system_fig1_24a.DEFAULT_TURTLE_CONFIG,
-    ),
-    bracketed_ol_system_fig1_24b.BracketedOlSystemFig124b.name(): (
-        bracketed_ol_system_fig1_24b.BracketedOlSystemFig124b(),
-        bracketed_ol_system_fig1_24b.DEFAULT_TURTLE_CONFIG,
-    ),
-    bracketed_ol_system_fig1_24c.BracketedOlSystemFig124c.name(): (
-        bracketed_ol_system_fig1_24c.BracketedOlSystemFig124c(),
-        bracketed_ol_system_fig1_24c.DEFAULT_TURTLE_CONFIG,
-    ),
-    bracketed_ol_system_fig1_24d.BracketedOlSystemFig124d.name(): (
-        bracketed_ol_system_fig1_24d.BracketedOlSystemFig124d(),
-        bracketed_ol_system_fig1_24d.DEFAULT_TURTLE_CONFIG,
-    ),
-    bracketed_ol_system_fig1_24f.BracketedOlSystemFig124f.name(): (
-        bracketed_ol_system_fig1_24f.BracketedOlSystemFig124f(),
-        bracketed_ol_system_fig1_24f.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_7b.QuadraticSnowFlakeCurve.name(): (
-        koch_curves_fig1_7b.QuadraticSnowFlakeCurve(),
-        koch_curves_fig1_7b.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9a.KochCurvesFig19a.name(): (
-        koch_curves_fig1_9a.KochCurvesFig19a(),
-        koch_curves_fig1_9a.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9b.KochCurvesFig19b.name(): (
-        koch_curves_fig1_9b.KochCurvesFig19b(),
-        koch_curves_fig1_9b.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9c.KochCurvesFig19c.name(): (
-        koch_curves_fig1_9c.KochCurvesFig19c(),
-        koch_curves_fig1_9c.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9d.KochCurvesFig19d.name(): (
-        koch_curves_fig1_9d.KochCurvesFig19d(),
-        koch_curves_fig1_9d.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9e.KochCurvesFig19e.name(): (
-        koch_curves_fig1_9e.KochCurvesFig19e(),
-        koch_curves_fig1_9e.DEFAULT_TURTLE_CONFIG,
-    ),
-    koch_curves_fig1_9f.KochCurvesFig19f.name(): (
-        koch_curves_fig1_9f.KochCurvesFig19f(),
-        koch_curves_fig1_9f.DEFAULT_TURTLE_CONFIG,
-    ),
-}
-
-DEFAULT_L_SYSTEM, DEFAULT_TURTLE_CONFIG = EXAMPLES_MAP[dragon_curve.DragonCurve.name()]
+from l_system.expansion import Expansion, expand
+from l_system.refinement import Refinement
+from l_system.registry import DEFAULT_EXAMPLE, EXAMPLES, Example  # noqa: F401
+from l_system.rendering.canvas import canvas_items, draw_items
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.dedup import deduplicate
+from l_system.rendering.geometry import Drawing, compute_drawing, world_coordinates
+from l_system.rendering.spatial import SegmentIndex, pan, zoom
+from l_system.rendering.turtle import LSystemTurtle
+
+EXAMPLES_MAP = EXAMPLES
+"""Kept for backwards compatibility, see `l_system.registry.EXAMPLES`."""
+
+DEFAULT_L_SYSTEM, DEFAULT_TURTLE_CONFIG = EXAMPLES_MAP[DEFAULT_EXAMPLE]
 
 
 @dataclass
 class GlobalSettings:
     animate: bool
+    progressive: bool = False
+    """Draw the low generations at once and refine them in the background, instead of animating the turtle."""
+    backend: str = "turtle"
+    """How the L-System is drawn, one of `BACKENDS`."""
+    dedup: bool = False
+    """Drop the segments drawn more than once before drawing with the `canvas` backend, see
+    `l_system.rendering.dedup`."""
+
+
+BACKENDS = ("turtle", "canvas")
+"""`turtle` replays every move with `LSystemTurtle`, `canvas` draws the precomputed geometry straight to the canvas
+(see `l_system.rendering.canvas`), with the line widths, colors, dots and polygons of `compute_drawing`."""
 
 
 DEFAULT_ROOT_WIDTH = 400
@@ -108,6 +49,11 @@ DEFAULT_ROOT_HEIGHT = 400
 
 STATIC_PADDING = 5
 
+ZOOM_STEP = 1.25
+"""How much the viewport grows or shrinks with every step of the mouse wheel."""
+REFINEMENT_POLL_MS = 50
+"""How often the GUI checks for a new generation while refining progressively."""
+
 
 def check_var_isset(val: str) -> bool:
     if val is not None and val:
@@ -151,9 +97,9 @@ class LSystemRenderer(tk.Tk):
         file_menu = tk.Menu(menubar)
 
         examples_menu = tk.Menu(file_menu)
-        for lsystem, lsystem_config in EXAMPLES_MAP.values():
-            print(f"Registering L-System({lsystem.name()}) with turtle configuration: {lsystem_config}")
-            examples_menu.add_command(label=lsystem.name(), command=partial(self.set_system, lsystem, lsystem_config))
+        for name in EXAMPLES_MAP:
+            # The examples are only imported and instantiated once selected
+            examples_menu.add_command(label=name, command=partial(self.set_example, name))
 
         file_menu.add_cascade(label="Select Example", menu=examples_menu)
         file_menu.add_separator()
@@ -161,6 +107,23 @@ class LSystemRenderer(tk.Tk):
 
         menubar.add_cascade(label="File", menu=file_menu, underline=0)
         menubar.add_command(label="Settings", command=self.settings_modal)
+        menubar.add_command(label="Stop Refinement", command=self.stop_refinement)
+
+        # Zoom with the mouse wheel, pan by dragging and reset the view with a double click
+        self._index: SegmentIndex | None = None
+        self._drawing: Drawing | None = None
+        self._expansion: Expansion | None = None
+        self._viewport: TurtleBoundingBox | None = None
+        self._drag_from: Tuple[int, int] | None = None
+        self._redraw_pending = False
+        self._refinement: Refinement | None = None
+        self._refinement_poll: str | None = None
+        self._canvas.bind("<MouseWheel>", self._on_zoom)
+        self._canvas.bind("<Button-4>", self._on_zoom)
+        self._canvas.bind("<Button-5>", self._on_zoom)
+        self._canvas.bind("<ButtonPress-1>", self._on_drag_start)
+        self._canvas.bind("<B1-Motion>", self._on_drag)
+        self._canvas.bind("<Double-Button-1>", self._on_reset_view)
 
         self.set_system(l_system, turtle_configuration)
 
@@ -293,6 +256,15 @@ class LSystemRenderer(tk.Tk):
 
         modal.grab_set()
 
+    def set_example(self, name: str) -> None:
+        """
+        Render one of the registered examples with its default turtle configuration.
+
+        Args:
+            name: The name of the example in `EXAMPLES_MAP`.
+        """
+        self.set_system(*EXAMPLES_MAP[name])
+
     def set_system(self, l_system: Lsystem, turtle_config: TurtleConfiguration) -> None:
         """
         Update L-System state and rerender turtle with new configuration.
@@ -303,7 +275,11 @@ class LSystemRenderer(tk.Tk):
             turtle_config: Render the L-System according to this TurtleConfiguration.
         """
         # Clear screen to redraw following assignments
+        self.stop_refinement()
         self._screen.clear()
+        self._index = None
+        self._viewport = None
+        self._drawing = None
 
         self.lsystem = l_system
         self._turtle_conf = turtle_config
@@ -320,9 +296,37 @@ class LSystemRenderer(tk.Tk):
             fg_color=self._turtle_conf.fg_color,
         )
         self.wm_title(self.lsystem.name())
-        self.lsystem.apply()
+        if self.global_settings.progressive:
+            self._refinement = Refinement(self.lsystem, self._turtle_conf).start()
+            self._poll_refinement()
+        else:
+            # The examples are shared, so their state is never modified
+            self._expansion = expand(self.lsystem)
         self.draw()
 
+    def stop_refinement(self) -> None:
+        """Stops refining the L-System progressively, keeping the deepest generation drawn so far."""
+        if self._refinement is not None:
+            self._refinement.stop()
+        if self._refinement_poll is not None:
+            # Otherwise the polls of a stopped refinement would go on, and poll the next refinement too
+            self.after_cancel(self._refinement_poll)
+            self._refinement_poll = None
+
+    def _poll_refinement(self) -> None:
+        """Swaps in the deepest generation computed since the last poll."""
+        refinement, self._refinement_poll = self._refinement, None
+        generation = refinement.latest()
+        if generation is not None:
+            self._index, self._viewport = generation.index, None
+            self._navigation_index()
+            self._schedule_redraw()
+            self.wm_title(f"{self.lsystem.name()} | depth {generation.depth}/{refinement.depth}")
+        if refinement.running or not refinement.results.empty():
+            self._refinement_poll = self.after(REFINEMENT_POLL_MS, self._poll_refinement)
+        elif refinement.error is not None:
+            print(f"Unable to refine L-System({self.lsystem.name()}): {refinement.error!r}")
+
     def draw(self, save_to_eps_file: Path | None = None) -> None:
         """
         Draw the L-system on screen using the `turtle` Python module.
@@ -333,28 +337,68 @@ class LSystemRenderer(tk.Tk):
             save_to_eps_file: If a `Path` object provided, it will save the rendered L-System to an `eps` file. If set
                 to `None` it will only render the L-System without storing it.
         """
+        if self.global_settings.progressive:
+            # The generations are drawn as they are computed, see `_poll_refinement`
+            self.mainloop()
+            return
         try:
-            self._update_world_coordinates()
-            self._turtle.animate(self.global_settings.animate)
-            self._run_all_moves()
-            self._turtle.hideturtle()
-            self._turtle.update()
+            # Replace a zoomed or panned view with the drawing of the whole L-System
+            self._canvas.delete("viewport")
+            self._viewport = None
+            if self.global_settings.backend == "canvas":
+                self._draw_canvas()
+            else:
+                with profiling.span("framing"):
+                    self._update_world_coordinates()
+                with profiling.span("drawing"):
+                    self._turtle.animate(self.global_settings.animate)
+                    self._run_all_moves()
+                    self._turtle.hideturtle()
+                    self._turtle.update()
+            profiling.count("canvas_items", len(self._screen.getcanvas().find_all()))
             if save_to_eps_file:
-                self._turtle.save_to_eps(f"{save_to_eps_file}.eps")
+                with profiling.span("export"):
+                    self._turtle.save_to_eps(f"{save_to_eps_file}.eps")
             self._turtle.mainloop()
         except (turtle.Terminator, tk.TclError):
             print("Exiting...")
 
     def _run_all_moves(self) -> None:
         """Runs all the `turtle` moves of the L-system."""
+        expansion = self._expansion
         for i, l_str in tqdm.tqdm(
-            enumerate(self.lsystem, start=1),
-            total=len(self.lsystem),
+            enumerate(expansion, start=1),
+            total=len(expansion),
             desc=f"Rendering L-System '{self.lsystem.name()}'",
         ):
-            self.wm_title(f"{self.lsystem.name()} | {100*(i/len(self.lsystem)):.0f} %")
+            self.wm_title(f"{self.lsystem.name()} | {100*(i/len(expansion)):.0f} %")
+            # Parametric L-Systems yield `(symbol, parameters)` modules instead of plain symbols
+            l_str, params = (l_str, ()) if isinstance(l_str, str) else l_str
             k = self._turtle_conf.turtle_move_mapper.get(l_str, l_str)
-            self._turtle.move(k)
+            self._turtle.move(k, *params)
+
+    def _draw_canvas(self) -> None:
+        """Draws the precomputed drawing of the L-System straight to the canvas, without replaying the turtle moves."""
+        self._canvas.delete("lsystem")
+        self._turtle.hideturtle()
+        drawing = compute_drawing(self._expansion.state, self._turtle_conf)
+        if self.global_settings.dedup:
+            drawing, _ = deduplicate(drawing)
+        self._drawing = drawing
+        with profiling.span("framing"):
+            self.update_idletasks()
+            world = world_coordinates(drawing.geometry.bounding_box)
+            origin = self._canvas.canvasx(0), self._canvas.canvasy(0)
+            items = canvas_items(drawing, self._turtle_conf, world, self._window_size(), origin)
+
+        def on_batch(count: int) -> None:
+            self.wm_title(f"{self.lsystem.name()} | {count} canvas items")
+            self.update()
+
+        with profiling.span("drawing"):
+            draw_items(self._canvas, items, "lsystem", on_batch if self.global_settings.animate else None)
+            self.wm_title(self.lsystem.name())
+            self.update_idletasks()
 
     def _update_world_coordinates(self) -> None:
         """Updates the `turtle` world coordinates by first running the `turtle` on the L-System to find min, max
@@ -366,13 +410,90 @@ class LSystemRenderer(tk.Tk):
         self._turtle.animate(False)
         self._run_all_moves()
 
-        minx, miny, maxx, maxy = self._turtle.bounding_box.to_tuple()
-        w = maxx - minx
-        h = maxy - miny
-        epsilon = 0.00001
-        r = max(w, h) / (min(w, h) + epsilon)
-        if maxx - minx > maxy - miny:
-            self._turtle.screen.setworldcoordinates(minx, miny - 1, maxx, (maxy - 1) * r)
-        else:
-            self._turtle.screen.setworldcoordinates(minx, miny, maxx * r, maxy)
+        self._turtle.screen.setworldcoordinates(*world_coordinates(self._turtle.bounding_box))
         self._turtle.reset()
+
+    def _window_size(self) -> Tuple[int, int]:
+        """The size of the visible canvas in pixels, the requested size until the window is mapped."""
+        width, height = self._canvas.winfo_width(), self._canvas.winfo_height()
+        return width if width > 1 else self.width, height if height > 1 else self.height
+
+    def _window_scale(self) -> Tuple[float, float]:
+        """The pixels per world unit of the viewport along each axis."""
+        width, height = self._window_size()
+        viewport = self._viewport
+        return width / ((viewport.x_max - viewport.x_min) or 1.0), height / ((viewport.y_max - viewport.y_min) or 1.0)
+
+    def _navigation_index(self) -> SegmentIndex | None:
+        """
+        Indexes the segments of the L-System the first time the view is zoomed or panned.
+
+        Returns:
+            The index of the segments, `None` until the first generation of a progressive refinement is polled.
+        """
+        if self._index is None and self.global_settings.progressive:
+            return None
+        if self._index is None:
+            drawing = self._drawing
+            if drawing is None:
+                drawing = compute_drawing(self._expansion.state, self._turtle_conf)
+            with profiling.span("framing"):
+                self._index = SegmentIndex.build(drawing)
+        if self._viewport is None:
+            self._viewport = TurtleBoundingBox(*world_coordinates(self._index.bounding_box))
+        return self._index
+
+    def _on_zoom(self, event: tk.Event) -> None:
+        """Zooms in or out around the mouse pointer."""
+        if self._navigation_index() is None:
+            return
+        scale_x, scale_y = self._window_scale()
+        anchor = self._viewport.x_min + event.x / scale_x, self._viewport.y_max - event.y / scale_y
+        zoom_in = event.num == 4 or event.delta > 0
+        self._viewport = zoom(self._viewport, 1 / ZOOM_STEP if zoom_in else ZOOM_STEP, anchor)
+        self._schedule_redraw()
+
+    def _on_drag_start(self, event: tk.Event) -> None:
+        self._drag_from = event.x, event.y
+
+    def _on_drag(self, event: tk.Event) -> None:
+        """Pans the view with the mouse pointer."""
+        if self._drag_from is None or self._navigation_index() is None:
+            return
+        scale_x, scale_y = self._window_scale()
+        (x, y), self._drag_from = self._drag_from, (event.x, event.y)
+        self._viewport = pan(self._viewport, (x - event.x) / scale_x, (event.y - y) / scale_y)
+        self._schedule_redraw()
+
+    def _on_reset_view(self, _: tk.Event) -> None:
+        """Shows the whole L-System again."""
+        self._viewport = None
+        if self._navigation_index() is None:
+            return
+        self._schedule_redraw()
+
+    def _schedule_redraw(self) -> None:
+        """Coalesces the events of a drag or of a fast spinning wheel to a single redraw when Tk is idle."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw_viewport)
+
+    def _redraw_viewport(self) -> None:
+        """Redraws the part of the drawing intersecting the viewport, at the level of detail of its pixel size."""
+        self._redraw_pending = False
+        if self._index is None:
+            # The L-System was replaced since the redraw was scheduled
+            return
+        scale_x, scale_y = self._window_scale()
+        viewport = self._viewport
+        with profiling.span("drawing"):
+            view = self._index.view(viewport, max(1 / scale_x, 1 / scale_y))
+            # The drawing is replaced by canvas items in the coordinates of the visible window. Only the items of the
+            # drawing are deleted, the turtle keeps the ids of its own items (e.g. its shape and the background).
+            self._canvas.delete("lsystem", "viewport")
+            self._turtle.clear()
+            self._turtle.hideturtle()
+            origin = self._canvas.canvasx(0), self._canvas.canvasy(0)
+            items = canvas_items(view, self._turtle_conf, viewport.to_tuple(), self._window_size(), origin)
+            draw_items(self._canvas, items, "viewport")
+        profiling.count("canvas_items", len(self._canvas.find_all()))
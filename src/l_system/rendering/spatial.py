@@ -0,0 +1,410 @@
+"""
+A spatial index over the segments of an L-System, for zooming and panning large drawings interactively.
+
+`SegmentGrid` is a uniform grid where every cell lists the segments whose bounding box overlaps it, so the segments
+intersecting a viewport are found by visiting the cells it covers instead of every segment. `SegmentIndex` keeps a grid
+per level of detail: the coarser levels snap the segments to a lattice and merge the ones that become identical, so a
+zoomed out viewport only draws about as many segments as it has pixels, however many the L-System has. Both are built
+on `TileGrid`, which also assigns the primitives to the tiles of `l_system.rendering.tiles`.
+
+The index of a `Drawing` only merges segments of the same width and color, and `SegmentIndex.view` returns the visible
+part of the drawing, with the attributes of its segments and its visible dots and polygons.
+
+```python
+index = SegmentIndex.build(compute_geometry(lsystem.apply(), turtle_conf))
+viewport = zoom(TurtleBoundingBox(*world_coordinates(index.bounding_box)), 0.5, (0, 0))
+segments = index.query(viewport, pixel_size=(viewport.x_max - viewport.x_min) / 800)
+```
+"""
+
+import math
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+
+from l_system.rendering.configuration import TurtleBoundingBox
+from l_system.rendering.geometry import Drawing, Geometry
+
+DEFAULT_TILE_SIZE = (1024, 1024)
+
+
+@dataclass(frozen=True)
+class TileGrid:
+    """Splits an image into a row major grid of tiles, the tiles of the last row and column may be smaller."""
+
+    size: tuple[int, int]
+    """The `(width, height)` of the image in pixels."""
+    tile_size: tuple[int, int] = DEFAULT_TILE_SIZE
+    """The `(width, height)` of a tile in pixels."""
+
+    @property
+    def columns(self) -> int:
+        return -(-self.size[0] // self.tile_size[0])
+
+    @property
+    def rows(self) -> int:
+        return -(-self.size[1] // self.tile_size[1])
+
+    def __len__(self) -> int:
+        """Returns the number of tiles."""
+        return self.columns * self.rows
+
+    def box(self, tile: int) -> tuple[int, int, int, int]:
+        """
+        Args:
+            tile: The row major index of a tile.
+
+        Returns:
+            The `(x0, y0, x1, y1)` pixels the tile covers, excluding `x1` and `y1`.
+        """
+        row, column = divmod(tile, self.columns)
+        x0, y0 = column * self.tile_size[0], row * self.tile_size[1]
+        return x0, y0, min(x0 + self.tile_size[0], self.size[0]), min(y0 + self.tile_size[1], self.size[1])
+
+    def bucket(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Assigns axis aligned boxes to the tiles they overlap.
+
+        Args:
+            boxes: A `(n, 4)` array of `(x_min, y_min, x_max, y_max)` boxes in pixels.
+
+        Returns:
+            The indices of the boxes, grouped by tile and in their original order within a tile, and the `(tiles + 1,)`
+                offsets of the groups: the boxes overlapping tile `t` are `indices[offsets[t]:offsets[t + 1]]`.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        (width, height), (tile_width, tile_height) = self.size, self.tile_size
+        visible = (boxes[:, 2] >= 0) & (boxes[:, 3] >= 0) & (boxes[:, 0] < width) & (boxes[:, 1] < height)
+        index = np.flatnonzero(visible)
+        c0, r0, c1, r1 = (
+            np.clip(np.floor(boxes[index, i] / tile), 0, limit - 1).astype(np.int64)
+            for i, tile, limit in zip(range(4), (tile_width, tile_height) * 2, (self.columns, self.rows) * 2)
+        )
+
+        # Every box is repeated once per tile of its column and row range
+        spans = c1 - c0 + 1
+        counts = spans * (r1 - r0 + 1)
+        owner = np.repeat(np.arange(len(index)), counts)
+        local = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts)
+        tiles = (r0[owner] + local // spans[owner]) * self.columns + c0[owner] + local % spans[owner]
+
+        order = np.argsort(tiles, kind='stable')
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tiles, minlength=len(self)), out=offsets[1:])
+        return index[owner[order]], offsets
+
+
+CELL_SEGMENTS = 32
+"""The average number of segments per cell of a `SegmentGrid`."""
+MAX_CELLS = 1024
+"""The maximum number of cells of a `SegmentGrid` along each axis."""
+COARSEST_LEVEL = 64
+"""The coarsest level of detail of a `SegmentIndex` snaps the segments to `1 / COARSEST_LEVEL` of the drawing size."""
+FINEST_LEVEL = 8192
+"""The finest level of detail snaps the segments to `1 / FINEST_LEVEL` of the drawing size, about a screen pixel."""
+LOD_TOLERANCE = 2.0
+"""A level of detail is used while its lattice spacing is at most `LOD_TOLERANCE` pixels."""
+
+
+@dataclass(frozen=True)
+class SegmentGrid:
+    """A uniform grid over line segments."""
+
+    segments: np.ndarray
+    """The `(n, 4)` indexed segments."""
+    origin: tuple[float, float]
+    """The `(x, y)` lower left corner of the grid."""
+    cell_size: float
+    """The width and height of a cell."""
+    grid: TileGrid
+    """The `(columns, rows)` of the grid, cells are tiles of size `(1, 1)`."""
+    indices: np.ndarray
+    """The indices of the segments overlapping every cell, see `TileGrid.bucket`."""
+    offsets: np.ndarray
+    """The `(cells + 1,)` offsets of the segments of every cell in `indices`."""
+    sources: np.ndarray
+    """The index of the drawn segment every indexed segment stands for, e.g. to look up its width and color."""
+
+    @classmethod
+    def build(
+        cls, segments: np.ndarray, cell_segments: int = CELL_SEGMENTS, sources: np.ndarray | None = None
+    ) -> "SegmentGrid":
+        """
+        Args:
+            segments: A `(n, 4)` array of line segments `(x0, y0, x1, y1)`.
+            cell_segments: The average number of segments per cell.
+            sources: The index of the drawn segment every segment stands for, defaults to the segments themselves.
+
+        Returns:
+            The grid over the segments.
+        """
+        boxes = _boxes(segments)
+        x_min, y_min = boxes[:, :2].min(axis=0) if len(boxes) else (0.0, 0.0)
+        x_max, y_max = boxes[:, 2:].max(axis=0) if len(boxes) else (0.0, 0.0)
+        width, height = max(x_max - x_min, 1e-9), max(y_max - y_min, 1e-9)
+        cell_size = math.sqrt(width * height * cell_segments / max(len(segments), 1))
+        cell_size = max(cell_size, width / MAX_CELLS, height / MAX_CELLS)
+        grid = TileGrid((math.ceil(width / cell_size), math.ceil(height / cell_size)), (1, 1))
+        cells = (boxes - np.array([x_min, y_min, x_min, y_min])) / cell_size
+        indices, offsets = grid.bucket(cells)
+        sources = np.arange(len(segments)) if sources is None else sources
+        return cls(segments, (float(x_min), float(y_min)), cell_size, grid, indices, offsets, sources)
+
+    def _cells(self, low: float, high: float, origin: float, count: int) -> tuple[int, int]:
+        """The first and last cell overlapping `[low, high]` along an axis."""
+        return max(math.floor((low - origin) / self.cell_size), 0), min(
+            math.floor((high - origin) / self.cell_size), count - 1
+        )
+
+    def query(self, viewport: TurtleBoundingBox) -> np.ndarray:
+        """
+        Args:
+            viewport: The visible area.
+
+        Returns:
+            The indices of the segments whose bounding box intersects the viewport, in drawing order.
+        """
+        columns = self.grid.columns
+        c0, c1 = self._cells(viewport.x_min, viewport.x_max, self.origin[0], columns)
+        r0, r1 = self._cells(viewport.y_min, viewport.y_max, self.origin[1], self.grid.rows)
+        # The cells of a row are contiguous, so are their segments
+        rows = [
+            self.indices[self.offsets[r * columns + c0] : self.offsets[r * columns + c1 + 1]] for r in range(r0, r1 + 1)
+        ]
+        if c0 > c1 or not rows:
+            return np.zeros(0, dtype=np.int64)
+        if (c0, r0, c1, r1) == (0, 0, columns - 1, self.grid.rows - 1):
+            candidates = np.arange(len(self.segments))
+        else:
+            candidates = np.unique(np.concatenate(rows))
+        boxes = _boxes(self.segments[candidates])
+        visible = (
+            (boxes[:, 0] <= viewport.x_max)
+            & (boxes[:, 2] >= viewport.x_min)
+            & (boxes[:, 1] <= viewport.y_max)
+            & (boxes[:, 3] >= viewport.y_min)
+        )
+        return candidates[visible]
+
+
+def _boxes(segments: np.ndarray) -> np.ndarray:
+    """The `(x_min, y_min, x_max, y_max)` bounding boxes of `(n, 4)` segments."""
+    points = np.asarray(segments, dtype=np.float64).reshape(-1, 2, 2)
+    return np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1)
+
+
+def simplify(segments: np.ndarray, spacing: float) -> np.ndarray:
+    """
+    Snaps segments to a square lattice and merges the ones that become identical, in either direction, or points.
+
+    Args:
+        segments: A `(n, 4)` array of line segments `(x0, y0, x1, y1)`, spanning at most `FINEST_LEVEL` lattice
+            points along each axis.
+        spacing: The distance between the points of the lattice.
+
+    Returns:
+        The snapped segments, without duplicates and not in drawing order.
+    """
+    return _snap(segments, spacing)[0]
+
+
+def _snap(segments: np.ndarray, spacing: float, groups: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Simplifies segments like `simplify`, only merging the segments of the same group.
+
+    Args:
+        segments: A `(n, 4)` array of line segments `(x0, y0, x1, y1)`.
+        spacing: The distance between the points of the lattice.
+        groups: Optional `(n,)` group ids, e.g. of the width and color of every segment.
+
+    Returns:
+        The snapped segments and the index of the first segment merged into each of them.
+    """
+    snapped = np.round(np.asarray(segments) / spacing).astype(np.int64).reshape(-1, 2, 2)
+    kept = np.flatnonzero(np.any(snapped[:, 0] != snapped[:, 1], axis=1))
+    snapped = snapped[kept]
+    # Orient every segment from its lexicographically smaller end point, so reversed duplicates match
+    reverse = (snapped[:, 0, 0] > snapped[:, 1, 0]) | (
+        (snapped[:, 0, 0] == snapped[:, 1, 0]) & (snapped[:, 0, 1] > snapped[:, 1, 1])
+    )
+    snapped[reverse] = snapped[reverse, ::-1]
+
+    # Every segment is packed to a single integer key, a lot faster to deduplicate than rows
+    origin = snapped.reshape(-1, 2).min(axis=0) if len(snapped) else np.zeros(2, dtype=np.int64)
+    base = int(snapped.reshape(-1, 2).max(initial=0)) - int(origin.min(initial=0)) + 1
+    digits = (snapped - origin).reshape(-1, 4)
+    keys = ((digits[:, 0] * base + digits[:, 1]) * base + digits[:, 2]) * base + digits[:, 3]
+    if groups is not None:
+        # The ids of the distinct segments are below their number, so they pack with the groups without overflowing
+        _, ids = np.unique(keys, return_inverse=True)
+        _, sources = np.unique(ids * (int(groups.max(initial=0)) + 1) + groups[kept], return_index=True)
+        keys = keys[sources]
+    else:
+        keys, sources = np.unique(keys, return_index=True)
+    digits = np.stack([keys // base**3, keys // base**2 % base, keys // base % base, keys % base], axis=1)
+    return (digits + np.tile(origin, 2)) * spacing, kept[sources]
+
+
+@dataclass(frozen=True)
+class SegmentIndex:
+    """Segment grids at several levels of detail."""
+
+    bounding_box: TurtleBoundingBox
+    """The area visited by the turtle."""
+    levels: list[tuple[float, SegmentGrid]]
+    """The lattice spacing and the grid of every level, the exact segments (with a spacing of 0) first."""
+    drawing: Drawing | None = field(default=None, compare=False)
+    """The indexed drawing, `None` when only its geometry is indexed."""
+
+    @classmethod
+    def build(cls, geometry: Geometry | Drawing, cell_segments: int = CELL_SEGMENTS) -> "SegmentIndex":
+        """
+        Indexes the segments of a drawing. Every level doubles the lattice spacing of the previous one, starting from
+        the typical segment length, and is kept while it merges a significant number of segments.
+
+        Args:
+            geometry: The segments drawn by the turtle, or its `Drawing`, whose segments are only merged with
+                segments of the same width and color.
+            cell_segments: The average number of segments per cell.
+
+        Returns:
+            The index of the segments.
+        """
+        drawing = geometry if isinstance(geometry, Drawing) else None
+        geometry = geometry.geometry if drawing is not None else geometry
+        segments = np.asarray(geometry.segments, dtype=np.float64)
+        levels = [(0.0, SegmentGrid.build(segments, cell_segments))]
+        box = geometry.bounding_box
+        extent = max(box.x_max - box.x_min, box.y_max - box.y_min)
+        if not len(segments) or extent <= 0:
+            return cls(box, levels, drawing)
+
+        groups = None
+        if drawing is not None:
+            widths, colors = (np.unique(values, return_inverse=True)[1] for values in (drawing.widths, drawing.colors))
+            groups = widths * (int(colors.max(initial=0)) + 1) + colors
+        lengths = np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1])
+        spacing = max(float(np.median(lengths)), extent / FINEST_LEVEL)
+        while spacing <= extent / COARSEST_LEVEL:
+            finer = levels[-1][1]
+            simplified, sources = _snap(finer.segments, spacing, None if groups is None else groups[finer.sources])
+            if len(simplified) < 0.75 * len(finer.segments):
+                levels.append((spacing, SegmentGrid.build(simplified, cell_segments, finer.sources[sources])))
+            spacing *= 2
+        return cls(box, levels, drawing)
+
+    def level(self, pixel_size: float) -> SegmentGrid:
+        """
+        Args:
+            pixel_size: The size of a pixel of the viewport, in world coordinates.
+
+        Returns:
+            The coarsest grid whose lattice spacing is within `LOD_TOLERANCE` pixels.
+        """
+        return next(grid for spacing, grid in reversed(self.levels) if spacing <= LOD_TOLERANCE * pixel_size)
+
+    def query(self, viewport: TurtleBoundingBox, pixel_size: float = 0.0) -> np.ndarray:
+        """
+        Args:
+            viewport: The visible area.
+            pixel_size: The size of a pixel of the viewport, in world coordinates, 0 for the exact segments.
+
+        Returns:
+            The `(k, 4)` segments intersecting the viewport at the level of detail of `pixel_size`.
+        """
+        grid = self.level(pixel_size)
+        return grid.segments[grid.query(viewport)]
+
+    def view(self, viewport: TurtleBoundingBox, pixel_size: float = 0.0) -> Geometry | Drawing:
+        """
+        Args:
+            viewport: The visible area.
+            pixel_size: The size of a pixel of the viewport, in world coordinates, 0 for the exact segments.
+
+        Returns:
+            The segments intersecting the viewport at the level of detail of `pixel_size`, framed by the viewport. When
+                a `Drawing` is indexed, a drawing with the width and color of every segment, and the dots and polygons
+                whose bounding box intersects the viewport.
+        """
+        grid = self.level(pixel_size)
+        visible = grid.query(viewport)
+        geometry = Geometry(grid.segments[visible], viewport)
+        if self.drawing is None:
+            return geometry
+
+        drawing, sources, segments = self.drawing, grid.sources[visible], geometry.segments
+        # The radius of a dot is in pixels
+        margin = drawing.dot_radii * pixel_size
+        dots = np.flatnonzero(
+            (drawing.dots[:, 0] + margin >= viewport.x_min)
+            & (drawing.dots[:, 0] - margin <= viewport.x_max)
+            & (drawing.dots[:, 1] + margin >= viewport.y_min)
+            & (drawing.dots[:, 1] - margin <= viewport.y_max)
+        )
+        vertices, offsets, polygons = _visible_polygons(drawing, viewport)
+        return replace(
+            drawing,
+            geometry=geometry,
+            widths=drawing.widths[sources],
+            colors=drawing.colors[sources],
+            lengths=np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]),
+            dots=drawing.dots[dots],
+            dot_radii=drawing.dot_radii[dots],
+            dot_colors=drawing.dot_colors[dots],
+            polygon_vertices=vertices,
+            polygon_offsets=offsets,
+            polygon_colors=drawing.polygon_colors[polygons],
+        )
+
+
+def _visible_polygons(drawing: Drawing, viewport: TurtleBoundingBox) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The vertices and offsets of the polygons of a drawing whose bounding box intersects the viewport, and their
+    indices."""
+    counts = np.diff(drawing.polygon_offsets)
+    starts = drawing.polygon_offsets[:-1][counts > 0]
+    visible = np.zeros(len(counts), dtype=bool)
+    if len(starts):
+        low = np.minimum.reduceat(drawing.polygon_vertices, starts)
+        high = np.maximum.reduceat(drawing.polygon_vertices, starts)
+        visible[counts > 0] = (
+            (low[:, 0] <= viewport.x_max)
+            & (high[:, 0] >= viewport.x_min)
+            & (low[:, 1] <= viewport.y_max)
+            & (high[:, 1] >= viewport.y_min)
+        )
+    polygons = np.flatnonzero(visible)
+    vertices = np.repeat(visible, counts)
+    offsets = np.concatenate([[0], np.cumsum(counts[polygons])]).astype(drawing.polygon_offsets.dtype)
+    return drawing.polygon_vertices[vertices], offsets, polygons
+
+
+def zoom(viewport: TurtleBoundingBox, factor: float, anchor: tuple[float, float]) -> TurtleBoundingBox:
+    """
+    Args:
+        viewport: The visible area.
+        factor: The new size of the viewport relative to the current, below 1 to zoom in.
+        anchor: The `(x, y)` point that stays in place, e.g. under the mouse pointer.
+
+    Returns:
+        The zoomed viewport.
+    """
+    x, y = anchor
+    return TurtleBoundingBox(
+        x + (viewport.x_min - x) * factor,
+        y + (viewport.y_min - y) * factor,
+        x + (viewport.x_max - x) * factor,
+        y + (viewport.y_max - y) * factor,
+    )
+
+
+def pan(viewport: TurtleBoundingBox, dx: float, dy: float) -> TurtleBoundingBox:
+    """
+    Args:
+        viewport: The visible area.
+        dx: The horizontal move in world coordinates.
+        dy: The vertical move in world coordinates.
+
+    Returns:
+        The moved viewport.
+    """
+    return TurtleBoundingBox(viewport.x_min + dx, viewport.y_min + dy, viewport.x_max + dx, viewport.y_max + dy)
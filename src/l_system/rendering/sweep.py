@@ -0,0 +1,147 @@
+"""
+Parameter sweeps: an L-System rendered with many turning angles and forward steps, e.g. to find the angle of a plant.
+
+The grammar is expanded once (see `l_system.expansion.expand`) and the geometry of all the variants is computed by
+`compute_sweep`, which shares the interpretation of the state between them. The variants are written as a contact
+sheet, a grid of labelled cells, or as one image per variant:
+
+```python
+variants = sweep(lsystem, turtle_conf, angles=np.linspace(20, 30, 11))
+contact_sheet(variants, turtle_conf, cell_size=(200, 200)).save("angles.png")
+```
+"""
+
+import math
+from dataclasses import dataclass, replace
+from itertools import product
+from pathlib import Path
+from typing import Sequence
+
+from PIL import Image, ImageDraw
+
+from l_system import profiling
+from l_system.base import Lsystem
+from l_system.expansion import expand
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import DEFAULT_SIZE, EXPORTERS, rasterize_window, to_rgb
+from l_system.rendering.geometry import Geometry, compute_sweep, merge_bounding_boxes, world_coordinates
+
+DEFAULT_CELL_SIZE = (200, 200)
+LABEL_HEIGHT = 14
+"""The pixels below every cell of a contact sheet reserved for its label."""
+
+
+@dataclass(frozen=True)
+class Variant:
+    """The geometry of an L-System for one combination of the swept parameters."""
+
+    angle: float
+    """The turning angle in degrees."""
+    forward_step: float
+    """The forward step."""
+    geometry: Geometry
+    """The segments drawn by the turtle."""
+
+    @property
+    def label(self) -> str:
+        return f"angle {self.angle:g} step {self.forward_step:g}"
+
+
+def sweep(
+    lsystem: Lsystem,
+    turtle_configuration: TurtleConfiguration,
+    angles: Sequence[float],
+    forward_steps: Sequence[float] | None = None,
+    depth: int | None = None,
+) -> list[Variant]:
+    """
+    Computes the geometry of an L-System for every combination of turning angle and forward step.
+
+    Args:
+        lsystem: The L-System to sweep, its state is not modified.
+        turtle_configuration: Interpret the L-System according to this `TurtleConfiguration`, except for its `angle`
+            and `forward_step`.
+        angles: The turning angles in degrees.
+        forward_steps: The forward steps, defaults to the `forward_step` of the `turtle_configuration`.
+        depth: The number of recursions, defaults to `lsystem.recursions`.
+
+    Returns:
+        A `Variant` per combination, the steps varying fastest.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+    """
+    forward_steps = [turtle_configuration.forward_step] if forward_steps is None else list(forward_steps)
+    state = expand(lsystem, depth).state
+    geometries = compute_sweep(state, turtle_configuration, angles, forward_steps)
+    return [Variant(float(a), float(s), g) for (a, s), g in zip(product(angles, forward_steps), geometries)]
+
+
+def contact_sheet(
+    variants: Sequence[Variant],
+    turtle_configuration: TurtleConfiguration,
+    cell_size: tuple[int, int] = DEFAULT_CELL_SIZE,
+    columns: int | None = None,
+    shared_frame: bool = False,
+) -> Image.Image:
+    """
+    Rasterizes variants to a grid of labelled cells.
+
+    Args:
+        variants: The variants, laid out row by row.
+        turtle_configuration: Provides the foreground and background colors.
+        cell_size: The `(width, height)` of the drawing of every variant in pixels, its label is drawn below.
+        columns: The number of cells per row, defaults to a roughly square grid.
+        shared_frame: Frame all the variants by the bounding box of all of them, so that their sizes can be compared,
+            instead of framing every variant by its own bounding box.
+
+    Returns:
+        The RGB contact sheet.
+    """
+    columns = columns or math.ceil(math.sqrt(len(variants)))
+    rows = math.ceil(len(variants) / columns)
+    width, height = cell_size
+    sheet = Image.new("RGB", (columns * width, rows * (height + LABEL_HEIGHT)), to_rgb(turtle_configuration.bg_color))
+    draw = ImageDraw.Draw(sheet)
+    shared = (
+        world_coordinates(merge_bounding_boxes(v.geometry.bounding_box for v in variants)) if shared_frame else None
+    )
+    for i, variant in enumerate(variants):
+        world = shared or world_coordinates(variant.geometry.bounding_box)
+        cell = rasterize_window([variant.geometry.segments], world, turtle_configuration, cell_size)
+        x, y = (i % columns) * width, (i // columns) * (height + LABEL_HEIGHT)
+        with profiling.span("export"):
+            sheet.paste(cell, (x, y))
+            draw.text((x + 2, y + height + 1), variant.label, fill=to_rgb(turtle_configuration.fg_color))
+    return sheet
+
+
+def write_variants(
+    variants: Sequence[Variant],
+    turtle_configuration: TurtleConfiguration,
+    directory: Path,
+    fmt: str = "png",
+    size: tuple[int, int] = DEFAULT_SIZE,
+) -> list[Path]:
+    """
+    Saves every variant to its own image.
+
+    Args:
+        variants: The variants.
+        turtle_configuration: Provides the foreground and background colors.
+        directory: Where the images are stored, created if needed. The files are named after the swept parameters,
+            e.g. `angle_25.7_step_3.png`.
+        fmt: The format of the images, one of `EXPORTERS`.
+        size: The `(width, height)` of the images in pixels.
+
+    Returns:
+        The paths of the images, in the order of the variants.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for variant in variants:
+        path = directory / f"{variant.label.replace(' ', '_')}.{fmt}"
+        conf = replace(turtle_configuration, angle=variant.angle, forward_step=variant.forward_step)
+        EXPORTERS[fmt]([variant.geometry.segments], variant.geometry.bounding_box, conf, path, size)
+        paths.append(path)
+    return paths
@@ -0,0 +1,279 @@
+"""
+Tiled rendering of images too large for a single Pillow buffer, e.g. print-size posters.
+
+The image is framed like the other exporters (`world_coordinates`) and split into a `TileGrid`. A bucketing pass
+assigns every segment, dot and polygon to the tiles its pixel bounding box overlaps, then the tiles are rasterized in a
+process pool by `rasterize_window`, so a worker only holds one tile and the primitives that touch it. The tiles are
+stored as a directory of PNG files, or streamed one row of tiles at a time into a single PNG file.
+
+```python
+geometry = compute_geometry(lsystem.apply(), turtle_conf)
+write_tiled_png(geometry, turtle_conf, Path("poster.png"), size=(40000, 40000))
+```
+"""
+
+import json
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from l_system import profiling
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import rasterize_window, to_pixels
+from l_system.rendering.geometry import Drawing, Geometry, world_coordinates
+from l_system.rendering.spatial import DEFAULT_TILE_SIZE, TileGrid
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Concatenates `arange(start, start + count)` for all the starts and counts."""
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+def _canvas(geometry: Geometry | Drawing, size: tuple[int, int]) -> Geometry | Drawing:
+    """Moves the geometry to pixel coordinates with the y axis pointing up, so the window of a tile is its pixel box."""
+    drawing = geometry if isinstance(geometry, Drawing) else None
+    geometry = drawing.geometry if drawing else geometry
+    world = world_coordinates(geometry.bounding_box)
+
+    def canvas(points: np.ndarray) -> np.ndarray:
+        # Pillow truncates the coordinates, which is flooring within the image but not for the negative coordinates of
+        # the primitives that cross into a tile from its left or top. Whole pixels are drawn the same in every tile.
+        return np.floor(to_pixels(points.reshape(-1, 2), world, size)) * np.array([1.0, -1.0])
+
+    geometry = replace(geometry, segments=canvas(geometry.segments).reshape(-1, 4))
+    if drawing is None:
+        return geometry
+    return replace(
+        drawing, geometry=geometry, dots=canvas(drawing.dots), polygon_vertices=canvas(drawing.polygon_vertices)
+    )
+
+
+def _boxes(points: np.ndarray, margin: np.ndarray | float) -> np.ndarray:
+    """The pixel boxes of `(n, k, 2)` canvas points, grown by `margin`."""
+    pixels = points * np.array([1.0, -1.0])
+    return np.concatenate(
+        [pixels.min(axis=1) - np.reshape(margin, (-1, 1)), pixels.max(axis=1) + np.reshape(margin, (-1, 1))], axis=1
+    )
+
+
+def _buckets(geometry: Geometry | Drawing, grid: TileGrid) -> Iterator[np.ndarray | Drawing]:
+    """Yields the primitives of every tile, in row major order."""
+    if isinstance(geometry, Geometry):
+        indices, offsets = grid.bucket(_boxes(geometry.segments.reshape(-1, 2, 2), 1.0))
+        for tile in range(len(grid)):
+            yield geometry.segments[indices[offsets[tile] : offsets[tile + 1]]]
+        return
+
+    segments = geometry.geometry.segments
+    lines = grid.bucket(_boxes(segments.reshape(-1, 2, 2), geometry.widths / 2 + 1))
+    dots = grid.bucket(_boxes(geometry.dots.reshape(-1, 1, 2), geometry.dot_radii + 1))
+    starts, counts = geometry.polygon_offsets[:-1], np.diff(geometry.polygon_offsets)
+    pixels = geometry.polygon_vertices * np.array([1.0, -1.0])
+    polygon_boxes = np.zeros((len(counts), 4))
+    if len(counts):
+        polygon_boxes[:, :2] = np.minimum.reduceat(pixels, starts, axis=0) - 1
+        polygon_boxes[:, 2:] = np.maximum.reduceat(pixels, starts, axis=0) + 1
+    polygons = grid.bucket(polygon_boxes)
+
+    for tile in range(len(grid)):
+        line, dot, polygon = (
+            indices[offsets[tile] : offsets[tile + 1]] for indices, offsets in (lines, dots, polygons)
+        )
+        vertex_counts = counts[polygon]
+        yield Drawing(
+            geometry=replace(geometry.geometry, segments=segments[line]),
+            widths=geometry.widths[line],
+            colors=geometry.colors[line],
+            lengths=geometry.lengths[line],
+            dots=geometry.dots[dot],
+            dot_radii=geometry.dot_radii[dot],
+            dot_colors=geometry.dot_colors[dot],
+            polygon_vertices=geometry.polygon_vertices[_ranges(starts[polygon], vertex_counts)],
+            polygon_offsets=np.concatenate([[0], np.cumsum(vertex_counts)]),
+            polygon_colors=geometry.polygon_colors[polygon],
+        )
+
+
+def _render_tile(
+    chunk: np.ndarray | Drawing,
+    box: tuple[int, int, int, int],
+    turtle_configuration: TurtleConfiguration,
+    path: Path | None,
+) -> np.ndarray | None:
+    x0, y0, x1, y1 = box
+    image = rasterize_window([chunk], (x0, -y1, x1, -y0), turtle_configuration, (x1 - x0, y1 - y0))
+    if path is None:
+        return np.asarray(image)
+    with profiling.span("export"):
+        image.save(path, format="PNG")
+    return None
+
+
+def iter_tiles(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    grid: TileGrid,
+    workers: int | None = None,
+    directory: Path | None = None,
+) -> Iterator[tuple[int, np.ndarray | None]]:
+    """
+    Rasterizes the tiles of an image in a process pool. At most two tiles per worker are in flight at any time, so the
+    memory is bounded by the tile size rather than the image size.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        grid: The size of the image and of its tiles.
+        workers: The number of worker processes, defaults to the number of CPUs. With one worker the tiles are
+            rasterized in this process.
+        directory: If given, the workers store every tile to a PNG file in this directory instead of returning it.
+
+    Yields:
+        The index of every tile in row major order, along with its `(height, width, 3)` pixels (`None` when the tile is
+            stored to `directory`).
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = (
+        (chunk, grid.box(tile), turtle_configuration, directory / tile_name(grid, tile) if directory else None)
+        for tile, chunk in enumerate(_buckets(_canvas(geometry, grid.size), grid))
+    )
+    if workers == 1:
+        # `rasterize_window` times the rasterization, the consumer of the tiles runs outside of the spans
+        for tile, task in enumerate(tasks):
+            yield tile, _render_tile(*task)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for tile, task in enumerate(tasks):
+            pending.append((tile, pool.submit(_render_tile, *task)))
+            if len(pending) == 2 * workers:
+                yield _result(*pending.popleft())
+        while pending:
+            yield _result(*pending.popleft())
+
+
+def _result(tile: int, future: Future) -> tuple[int, np.ndarray | None]:
+    """Waits for a tile rasterized by a worker, whose spans don't reach this process, timing the wait instead."""
+    with profiling.span("export"):
+        pixels = future.result()
+    return tile, pixels
+
+
+def tile_name(grid: TileGrid, tile: int) -> str:
+    """
+    Args:
+        grid: The grid of the tiles.
+        tile: The row major index of a tile.
+
+    Returns:
+        The file name of the tile in a tile directory, `tile_{row}_{column}.png`.
+    """
+    row, column = divmod(tile, grid.columns)
+    return f"tile_{row:04d}_{column:04d}.png"
+
+
+def write_tile_directory(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    directory: Path,
+    size: tuple[int, int],
+    tile_size: tuple[int, int] = DEFAULT_TILE_SIZE,
+    workers: int | None = None,
+) -> TileGrid:
+    """
+    Renders an image as a directory of PNG tiles (see `tile_name`), along with a `tiles.json` index of the grid.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        directory: Where the tiles will be stored, it is created if it doesn't exist.
+        size: The `(width, height)` of the whole image in pixels.
+        tile_size: The `(width, height)` of a tile in pixels.
+        workers: The number of worker processes, see `iter_tiles`.
+
+    Returns:
+        The `TileGrid` of the tiles.
+    """
+    grid = TileGrid(size, tile_size)
+    directory.mkdir(parents=True, exist_ok=True)
+    for _ in iter_tiles(geometry, turtle_configuration, grid, workers, directory):
+        pass
+    index = {"size": size, "tile_size": tile_size, "columns": grid.columns, "rows": grid.rows}
+    index["tiles"] = [tile_name(grid, tile) for tile in range(len(grid))]
+    (directory / "tiles.json").write_text(json.dumps(index, indent=2))
+    return grid
+
+
+class _PngWriter:
+    """Writes an 8 bit RGB PNG file one band of rows at a time, without holding the whole image."""
+
+    def __init__(self, path: Path, size: tuple[int, int]):
+        self._fd = open(path, "wb")
+        self._compressor = zlib.compressobj()
+        self._fd.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", *size, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self._fd.write(struct.pack(">I", len(data)) + kind + data)
+        self._fd.write(struct.pack(">I", zlib.crc32(kind + data)))
+
+    def write(self, rows: np.ndarray) -> None:
+        """Appends a `(height, width, 3)` band of rows, every row with the `None` filter."""
+        scanlines = np.zeros((len(rows), rows[0].size + 1), dtype=np.uint8)
+        scanlines[:, 1:] = rows.reshape(len(rows), -1)
+        data = self._compressor.compress(scanlines.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self) -> None:
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._fd.close()
+
+
+def write_tiled_png(
+    geometry: Geometry | Drawing,
+    turtle_configuration: TurtleConfiguration,
+    path: Path,
+    size: tuple[int, int],
+    tile_size: tuple[int, int] = DEFAULT_TILE_SIZE,
+    workers: int | None = None,
+) -> TileGrid:
+    """
+    Renders an image in tiles and streams them to a single PNG file, holding one row of tiles at a time.
+
+    Args:
+        geometry: The segments drawn by the turtle, or its `Drawing`.
+        turtle_configuration: Provides the foreground and background colors and the palette.
+        path: Where the image will be stored.
+        size: The `(width, height)` of the whole image in pixels.
+        tile_size: The `(width, height)` of a tile in pixels.
+        workers: The number of worker processes, see `iter_tiles`.
+
+    Returns:
+        The `TileGrid` of the tiles.
+    """
+    grid = TileGrid(size, tile_size)
+    writer = _PngWriter(path, size)
+    band = None
+    try:
+        for tile, pixels in iter_tiles(geometry, turtle_configuration, grid, workers):
+            x0, y0, x1, y1 = grid.box(tile)
+            if band is None:
+                band = np.empty((y1 - y0, size[0], 3), dtype=np.uint8)
+            band[:, x0:x1] = pixels
+            if x1 == size[0]:
+                with profiling.span("export"):
+                    writer.write(band)
+                band = None
+    finally:
+        writer.close()
+    return grid
@@ -13,55 +13,19 @@ Character        Meaning
    [	         Push current drawing state onto stack
    ]	         Pop current drawing state from the stack
 
-TODO:
-   |	         Reverse direction (ie: turn by 180 degrees)
-   #	         Increment the line width by line width increment
-   !	         Decrement the line width by line width increment
-   @	         Draw a dot with line width radius
-   {	         Open a polygon
-   }	         Close a polygon and fill it with fill colour
-   >	         Multiply the line length by the line length scale factor
-   <	         Divide the line length by the line length scale factor
-   &	         Swap the meaning of + and -
-   (	         Decrement turning angle by turning angle increment
-   )	         Increment turning angle by turning angle increment
+The 3D moves `&`, `^`, `\\`, `/` and `|` (turn around) are interpreted by `l_system.rendering.geometry3d`, which
+projects the result for the 2D exporters.
+
+The rest of the symbols of the page (`|`, `#`, `!`, `@`, `{`, `}`, `>`, `<`, `&`, `(`, `)` and `'` to change the
+color) are interpreted by `l_system.rendering.geometry.compute_drawing`, with the line widths, colors, dots and polygons
+drawn by the headless exporters of `l_system.rendering.export`.
 """
 
 import turtle
-from dataclasses import astuple, dataclass, field
-
-
-@dataclass
-class TurtleConfiguration:
-    """Turtle graphics configuration used by the L-System renderer class."""
-
-    forward_step: int = 3
-    """This value represents the distance the turtle will travel."""
-    angle: float = 90
-    """Rotation angle in degrees of the turtle."""
-    initial_heading_angle: int = 0
-    """Initial [orientation](https://docs.python.org/3/library/turtle.html#turtle.setheading) of the turtle."""
-    speed: int = 0
-    """The turtle's drawing [speed](https://docs.python.org/3/library/turtle.html#turtle.speed), 0 is the fastest."""
-    fg_color: tuple[float, float, float] = (0.76, 0.71, 0.55)
-    """The turtle's drawing color in (R, G, B) format."""
-    bg_color: tuple[float, float, float] = (0.0, 0.0, 0.0)
-    """The background color (window color) in (R, G, B) format."""
-    turtle_move_mapper: dict[str, str] = field(default_factory=dict)
-    """A dictionary that maps L-System symbols to turtle moves."""
-
-
-@dataclass(frozen=False)
-class TurtleBoundingBox:
-    """A bounding box of the area the turtle has drawn to."""
-
-    x_min: float
-    y_min: float
-    x_max: float
-    y_max: float
 
-    def to_tuple(self):
-        return astuple(self)
+# Re-exported for backwards compatibility, the configuration lives in a module that does not import `tkinter`.
+from l_system.rendering.configuration import TurtleBoundingBox as TurtleBoundingBox
+from l_system.rendering.configuration import TurtleConfiguration as TurtleConfiguration
 
 
 class LSystemTurtle(turtle.RawTurtle):
@@ -161,51 +125,53 @@ class LSystemTurtle(turtle.RawTurtle):
         ts = self.getscreen()
         ts.getcanvas().postscript(file=f"{save_to_eps_file}.eps")
 
-    def move(self, mv_cmd: str) -> None:
+    def move(self, mv_cmd: str, *params: float) -> None:
         """
         It moves the turtle based on an input string.
 
         Args:
             mv_cmd: A string that defines how the turtle will move next.
+            params: The parameters of a parametric module, the first one overrides the distance of `F`, `f` and the
+                angle of `+`, `-`.
 
         Raises:
             KeyError: If the `mv_cmd` move is not implemented (`mv_cmd` is not a key of the `self._lsystem2turtle_map`
                 dictionary).
         """
         try:
-            self._lsystem2turtle_map[mv_cmd]()
+            self._lsystem2turtle_map[mv_cmd](*params)
         except KeyError as exc:
             raise KeyError(f"{mv_cmd} not found!") from exc
 
     def forward(self, *args) -> None:
-        """Moves the turtle forward and updates the turtle's bounding box."""
-        super().forward(self._forward_step)
+        """Moves the turtle forward (by the first argument if given) and updates the turtle's bounding box."""
+        super().forward(args[0] if args else self._forward_step)
         self._update_bounding_box()
 
     def left(self, *args) -> None:
-        """Rotates the turtle left and updates it's bounding box."""
-        super().left(self._delta)
+        """Rotates the turtle left (by the first argument if given) and updates it's bounding box."""
+        super().left(args[0] if args else self._delta)
         self._update_bounding_box()
 
     def right(self, *args) -> None:
-        """Rotates the turtle right and updates its bounding box."""
-        super().right(self._delta)
+        """Rotates the turtle right (by the first argument if given) and updates its bounding box."""
+        super().right(args[0] if args else self._delta)
         self._update_bounding_box()
 
-    def up_forward(self) -> None:
+    def up_forward(self, *args) -> None:
         """Moves the turtle forward without drawing and updates the turtle's bounding box."""
         super().up()
-        self.forward()
+        self.forward(*args)
         super().down()
         self._update_bounding_box()
 
-    def push_turtle_state(self) -> None:
+    def push_turtle_state(self, *args) -> None:
         """Pushes the current state of the turtle (heading and orientation) to its stack."""
         t_heading = super().heading()
         t_position = super().position()
         self._state_stack.append((t_heading, t_position))
 
-    def pop_turtle_state(self) -> None:
+    def pop_turtle_state(self, *args) -> None:
         """Pops a previously stored turtle state (heading and orientation) from stack."""
         t_heading, t_position = self._state_stack.pop()
         super().up()
@@ -0,0 +1,170 @@
+"""
+A run-length encoded state backend for L-Systems.
+
+States such as the ones of the Koch curves contain long runs of identical symbols, e.g. `FFFFFFFF`. A
+`RunLengthState` stores them as `(symbol id, count)` runs. Rewriting operates on whole runs: a run of `k` symbols
+becomes `k` copies of their successor (or a single longer run if the successor is a run itself, e.g. `F -> FF`) and
+adjacent runs of the same symbol are merged.
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from l_system.symbol_array import InternedGrammar, SymbolArray, intern_grammar_cached
+
+
+@dataclass(frozen=True)
+class RunLengthState:
+    """A state of an L-System stored as runs of identical symbols."""
+
+    symbols: str
+    """The symbol table, the symbol of run `i` is `symbols[ids[i]]`."""
+    ids: np.ndarray
+    """A `(r,)` `uint8` array with the symbol id of every run."""
+    counts: np.ndarray
+    """A `(r,)` `int64` array with the length of every run."""
+
+    def __len__(self) -> int:
+        """Returns the number of symbols (not runs)."""
+        return int(self.counts.sum())
+
+    def __iter__(self) -> Iterable[str]:
+        """Iterate over the symbols."""
+        yield from self.decode()
+
+    def __str__(self) -> str:
+        return str(self.decode())
+
+    @property
+    def runs(self) -> int:
+        """The number of runs."""
+        return len(self.ids)
+
+    @property
+    def compression_ratio(self) -> float:
+        """How many symbols are stored per run."""
+        return len(self) / max(self.runs, 1)
+
+    @classmethod
+    def encode(cls, state: SymbolArray) -> "RunLengthState":
+        """
+        Run-length encodes a `SymbolArray`.
+
+        Args:
+            state: The state to encode.
+
+        Returns:
+            The `RunLengthState`.
+        """
+        return merge_runs(state.symbols, state.ids, np.ones(len(state.ids), dtype=np.int64))
+
+    def decode(self) -> SymbolArray:
+        """
+        Returns:
+            The state expanded to a `SymbolArray`.
+        """
+        return SymbolArray(self.symbols, np.repeat(self.ids, self.counts))
+
+
+def merge_runs(symbols: str, ids: np.ndarray, counts: np.ndarray) -> RunLengthState:
+    """
+    Merges adjacent runs of the same symbol.
+
+    Args:
+        symbols: The symbol table.
+        ids: The symbol id of every run.
+        counts: The length of every run.
+
+    Returns:
+        The merged `RunLengthState`.
+    """
+    if not len(ids):
+        return RunLengthState(symbols, ids, counts)
+    starts = np.flatnonzero(np.concatenate([[True], ids[1:] != ids[:-1]]))
+    return RunLengthState(symbols, ids[starts], np.add.reduceat(counts, starts))
+
+
+@dataclass(frozen=True)
+class RunLengthGrammar:
+    """The production rules of an L-System translated to successor runs."""
+
+    symbols: str
+    """The symbol table of the grammar."""
+    run_lengths: np.ndarray
+    """The number of successor runs of every symbol id."""
+    run_starts: np.ndarray
+    """The offset of the successor runs of every symbol id in `run_ids` and `run_counts`."""
+    run_ids: np.ndarray
+    """The flattened symbol ids of the successor runs."""
+    run_counts: np.ndarray
+    """The flattened lengths of the successor runs."""
+
+    def rewrite(self, state: RunLengthState) -> RunLengthState:
+        """
+        Applies the production rules once, operating on whole runs.
+
+        Args:
+            state: The current state.
+
+        Returns:
+            The next state.
+        """
+        ids, counts = state.ids, state.counts
+        run_lengths = self.run_lengths[ids]
+        single = run_lengths == 1
+        # A run whose successor is a single run stays a single (longer) run, any other run becomes `count` copies of
+        # the successor runs.
+        output_runs = np.where(single, 1, counts * run_lengths)
+        ends = np.cumsum(output_runs)
+        if not len(ends):
+            return state
+        inputs = np.repeat(np.arange(len(ids)), output_runs)
+        offsets = np.arange(ends[-1], dtype=np.int64) - (ends - output_runs)[inputs]
+        table = self.run_starts[ids[inputs]] + offsets % run_lengths[inputs]
+        new_counts = self.run_counts[table] * np.where(single, counts, 1)[inputs]
+        return merge_runs(self.symbols, self.run_ids[table], new_counts)
+
+
+def run_length_grammar(grammar: InternedGrammar) -> RunLengthGrammar:
+    """
+    Run-length encodes the successors of an `InternedGrammar`.
+
+    Args:
+        grammar: The interned production rules.
+
+    Returns:
+        The `RunLengthGrammar`.
+    """
+    run_lengths, run_starts, run_ids, run_counts = [], [], [], []
+    for i in range(len(grammar.symbols)):
+        successor = grammar.table[grammar.starts[i] : grammar.starts[i] + grammar.lengths[i]]
+        runs = RunLengthState.encode(SymbolArray(grammar.symbols, successor))
+        run_starts.append(len(run_ids))
+        run_lengths.append(runs.runs)
+        run_ids += runs.ids.tolist()
+        run_counts += runs.counts.tolist()
+    return RunLengthGrammar(
+        grammar.symbols,
+        np.array(run_lengths, dtype=np.int64),
+        np.array(run_starts, dtype=np.int64),
+        np.array(run_ids, dtype=np.uint8),
+        np.array(run_counts, dtype=np.int64),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def run_length_grammar_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> RunLengthGrammar:
+    """
+    Interns and run-length encodes the successors of a grammar, only once per grammar.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System as `(symbol, successor)` pairs.
+
+    Returns:
+        The `RunLengthGrammar` of the grammar.
+    """
+    return run_length_grammar(intern_grammar_cached(axiom, productions))
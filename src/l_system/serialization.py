@@ -0,0 +1,321 @@
+"""
+A versioned binary format for expanded states and segment geometry.
+
+A file is a fixed size little-endian header, followed by the symbol table and the data, aligned to `ALIGNMENT` bytes:
+
+Field            Type            Meaning
+   magic         4 bytes         Always `b"LSYS"`.
+   version       uint16          The version of the format, `VERSION`.
+   kind          uint8           `STATE` or `GEOMETRY`.
+   dtype         uint8           The code of the data type in `DTYPES`.
+   count         uint64          The number of symbols of a state or segments of a geometry.
+   depth         uint32          The number of recursions the state was expanded for.
+   bounding_box  4 x float64     The `(x_min, y_min, x_max, y_max)` of a geometry, zeros for a state.
+   fingerprint   16 bytes        The `grammar_fingerprint` of the L-System.
+   symbols       uint32          The size in bytes of the UTF-8 symbol table that follows the header.
+
+A state is stored as one `uint8` symbol id per symbol and a geometry as `(count, 4)` float32 or float64 segments, so
+both can be memory mapped and used without parsing. Writers accept the data in chunks and patch the header when closed.
+"""
+
+import hashlib
+import json
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from l_system.rendering.configuration import TurtleBoundingBox
+from l_system.rendering.geometry import Geometry, merge_bounding_boxes
+from l_system.symbol_array import SymbolArray
+
+MAGIC = b"LSYS"
+VERSION = 1
+STATE, GEOMETRY = 1, 2
+ALIGNMENT = 64
+"""The data starts at a multiple of `ALIGNMENT` bytes, suitable for any memory mapping."""
+
+DTYPES: dict[int, np.dtype] = {1: np.dtype("<u1"), 2: np.dtype("<f4"), 3: np.dtype("<f8")}
+"""The data types of the stored arrays by their code in the header."""
+
+_HEADER = struct.Struct("<4sHBBQI4d16sI")
+
+
+def grammar_fingerprint(axiom: str, productions: dict[str, str]) -> bytes:
+    """
+    Identifies a grammar, so that a state or a geometry can be matched to the L-System it was computed from.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System.
+
+    Returns:
+        A 16 bytes digest, independent of the order of the production rules.
+    """
+    canonical = json.dumps([axiom, sorted(productions.items())], ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).digest()
+
+
+@dataclass(frozen=True)
+class Header:
+    """The header of a state or geometry file."""
+
+    version: int
+    kind: int
+    """`STATE` or `GEOMETRY`."""
+    dtype: np.dtype
+    count: int
+    """The number of symbols or segments."""
+    depth: int
+    bounding_box: TurtleBoundingBox
+    fingerprint: bytes
+    symbols: str
+    """The symbol table of a state, empty for a geometry."""
+    data_offset: int
+    """Where the data starts in the file."""
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        """The shape of the stored array."""
+        return (self.count,) if self.kind == STATE else (self.count, 4)
+
+
+def _data_offset(symbols: bytes) -> int:
+    return -(-(_HEADER.size + len(symbols)) // ALIGNMENT) * ALIGNMENT
+
+
+def read_header(path: Path) -> Header:
+    """
+    Reads the header of a state or geometry file.
+
+    Args:
+        path: The file to read.
+
+    Returns:
+        The `Header` of the file.
+
+    Raises:
+        ValueError: If the file is not a state or geometry file, was written by a newer version of the format or has an
+            unknown data type.
+    """
+    with open(path, "rb") as fd:
+        raw = fd.read(_HEADER.size)
+        if len(raw) < _HEADER.size or raw[:4] != MAGIC:
+            raise ValueError(f"{path} is not an L-System state or geometry file.")
+        magic, version, kind, dtype, count, depth, *bbox, fingerprint, symbols_size = _HEADER.unpack(raw)
+        if version > VERSION:
+            raise ValueError(f"{path} has version {version}, only versions up to {VERSION} are supported.")
+        if dtype not in DTYPES:
+            raise ValueError(f"unknown dtype code {dtype}")
+        symbols = fd.read(symbols_size)
+    return Header(
+        version,
+        kind,
+        DTYPES[dtype],
+        count,
+        depth,
+        TurtleBoundingBox(*bbox),
+        fingerprint,
+        symbols.decode("utf-8"),
+        _data_offset(symbols),
+    )
+
+
+class _Writer:
+    """Writes the header, appends the data in chunks and patches the header when closed."""
+
+    kind: int
+
+    def __init__(self, path: Path, dtype: np.dtype, symbols: str, fingerprint: bytes, depth: int):
+        self.path = path
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.symbols = symbols
+        self.fingerprint = fingerprint
+        self.depth = depth
+        self.count = 0
+        self._dtype_code = next(code for code, d in DTYPES.items() if d == self.dtype)
+        self._symbols_bytes = symbols.encode("utf-8")
+        self._fd = open(path, "wb")
+        self._fd.write(self._header(TurtleBoundingBox(0, 0, 0, 0)))
+        self._fd.write(bytes(_data_offset(self._symbols_bytes) - self._fd.tell()))
+
+    def _header(self, bounding_box: TurtleBoundingBox) -> bytes:
+        header = _HEADER.pack(
+            MAGIC,
+            VERSION,
+            self.kind,
+            self._dtype_code,
+            self.count,
+            self.depth,
+            *bounding_box.to_tuple(),
+            self.fingerprint,
+            len(self._symbols_bytes),
+        )
+        return header + self._symbols_bytes
+
+    def _append(self, data: np.ndarray, count: int) -> None:
+        self._fd.write(np.ascontiguousarray(data, dtype=self.dtype).tobytes())
+        self.count += count
+
+    def _bounding_box(self) -> TurtleBoundingBox:
+        return TurtleBoundingBox(0, 0, 0, 0)
+
+    def close(self) -> None:
+        """Patches the header with the final count (and bounding box) and closes the file."""
+        if self._fd.closed:
+            return
+        self._fd.seek(0)
+        self._fd.write(self._header(self._bounding_box()))
+        self._fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class StateWriter(_Writer):
+    """Writes a state file, chunk by chunk."""
+
+    kind = STATE
+
+    def __init__(self, path: Path, symbols: str, fingerprint: bytes = bytes(16), depth: int = 0):
+        """
+        Args:
+            path: Where the state will be stored.
+            symbols: The symbol table of the state.
+            fingerprint: The `grammar_fingerprint` of the L-System.
+            depth: The number of recursions the state was expanded for.
+        """
+        super().__init__(path, DTYPES[1], symbols, fingerprint, depth)
+
+    def write(self, chunk: SymbolArray) -> None:
+        """
+        Appends a chunk of the state.
+
+        Args:
+            chunk: The next symbols, sharing the symbol table of the file.
+
+        Raises:
+            ValueError: If the chunk has a different symbol table.
+        """
+        if chunk.symbols != self.symbols:
+            raise ValueError(f"Expected the symbol table '{self.symbols}', got '{chunk.symbols}'.")
+        self._append(chunk.ids, len(chunk))
+
+
+class GeometryWriter(_Writer):
+    """Writes a geometry file, chunk by chunk."""
+
+    kind = GEOMETRY
+
+    def __init__(self, path: Path, dtype: np.dtype = np.float32, fingerprint: bytes = bytes(16), depth: int = 0):
+        """
+        Args:
+            path: Where the geometry will be stored.
+            dtype: `float32` (half the size) or `float64` (exact) segments.
+            fingerprint: The `grammar_fingerprint` of the L-System.
+            depth: The number of recursions the geometry was computed for.
+        """
+        super().__init__(path, dtype, "", fingerprint, depth)
+        self._bounding_boxes = []
+
+    def write(self, geometry: Geometry) -> None:
+        """
+        Appends the segments of a chunk of the geometry, e.g. from `l_system.streaming.iter_geometry`.
+
+        Args:
+            geometry: The next segments and the area the turtle visited while drawing them.
+        """
+        self._append(geometry.segments, len(geometry))
+        self._bounding_boxes.append(geometry.bounding_box)
+
+    def _bounding_box(self) -> TurtleBoundingBox:
+        return merge_bounding_boxes(self._bounding_boxes)
+
+
+def _load(path: Path, kind: int, fingerprint: bytes | None, mmap: bool) -> tuple[Header, np.ndarray]:
+    header = read_header(path)
+    if header.kind != kind:
+        raise ValueError(f"{path} is not a {'state' if kind == STATE else 'geometry'} file.")
+    if fingerprint is not None and header.fingerprint != fingerprint:
+        raise ValueError(f"{path} was computed from a different grammar.")
+    if header.count == 0:
+        return header, np.empty(header.shape, dtype=header.dtype)
+    if mmap:
+        return header, np.memmap(path, dtype=header.dtype, mode="r", offset=header.data_offset, shape=header.shape)
+    with open(path, "rb") as fd:
+        fd.seek(header.data_offset)
+        return header, np.fromfile(fd, dtype=header.dtype, count=int(np.prod(header.shape))).reshape(header.shape)
+
+
+def load_state(path: Path, fingerprint: bytes | None = None, mmap: bool = True) -> SymbolArray:
+    """
+    Loads a state file.
+
+    Args:
+        path: The file to load.
+        fingerprint: If given, the `grammar_fingerprint` the state must have been computed from.
+        mmap: Whether to memory map the symbol ids instead of reading them.
+
+    Returns:
+        The state as a `SymbolArray`.
+
+    Raises:
+        ValueError: If the file is not a state file or doesn't match the fingerprint.
+    """
+    header, ids = _load(path, STATE, fingerprint, mmap)
+    return SymbolArray(header.symbols, ids)
+
+
+def load_geometry(path: Path, fingerprint: bytes | None = None, mmap: bool = True) -> Geometry:
+    """
+    Loads a geometry file.
+
+    Args:
+        path: The file to load.
+        fingerprint: If given, the `grammar_fingerprint` the geometry must have been computed from.
+        mmap: Whether to memory map the segments instead of reading them, slices of a memory mapped geometry can be
+            passed to the `write_*` exporters of `l_system.rendering.export` without loading the whole file.
+
+    Returns:
+        The `Geometry`.
+
+    Raises:
+        ValueError: If the file is not a geometry file or doesn't match the fingerprint.
+    """
+    header, segments = _load(path, GEOMETRY, fingerprint, mmap)
+    return Geometry(segments, header.bounding_box)
+
+
+def save_state(path: Path, state: SymbolArray, fingerprint: bytes = bytes(16), depth: int = 0) -> None:
+    """
+    Saves a state file in one go, see `StateWriter`.
+
+    Args:
+        path: Where the state will be stored.
+        state: The state to save.
+        fingerprint: The `grammar_fingerprint` of the L-System.
+        depth: The number of recursions the state was expanded for.
+    """
+    with StateWriter(path, state.symbols, fingerprint, depth) as writer:
+        writer.write(state)
+
+
+def save_geometry(
+    path: Path, geometry: Geometry, dtype: np.dtype = np.float32, fingerprint: bytes = bytes(16), depth: int = 0
+) -> None:
+    """
+    Saves a geometry file in one go, see `GeometryWriter`.
+
+    Args:
+        path: Where the geometry will be stored.
+        geometry: The geometry to save.
+        dtype: `float32` (half the size) or `float64` (exact) segments.
+        fingerprint: The `grammar_fingerprint` of the L-System.
+        depth: The number of recursions the geometry was computed for.
+    """
+    with GeometryWriter(path, dtype, fingerprint, depth) as writer:
+        writer.write(geometry)
@@ -0,0 +1,537 @@
+"""
+A local render service, so that tools and notebooks can request images without starting a process per image.
+
+`l-system serve` listens on a local HTTP port with `asyncio` and only depends on the standard library. The L-Systems
+are expanded, interpreted and exported by `render_request` in a pool of worker processes, so the event loop stays
+responsive while large images are rendered. Identical requests that arrive while one of them is being rendered are
+coalesced to a single render, and the rendered images are kept in a `ResultCache` bounded by their total size.
+
+```shell
+$ l-system serve --port 8000 --workers 4
+$ curl -d '{"axiom": "F", "productions": {"F": "F+F-F-F+F"}, "depth": 4, "turtle": {"angle": 90}, "format": "svg"}' \
+    http://127.0.0.1:8000/render -o koch.svg
+$ curl -d '{"example": "DragonCurve", "depth": 14, "size": [400, 400]}' http://127.0.0.1:8000/render -o dragon.png
+```
+
+The endpoints are:
+
+- `POST /render` renders the L-System of the JSON body, see `RenderRequest.from_json`. The time spent in every stage is
+    returned in a `Server-Timing` header, and whether the image was rendered, coalesced or read from the cache in a
+    `X-Cache` header.
+- `GET /examples` lists the names of the examples.
+- `GET /stats` reports the cache and the coalescing counters.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field, fields, replace
+from http import HTTPStatus
+from pathlib import Path
+
+from l_system.base import Lsystem
+from l_system.budget import BYTES, Budget, BudgetExceeded, resolve
+from l_system.cache import DEFAULT_CACHE_BYTES, BoundedCache
+from l_system.profiling import Profiler, observe
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml", "eps": "application/postscript"}
+"""The content type of every image format."""
+
+MAX_BODY_BYTES = 2**20
+"""The largest accepted request body."""
+
+MAX_IMAGE_SIDE = 16384
+"""The largest accepted width or height of an image, larger images should be rendered in tiles."""
+
+TIMED_SPANS = ("expansion", "geometry", "export")
+"""The profiling spans reported in the `Server-Timing` header."""
+
+DEFAULT_BUDGET = Budget(max_symbols=2 * 10**8, max_bytes=2**30, max_seconds=60, degrade=True)
+"""The budget of a render when the service is started without one, so that a single request can't exhaust the memory
+of a worker process."""
+
+_NUMBER_FIELDS = {
+    "forward_step",
+    "angle",
+    "initial_heading_angle",
+    "speed",
+    "line_width",
+    "line_width_increment",
+    "length_scale_factor",
+    "angle_increment",
+}
+_COLOR_FIELDS = {"fg_color", "bg_color"}
+
+
+class GrammarLsystem(Lsystem):
+    """An L-System given by its axiom and production rules, rather than by a subclass of `Lsystem`."""
+
+    def __init__(self, axiom: str, productions: dict[str, str], recursions: int = 1):
+        self._axiom = axiom
+        self._productions = dict(productions)
+        self._recursions = recursions
+        super().__init__()
+
+    @property
+    def axiom(self) -> str:
+        return self._axiom
+
+    @property
+    def productions(self) -> dict[str, str]:
+        return self._productions
+
+    @property
+    def recursions(self) -> int:
+        return self._recursions
+
+
+def _turtle_configuration(base: TurtleConfiguration, overrides: dict) -> TurtleConfiguration:
+    """Applies the JSON fields of a request to a `TurtleConfiguration`."""
+    if not isinstance(overrides, dict):
+        raise ValueError("'turtle' must be an object")
+    names = {f.name for f in fields(TurtleConfiguration)}
+    unknown = set(overrides) - names
+    if unknown:
+        raise ValueError(f"unknown turtle configuration fields: {', '.join(sorted(unknown))}")
+    values = dict(overrides)
+    for name in _NUMBER_FIELDS & set(values):
+        if not _is_number(values[name]):
+            raise ValueError(f"invalid turtle configuration: '{name}' must be a number")
+    for name in _COLOR_FIELDS & set(values):
+        if not _is_color(values[name]):
+            raise ValueError(f"invalid turtle configuration: '{name}' must be a list of 3 numbers")
+        values[name] = tuple(float(c) for c in values[name])
+    if "palette" in values:
+        if not isinstance(values["palette"], list) or not all(_is_color(c) for c in values["palette"]):
+            raise ValueError("invalid turtle configuration: 'palette' must be a list of colors")
+        values["palette"] = tuple(tuple(float(c) for c in color) for color in values["palette"])
+    if "turtle_move_mapper" in values:
+        mapper = values["turtle_move_mapper"]
+        if not isinstance(mapper, dict) or not all(isinstance(v, str) for v in mapper.values()):
+            raise ValueError("invalid turtle configuration: 'turtle_move_mapper' must map symbols to strings")
+    return replace(base, **values)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_color(value) -> bool:
+    return isinstance(value, list) and len(value) == 3 and all(_is_number(c) for c in value)
+
+
+@dataclass(frozen=True)
+class RenderRequest:
+    """An L-System to render, along with the turtle configuration, depth and format of the image."""
+
+    axiom: str
+    productions: tuple[tuple[str, str], ...]
+    """The production rules, sorted by symbol."""
+    depth: int
+    turtle_configuration: TurtleConfiguration
+    format: str = "png"
+    size: tuple[int, int] = (800, 800)
+    example: str | None = None
+    """The name of the example, whose L-System is rendered instead of the grammar."""
+
+    @classmethod
+    def from_json(cls, payload: dict) -> "RenderRequest":
+        """
+        Validates the JSON body of a render request. The L-System is either given by its grammar, e.g.
+        `{"axiom": "F", "productions": {"F": "F+F-F-F+F"}, "depth": 4, "turtle": {"angle": 90}}`, or by the name of an
+        example, e.g. `{"example": "DragonCurve"}`, whose depth and turtle configuration are the defaults. The optional
+        `format` (`png`, `svg` or `eps`) and `size` (`[width, height]`) default to a 800x800 PNG image.
+
+        Args:
+            payload: The decoded JSON body.
+
+        Returns:
+            The request.
+
+        Raises:
+            ValueError: If the body is not a valid request.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("the body must be a JSON object")
+        example = payload.get("example")
+        if example is not None:
+            if example not in EXAMPLES:
+                raise ValueError(f"unknown example '{example}'")
+            lsystem, base = EXAMPLES[example]
+            # The examples are identified by their name, their grammar may also be parametric
+            axiom, productions, depth = "", {}, lsystem.recursions
+        else:
+            axiom, productions, depth, base = payload.get("axiom"), payload.get("productions"), 1, TurtleConfiguration()
+            if not isinstance(axiom, str) or not axiom:
+                raise ValueError("'axiom' must be a non empty string")
+            if not isinstance(productions, dict) or not all(
+                isinstance(k, str) and len(k) == 1 and isinstance(v, str) for k, v in productions.items()
+            ):
+                raise ValueError("'productions' must map single symbols to strings")
+
+        depth = payload.get("depth", depth)
+        if not isinstance(depth, int) or isinstance(depth, bool) or depth < 0:
+            raise ValueError("'depth' must be a non negative integer")
+        fmt = payload.get("format", "png")
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"unsupported format '{fmt}', expected one of {', '.join(CONTENT_TYPES)}")
+        size = payload.get("size", [800, 800])
+        if (
+            not isinstance(size, list)
+            or len(size) != 2
+            or not all(isinstance(v, int) and 0 < v <= MAX_IMAGE_SIDE for v in size)
+        ):
+            raise ValueError(f"'size' must be [width, height] with sides between 1 and {MAX_IMAGE_SIDE}")
+        return cls(
+            axiom=axiom,
+            productions=tuple(sorted(productions.items())),
+            depth=depth,
+            turtle_configuration=_turtle_configuration(base, payload.get("turtle", {})),
+            format=fmt,
+            size=tuple(size),
+            example=example,
+        )
+
+    @functools.cached_property
+    def key(self) -> str:
+        """
+        Returns:
+            A digest identifying the rendered image, equal for requests that render the same image.
+        """
+        canonical = json.dumps(asdict(self), sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+    def lsystem(self) -> Lsystem:
+        """
+        Returns:
+            The L-System of the request.
+        """
+        if self.example is not None:
+            return EXAMPLES[self.example][0]
+        return GrammarLsystem(self.axiom, dict(self.productions), self.depth)
+
+
+@dataclass(frozen=True)
+class RenderResult:
+    """A rendered image."""
+
+    data: bytes
+    content_type: str
+    segments: int
+    timings: dict[str, float] = field(default_factory=dict)
+    """The seconds spent in every `TIMED_SPANS` stage, and in the whole render (`render`)."""
+
+
+def render_request(request: RenderRequest, budget: Budget | None = None) -> RenderResult:
+    """
+    Expands, interprets and exports the L-System of a request, it runs in the worker processes of the service.
+
+    The geometry is held in memory until the image is framed by its bounding box. If it would exceed the `max_bytes`
+    of a degradable budget, it is dropped and the state is streamed a second time for the export instead.
+
+    Args:
+        request: What to render.
+        budget: The resources the render may use, defaults to `l_system.budget.default_budget()`.
+
+    Returns:
+        The image, along with the time spent in every stage.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        BudgetExceeded: If the render would exceed the `budget`.
+    """
+    from l_system.rendering.export import EXPORTERS
+    from l_system.rendering.geometry import merge_bounding_boxes
+    from l_system.streaming import iter_expansion, iter_geometry
+
+    conf = request.turtle_configuration
+    lsystem = request.lsystem()
+    budget = resolve(budget)
+
+    def stream():
+        return iter_geometry(iter_expansion(lsystem, request.depth, budget=budget), conf, budget)
+
+    profiler = Profiler()
+    start = time.perf_counter()
+    with observe(profiler):
+        geometries, bounding_boxes, segments, held = [], [], 0, 0
+        for geometry in stream():
+            bounding_boxes.append(geometry.bounding_box)
+            segments += len(geometry)
+            if geometries is None:
+                continue
+            held += geometry.segments.nbytes
+            if budget.degrade and budget.max_bytes is not None and held > budget.max_bytes:
+                geometries = None
+            else:
+                budget.check(BYTES, held)
+                geometries.append(geometry)
+        chunks = (g.segments for g in (stream() if geometries is None else geometries))
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / f"image.{request.format}"
+            EXPORTERS[request.format](chunks, merge_bounding_boxes(bounding_boxes), conf, path, request.size)
+            data = path.read_bytes()
+    timings = {name: profiler.spans.get(name, {}).get("total_seconds", 0.0) for name in TIMED_SPANS}
+    timings["render"] = time.perf_counter() - start
+    return RenderResult(data, CONTENT_TYPES[request.format], segments, timings)
+
+
+class ResultCache(BoundedCache[str, RenderResult]):
+    """A least recently used cache of rendered images, keyed by `RenderRequest.key` and bounded by their total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        """
+        Args:
+            max_bytes: The bound of the total size of the cached images, the least recently used ones are evicted.
+        """
+        super().__init__(max_bytes, lambda result: len(result.data))
+
+
+class RenderService:
+    """
+    Renders requests in a process pool, coalescing the identical requests in flight and caching the results.
+
+    ```python
+    async with RenderService(workers=2) as service:
+        result, status = await service.render(RenderRequest.from_json({"example": "DragonCurve"}))
+    ```
+    """
+
+    def __init__(
+        self, workers: int | None = None, cache_bytes: int = DEFAULT_CACHE_BYTES, budget: Budget | None = None
+    ):
+        """
+        Args:
+            workers: The number of worker processes, defaults to the number of CPUs.
+            cache_bytes: The bound of the total size of the cached images.
+            budget: The resources a render may use, defaults to `l_system.budget.default_budget()` when the service
+                is created (the workers don't share the default budget of this process), or to `DEFAULT_BUDGET` when
+                the default budget is unbounded.
+        """
+        self.workers = workers
+        budget = resolve(budget)
+        self.budget = budget if budget.bounded else DEFAULT_BUDGET
+        self.cache = ResultCache(cache_bytes)
+        self.counters = {"requests": 0, "hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def __aenter__(self) -> "RenderService":
+        self._pool = self._start_pool()
+        return self
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        # The workers are spawned rather than forked from a process running an event loop
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._pool.shutdown(cancel_futures=True)
+        self._pool = None
+
+    def _finished(self, key: str, pool: ProcessPoolExecutor, future: asyncio.Future) -> None:
+        # Runs before the coalesced requests are resumed, so the result is cached by then
+        del self._in_flight[key]
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            self.cache.put(key, future.result())
+        elif isinstance(future.exception(), BrokenProcessPool):
+            self._restart_pool(pool)
+
+    def _restart_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Replaces a pool whose worker died (e.g. killed when out of memory), it would fail every later render."""
+        if pool is self._pool:
+            logger.error("A worker process died, restarting the pool")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._start_pool()
+
+    async def render(self, request: RenderRequest) -> tuple[RenderResult, str]:
+        """
+        Renders a request, unless the same image is cached or already being rendered.
+
+        Args:
+            request: What to render.
+
+        Returns:
+            The image, and whether it was read from the cache (`hit`), rendered for another request in flight
+                (`coalesced`) or rendered for this request (`miss`).
+
+        Raises:
+            KeyError: If a symbol of the state is not mapped to a turtle move.
+            IndexError: If a `]` of the state has no matching `[`.
+            BudgetExceeded: If the render would exceed the budget of the service.
+            BrokenProcessPool: If the worker rendering the request died, the pool is then restarted.
+        """
+        key = request.key
+        self.counters["requests"] += 1
+        result = self.cache.get(key)
+        if result is not None:
+            self.counters["hits"] += 1
+            return result, "hit"
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            status = "coalesced"
+        else:
+            self.counters["misses"] += 1
+            status = "miss"
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(self._pool, render_request, request, self.budget)
+            except BrokenProcessPool:
+                # A worker died since the last render
+                self._restart_pool(self._pool)
+                future = loop.run_in_executor(self._pool, render_request, request, self.budget)
+            self._in_flight[key] = future
+            future.add_done_callback(functools.partial(self._finished, key, self._pool))
+        try:
+            # A request whose client goes away doesn't cancel the render of the others
+            return await asyncio.shield(future), status
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            The request counters, the number of renders in flight and the size of the cache.
+        """
+        return {
+            **self.counters,
+            "in_flight": len(self._in_flight),
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache.size,
+            "cache_max_bytes": self.cache.max_bytes,
+            "cache_evictions": self.cache.evictions,
+        }
+
+    async def _route(self, method: str, path: str, body: bytes) -> tuple[HTTPStatus, bytes, dict[str, str]]:
+        """Handles a request, returning the status, body and headers of the response."""
+        if path == "/render":
+            if method != "POST":
+                return _error(HTTPStatus.METHOD_NOT_ALLOWED, "use POST")
+            try:
+                request = RenderRequest.from_json(json.loads(body or b"null"))
+            except ValueError as exc:  # Also `json.JSONDecodeError`
+                return _error(HTTPStatus.BAD_REQUEST, str(exc))
+            start = time.perf_counter()
+            try:
+                result, status = await self.render(request)
+            except KeyError as exc:
+                return _error(HTTPStatus.UNPROCESSABLE_ENTITY, f"symbol {exc} is not mapped to a turtle move")
+            except IndexError:
+                return _error(HTTPStatus.UNPROCESSABLE_ENTITY, "a ']' has no matching '['")
+            except BudgetExceeded as exc:
+                return _error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, str(exc))
+            except BrokenProcessPool:
+                return _error(
+                    HTTPStatus.SERVICE_UNAVAILABLE, "the worker rendering the request died, e.g. out of memory"
+                )
+            timings = {} if status == "hit" else dict(result.timings)
+            timings["total"] = time.perf_counter() - start
+            headers = {
+                "Content-Type": result.content_type,
+                "Server-Timing": ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()),
+                "X-Cache": status,
+                "X-Segments": str(result.segments),
+            }
+            return HTTPStatus.OK, result.data, headers
+        if method != "GET":
+            return _error(HTTPStatus.METHOD_NOT_ALLOWED, "use GET")
+        if path == "/examples":
+            return _json(HTTPStatus.OK, list(EXAMPLES))
+        if path == "/stats":
+            return _json(HTTPStatus.OK, self.stats())
+        return _error(HTTPStatus.NOT_FOUND, f"no such endpoint '{path}'")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves one HTTP/1.1 request of a connection, the connection is closed after the response.
+
+        Args:
+            reader: The stream of the request.
+            writer: The stream of the response.
+        """
+        start = time.perf_counter()
+        method, path = "-", "-"
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            path = target.split("?", 1)[0]
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                status, body, response_headers = _error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "the body is too large")
+            else:
+                status, body, response_headers = await self._route(method, path, await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError):
+            status, body, response_headers = _error(HTTPStatus.BAD_REQUEST, "malformed HTTP request")
+        except Exception:
+            logger.exception("Failed to serve %s %s", method, path)
+            status, body, response_headers = _error(HTTPStatus.INTERNAL_SERVER_ERROR, "the render failed")
+
+        head = [f"HTTP/1.1 {status.value} {status.phrase}", f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in response_headers.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        logger.info(
+            "%s %s %d %s %.1f ms",
+            method,
+            path,
+            status.value,
+            response_headers.get("X-Cache", "-"),
+            (time.perf_counter() - start) * 1000,
+        )
+
+
+def _json(status: HTTPStatus, payload) -> tuple[HTTPStatus, bytes, dict[str, str]]:
+    return status, json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"}
+
+
+def _error(status: HTTPStatus, message: str) -> tuple[HTTPStatus, bytes, dict[str, str]]:
+    return _json(status, {"error": message})
+
+
+async def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int | None = None,
+    cache_bytes: int = DEFAULT_CACHE_BYTES,
+    budget: Budget | None = None,
+) -> None:
+    """
+    Runs the render service until it's cancelled.
+
+    Args:
+        host: The interface to listen on, only the local machine by default.
+        port: The port to listen on.
+        workers: The number of worker processes, defaults to the number of CPUs.
+        cache_bytes: The bound of the total size of the cached images.
+        budget: The resources a render may use, see `RenderService`.
+    """
+    async with RenderService(workers, cache_bytes, budget) as service:
+        server = await asyncio.start_server(service.handle, host, port)
+        async with server:
+            for sock in server.sockets:
+                logger.info("Serving L-Systems on http://%s:%d", *sock.getsockname()[:2])
+            await server.serve_forever()
@@ -0,0 +1,153 @@
+"""
+Streaming expansion and interpretation of L-Systems, for depths whose state doesn't fit in memory.
+
+The state is expanded depth first: the axiom is rewritten one generation at a time, every generation is split into
+chunks of at most `chunk_size` symbols and the first chunk is rewritten further before the next one is touched. The
+chunks of the last generation are yielded in order, so only `O(depth * chunk_size)` symbols are resident at any time
+(assuming a bounded successor length). The turtle state (heading, position and stack of pushed states) is carried from
+one chunk to the next by `interpret_chunk`.
+
+```python
+lsystem, turtle_conf = EXAMPLES['DragonCurve']
+for geometry in iter_geometry(iter_expansion(lsystem, 20), turtle_conf):
+    ...
+```
+"""
+
+import time
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+
+from l_system import profiling
+from l_system.base import Lsystem
+from l_system.budget import SECONDS, SEGMENTS, Budget, resolve
+from l_system.parametric import ModuleStream, ParametricLsystem
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import DRAW, Geometry, TurtleState, interpret_chunk, state_moves
+from l_system.symbol_array import CHUNK_SIZE, SymbolArray, intern_grammar_cached
+
+
+def _compiled(
+    lsystem: Lsystem,
+) -> tuple[SymbolArray | ModuleStream, Callable[[SymbolArray | ModuleStream], SymbolArray | ModuleStream]]:
+    """The encoded axiom of an L-System and the function rewriting a state to the next generation."""
+    if isinstance(lsystem, ParametricLsystem):
+        return lsystem.compiled.axiom, lsystem.compiled.rewrite
+    grammar = intern_grammar_cached(lsystem.axiom, tuple(lsystem.productions.items()))
+    return grammar.encode(lsystem.axiom), grammar.rewrite
+
+
+def iter_generations(
+    lsystem: Lsystem,
+    n: int | None = None,
+    budget: Budget | None = None,
+    start: tuple[int, SymbolArray | ModuleStream] | None = None,
+) -> Iterator[tuple[int, SymbolArray | ModuleStream]]:
+    """
+    Expands the axiom of an L-System one generation at a time, every generation is rewritten from the previous one. The
+    state of `lsystem` is not modified.
+
+    Args:
+        lsystem: The L-System to expand.
+        n: The last generation, defaults to `lsystem.recursions`.
+        budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`.
+        start: A generation computed earlier and its state to continue from, instead of the axiom.
+
+    Yields:
+        Every generation from the axiom (generation 0), or from `start`, to generation `n`, along with its whole
+            state.
+
+    Raises:
+        BudgetExceeded: If the next generation would exceed the `budget`.
+    """
+    n = lsystem.recursions if n is None else n
+    axiom, rewrite = _compiled(lsystem)
+    first, state = (0, axiom) if start is None else start
+    governor = lsystem.governor(budget, state=None if start is None else state.ids)
+    yield first, state
+    for generation in range(first + 1, n + 1):
+        if governor:
+            governor.before_rewrite(generation, state.ids)
+        with profiling.span("expansion"):
+            state = rewrite(state)
+        yield generation, state
+
+
+def iter_expansion(
+    lsystem: Lsystem, n: int | None = None, chunk_size: int = CHUNK_SIZE, budget: Budget | None = None
+) -> Iterator[SymbolArray | ModuleStream]:
+    """
+    Expands the axiom of an L-System `n` times, yielding the final state in chunks. The state of `lsystem` is not
+    modified.
+
+    Args:
+        lsystem: The L-System to expand.
+        n: The number of recursions, defaults to `lsystem.recursions`.
+        chunk_size: The maximum number of symbols of a chunk.
+        budget: The resources the expansion may use, defaults to `l_system.budget.default_budget()`. Only chunks of
+            the state are held in memory, so its `max_bytes` doesn't apply.
+
+    Yields:
+        Consecutive chunks of the final state, `SymbolArray`s or `ModuleStream`s for parametric L-Systems.
+
+    Raises:
+        BudgetExceeded: If a generation would exceed the `budget`, checked when its first chunk is rewritten.
+    """
+    n = lsystem.recursions if n is None else n
+    start, rewrite = _compiled(lsystem)
+    governor = lsystem.governor(budget, resident=False)
+    checked = 0
+    pending = [(0, start)]
+    while pending:
+        generation, chunk = pending.pop()
+        if generation == n:
+            yield chunk
+            continue
+        if governor:
+            if generation == checked:
+                # The whole generation isn't resident, so its size is predicted from the counts of the previous one
+                checked += 1
+                governor.before_rewrite(checked)
+            else:
+                governor.check_time(generation)
+        with profiling.span("expansion"):
+            chunk = rewrite(chunk)
+        # Pushed in reverse so that the first chunk is expanded (and yielded) first
+        pending.extend((generation + 1, chunk[i : i + chunk_size]) for i in reversed(range(0, len(chunk), chunk_size)))
+
+
+def iter_geometry(
+    chunks: Iterable[SymbolArray | ModuleStream],
+    turtle_configuration: TurtleConfiguration,
+    budget: Budget | None = None,
+) -> Iterator[Geometry]:
+    """
+    Interprets the chunks of a streamed state, carrying the turtle state from one chunk to the next.
+
+    Args:
+        chunks: Consecutive chunks of a state, e.g. from `iter_expansion`.
+        turtle_configuration: Interpret the state according to this `TurtleConfiguration`.
+        budget: The resources the interpretation may use, defaults to `l_system.budget.default_budget()`.
+
+    Yields:
+        The `Geometry` drawn by every chunk.
+
+    Raises:
+        KeyError: If a symbol of the state is not mapped to a turtle move.
+        BudgetExceeded: If the segments drawn so far would exceed the `budget`, checked before every chunk is
+            interpreted.
+    """
+    budget = resolve(budget)
+    start, drawn = time.monotonic(), 0
+    turtle_state = TurtleState.initial(turtle_configuration)
+    for chunk in chunks:
+        if budget.max_seconds is not None:
+            budget.check(SECONDS, round(time.monotonic() - start, 3))
+        with profiling.span("geometry"):
+            moves, steps, angles = state_moves(chunk, turtle_configuration)
+            if budget.max_segments is not None:
+                drawn += int(np.count_nonzero(moves == DRAW))
+                budget.check(SEGMENTS, drawn)
+            geometry, turtle_state = interpret_chunk(moves, turtle_configuration, turtle_state, steps, angles)
+        yield geometry
@@ -0,0 +1,148 @@
+"""
+A NumPy state backend for L-Systems: the alphabet is interned into small integer ids and the state is a `uint8` array,
+one byte per symbol.
+
+One generation is a vectorized gather from a flattened table of successors (see `compiler.gather_rewrite`), so no
+Python loop runs over the symbols and no per-symbol objects are created. The resulting `SymbolArray` can be passed
+directly to `l_system.rendering.geometry.compute_geometry`.
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from l_system.compiler import gather_rewrite
+
+CHUNK_SIZE = 1 << 20
+"""How many symbols are rewritten at once, bounding the temporary index arrays of a gather."""
+
+
+@dataclass(frozen=True)
+class SymbolArray:
+    """A state of an L-System stored as an array of symbol ids."""
+
+    symbols: str
+    """The symbol table, the symbol of position `i` is `symbols[ids[i]]`."""
+    ids: np.ndarray
+    """A `(n,)` `uint8` array with the symbol id of every position."""
+
+    def __len__(self) -> int:
+        """Returns the number of symbols."""
+        return len(self.ids)
+
+    def __iter__(self) -> Iterable[str]:
+        """Iterate over the symbols."""
+        symbols = self.symbols
+        for i in self.ids.tolist():
+            yield symbols[i]
+
+    def __getitem__(self, index: slice) -> "SymbolArray":
+        """Returns a slice of the state, sharing the symbol ids."""
+        return SymbolArray(self.symbols, self.ids[index])
+
+    def __str__(self) -> str:
+        if all(ord(s) < 256 for s in self.symbols):
+            table = np.frombuffer(self.symbols.encode('latin-1'), dtype=np.uint8)
+            return table[self.ids].tobytes().decode('latin-1')
+        return "".join(self)
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the symbol ids."""
+        return self.ids.nbytes
+
+
+@dataclass(frozen=True)
+class InternedGrammar:
+    """The production rules of an L-System translated to tables of symbol ids."""
+
+    symbols: str
+    """The symbol table of the grammar."""
+    lengths: np.ndarray
+    """The successor length of every symbol id."""
+    starts: np.ndarray
+    """The offset of the successor of every symbol id in `table`."""
+    table: np.ndarray
+    """The flattened successors as symbol ids."""
+
+    def encode(self, state: str) -> SymbolArray:
+        """
+        Converts a string of symbols to a `SymbolArray`.
+
+        Args:
+            state: A string made of the symbols of the grammar.
+
+        Returns:
+            The state as a `SymbolArray`.
+        """
+        index = {s: i for i, s in enumerate(self.symbols)}
+        return SymbolArray(self.symbols, np.fromiter((index[s] for s in state), dtype=np.uint8, count=len(state)))
+
+    def rewrite(self, state: SymbolArray) -> SymbolArray:
+        """
+        Applies the production rules once.
+
+        Args:
+            state: The current state.
+
+        Returns:
+            The next state.
+        """
+        ids = state.ids
+        chunks = range(0, len(ids), CHUNK_SIZE)
+        total = sum(int(self.lengths[ids[i : i + CHUNK_SIZE]].sum()) for i in chunks)
+        out = np.empty(total, dtype=np.uint8)
+        position = 0
+        for i in chunks:
+            rewritten = gather_rewrite(ids[i : i + CHUNK_SIZE], self.lengths, self.starts, self.table)
+            out[position : position + len(rewritten)] = rewritten
+            position += len(rewritten)
+        return SymbolArray(self.symbols, out)
+
+
+def intern_grammar(axiom: str, productions: dict[str, str]) -> InternedGrammar:
+    """
+    Interns the alphabet of a grammar and flattens its production rules to tables of symbol ids.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System, keys must be single symbols.
+
+    Returns:
+        The `InternedGrammar`.
+
+    Raises:
+        ValueError: If a predecessor is not a single symbol or if the grammar has more than 256 symbols.
+    """
+    if any(len(k) != 1 for k in productions):
+        raise ValueError("Only single symbol predecessors can be interned.")
+    symbols = "".join(sorted(set(axiom).union(*productions.values(), productions)))
+    if len(symbols) > 256:
+        raise ValueError(f"Can't intern {len(symbols)} symbols to uint8 ids.")
+
+    index = {s: i for i, s in enumerate(symbols)}
+    lengths = np.ones(len(symbols), dtype=np.int64)
+    starts = np.arange(len(symbols), dtype=np.int64)
+    table = list(range(len(symbols)))
+    for symbol, successor in productions.items():
+        starts[index[symbol]] = len(table)
+        lengths[index[symbol]] = len(successor)
+        table += [index[s] for s in successor]
+    return InternedGrammar(symbols, lengths, starts, np.array(table, dtype=np.uint8))
+
+
+@functools.lru_cache(maxsize=None)
+def intern_grammar_cached(axiom: str, productions: tuple[tuple[str, str], ...]) -> InternedGrammar:
+    """
+    Same as `intern_grammar`, but the tables are built only once per grammar.
+
+    Args:
+        axiom: The axiom of the L-System.
+        productions: The production rules of the L-System as `(symbol, successor)` pairs.
+
+    Returns:
+        The `InternedGrammar` of the grammar.
+    """
+    return intern_grammar(axiom, dict(productions))
@@ -0,0 +1,44 @@
+"""Testing the headless growth animations."""
+
+import numpy as np
+import pytest
+from l_system.registry import EXAMPLES
+from l_system.rendering.animation import growth_frames, write_animation
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import render_image
+from l_system.rendering.geometry import compute_geometry
+from PIL import Image
+
+from tests.constants import KochCurve
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_progress(workers):
+    """The frames grow incrementally to the image of the whole generation, whatever the number of workers."""
+    lsystem, conf = EXAMPLES['BracketedOlSystemFig124a']
+    frames = growth_frames(lsystem, conf, 3, "progress", 7, (120, 90), workers)
+    assert len(frames) == 7
+    drawn = [np.asarray(frame).any(axis=2).sum() for frame in frames]
+    assert drawn == sorted(drawn) and drawn[0] > 0
+    expected = render_image(compute_geometry(lsystem.apply(3), conf), conf, (120, 90))
+    np.testing.assert_array_equal(np.asarray(frames[-1]), np.asarray(expected))
+
+
+def test_depth():
+    """There is a frame per generation, every one framed by its own bounding box."""
+    conf = TurtleConfiguration(angle=90)
+    frames = growth_frames(KochCurve(), conf, 3, "depth", size=(64, 64), workers=1)
+    assert len(frames) == 4
+    for depth, frame in enumerate(frames):
+        expected = render_image(compute_geometry(KochCurve().apply(depth), conf), conf, (64, 64))
+        np.testing.assert_array_equal(np.asarray(frame), np.asarray(expected))
+
+
+@pytest.mark.parametrize("suffix", [".gif", ".png"])
+def test_write_animation(tmp_path, suffix):
+    frames = growth_frames(KochCurve(), TurtleConfiguration(angle=90), 2, frames=5, size=(32, 32), workers=1)
+    write_animation(frames, tmp_path / f"koch{suffix}")
+    animation = Image.open(tmp_path / f"koch{suffix}")
+    assert animation.is_animated and animation.n_frames == 5
+    with pytest.raises(ValueError):
+        write_animation(frames, tmp_path / "koch.mp4")
@@ -0,0 +1,34 @@
+"""Testing the benchmark suite."""
+
+from dataclasses import replace
+
+from l_system.benchmark import STAGES, append_history, benchmark_example, benchmark_scaling, compare, load_history
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+
+from tests.constants import KochCurve
+
+
+def test_benchmark_history(tmp_path):
+    """Every stage is measured, stored to the history and compared against the previous run."""
+    results = benchmark_example("KochCurve", KochCurve(), TurtleConfiguration(), depths=[1, 2], repeat=1)
+    assert [(r.depth, r.stage) for r in results] == [(d, s) for d in (1, 2) for s in STAGES]
+    assert all(r.seconds > 0 and r.symbols_per_second > 0 for r in results)
+
+    history = tmp_path / "history.json"
+    append_history(history, results)
+    append_history(history, results)
+    assert len(load_history(history)) == 2
+
+    slower = [replace(r, seconds=r.seconds * 2) if r.stage == "geometry" else r for r in results]
+    regressions = compare(slower, results, threshold=0.5)
+    assert [(r.current.depth, r.current.stage) for r in regressions] == [(1, "geometry"), (2, "geometry")]
+    assert not compare(results, slower, threshold=0.5)
+
+
+def test_benchmark_scaling():
+    """The parallel geometry is timed for every number of workers and compared against `compute_geometry`."""
+    lsystem, conf = EXAMPLES['BracketedOlSystemFig124a']
+    results = benchmark_scaling('BracketedOlSystemFig124a', lsystem, conf, depths=[3], workers=[1, 2], repeat=1)
+    assert [(r.depth, r.workers) for r in results] == [(3, 1), (3, 2)]
+    assert all(r.seconds > 0 and r.speedup > 0 and r.max_error <= 1e-9 and r.segments == 125 for r in results)
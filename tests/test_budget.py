@@ -0,0 +1,126 @@
+"""Testing the resource budgets of the expansion and interpretation of L-Systems."""
+
+import pickle
+import threading
+
+import numpy as np
+import pytest
+from l_system.budget import UNBOUNDED, Budget, BudgetExceeded, default_budget, limits
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+from l_system.server import RenderRequest, render_request
+from l_system.streaming import iter_expansion, iter_generations, iter_geometry
+
+from tests.constants import FractalTree, KochCurve
+
+
+@pytest.mark.parametrize("lsystem", [KochCurve(), FractalTree(), EXAMPLES['ParametricBinaryTree'][0]])
+def test_growth_model(lsystem):
+    """The predicted counts of the symbols are exact, or upper bounds for parametric L-Systems."""
+    model = lsystem.growth_model
+    counts = model.axiom
+    for _, state in iter_generations(lsystem, 5):
+        actual = model.count(state.ids)
+        assert np.all(counts >= actual) if not model.exact else np.array_equal(counts, actual)
+        counts = model.step(actual)
+
+
+@pytest.mark.parametrize("method", ["apply", "apply_array", "apply_runs"])
+def test_apply(method):
+    """The expansion is aborted before the generation exceeding the budget is rewritten."""
+    lsystem = KochCurve()
+    limit = len(lsystem.apply(4))
+    assert len(getattr(lsystem, method)(4, budget=Budget(max_symbols=limit))) == limit
+    with pytest.raises(BudgetExceeded, match="symbols budget would be exceeded at generation 5") as exc_info:
+        getattr(lsystem, method)(6, budget=Budget(max_symbols=limit))
+    assert exc_info.value.required == len(lsystem.apply(5)) and exc_info.value.limit == limit
+
+
+def test_apply_keeps_last_state():
+    """An expansion continued from the current state predicts from it, and keeps the last generation that fits."""
+    lsystem = KochCurve()
+    lsystem.apply(2)
+    with pytest.raises(BudgetExceeded):
+        lsystem.apply(3, reset_state=False, budget=Budget(max_bytes=len(KochCurve().apply(4))))
+    assert lsystem.state == KochCurve().apply(4)
+
+
+def test_default_budget():
+    """The calls without a budget use the default one, and `limits` restores the previous one."""
+    with limits(Budget(max_symbols=100)):
+        with pytest.raises(BudgetExceeded):
+            KochCurve().apply_array(6)
+        KochCurve().apply_array(6, budget=Budget())
+    assert not default_budget().bounded
+
+
+def test_concurrent_limits():
+    """The `limits` of concurrent threads don't affect each other, even when they exit in the opposite order."""
+    barrier, seen = threading.Barrier(2), {}
+
+    def run(name, budget, exit_first):
+        with limits(budget):
+            barrier.wait()
+            if not exit_first:
+                barrier.wait()
+            seen[name] = default_budget()
+        if exit_first:
+            barrier.wait()
+        seen[name + " after"] = default_budget()
+
+    threads = [
+        threading.Thread(target=run, args=("a", Budget(max_symbols=1), False)),
+        threading.Thread(target=run, args=("b", Budget(max_symbols=2), True)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen["a"].max_symbols == 1 and seen["b"].max_symbols == 2
+    assert seen["a after"] is seen["b after"] is UNBOUNDED
+
+
+def test_parametric():
+    lsystem, _ = EXAMPLES['ParametricBinaryTree']
+    with pytest.raises(BudgetExceeded, match="bytes"):
+        lsystem.apply(10, budget=Budget(max_bytes=1000))
+
+
+def test_streaming():
+    """A streamed expansion isn't bound by the memory budget, but by the symbols and segments ones."""
+    lsystem, conf = KochCurve(), TurtleConfiguration(angle=90)
+    chunks = list(iter_expansion(lsystem, 5, chunk_size=100, budget=Budget(max_bytes=200)))
+    assert sum(len(c) for c in chunks) == len(lsystem.apply(5))
+    with pytest.raises(BudgetExceeded, match="symbols"):
+        list(iter_expansion(lsystem, 5, chunk_size=100, budget=Budget(max_symbols=1000)))
+    with pytest.raises(BudgetExceeded, match="segments"):
+        list(iter_geometry(chunks, conf, Budget(max_segments=1000)))
+    with pytest.raises(BudgetExceeded, match="seconds"):
+        list(iter_expansion(lsystem, 5, chunk_size=100, budget=Budget(max_seconds=-1)))
+
+
+def test_compute_geometry():
+    conf = TurtleConfiguration(angle=90)
+    state = KochCurve().apply(3)
+    assert len(compute_geometry(state, conf, Budget(max_segments=state.count('F')))) == state.count('F')
+    with pytest.raises(BudgetExceeded, match="segments"):
+        compute_geometry(state, conf, Budget(max_segments=state.count('F') - 1))
+
+
+def test_render_request_degrades():
+    """A render over the memory budget streams the state twice instead of holding its geometry."""
+    request = RenderRequest.from_json({"example": "DragonCurve", "depth": 12, "size": [64, 64]})
+    expected = render_request(request)
+    with pytest.raises(BudgetExceeded):
+        render_request(request, Budget(max_bytes=10_000))
+    degraded = render_request(request, Budget(max_bytes=10_000, degrade=True))
+    assert degraded.data == expected.data and degraded.segments == expected.segments
+
+
+def test_pickle():
+    """Budget errors raised in worker processes are sent back to the caller."""
+    error = BudgetExceeded("segments", 10, 5, generation=3)
+    unpickled = pickle.loads(pickle.dumps(error))
+    assert (unpickled.resource, unpickled.required, unpickled.limit, unpickled.generation) == ("segments", 10, 5, 3)
+    assert str(unpickled) == str(error)
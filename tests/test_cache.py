@@ -0,0 +1,26 @@
+"""Testing the least recently used cache bounded by the size of its values."""
+
+from l_system.cache import BoundedCache
+
+
+def test_eviction():
+    """The least recently used values are evicted once the cache is full, and larger values aren't cached."""
+    cache = BoundedCache(max_bytes=10)
+    assert [cache.put(key, b"1234") for key in "abc"] == [0, 0, 1]
+    assert "a" not in cache and cache.size == 8 and cache.evictions == 1
+    assert cache.get("b") == b"1234" and cache.get("a") is None
+    cache.put("d", b"12")
+    assert list(cache) == ["c", "b", "d"] and cache.size == 10
+    assert cache.put("e", bytes(11)) == 0 and "e" not in cache
+
+
+def test_peek_and_clear():
+    """Peeking doesn't mark a value as used, and clearing isn't counted as evictions."""
+    cache = BoundedCache(max_bytes=2, sizeof=lambda value: 1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.peek("a") == 1
+    cache.put("c", 3)
+    assert list(cache) == ["b", "c"]
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0 and cache.evictions == 1
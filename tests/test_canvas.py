@@ -0,0 +1,46 @@
+"""Testing the drawing backend writing straight to a Tk canvas."""
+
+import numpy as np
+from l_system.rendering.canvas import canvas_items, draw_items
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import to_pixels
+from l_system.rendering.geometry import compute_drawing, compute_geometry, polylines, world_coordinates
+
+from tests.constants import FractalTree, KochCurve
+
+
+class RecordingCanvas:
+    """Records the items created on it, like a `tk.Canvas` without a display."""
+
+    def __init__(self):
+        self.items = []
+
+    def __getattr__(self, name: str):
+        kind = name.removeprefix("create_")
+        return lambda *coordinates, **options: self.items.append((kind, coordinates, options)) or len(self.items)
+
+
+def test_polylines():
+    """Every polyline is a single line item, split at `max_points` points, in canvas coordinates."""
+    conf = TurtleConfiguration(angle=90)
+    geometry = compute_geometry(KochCurve().apply(4), conf)
+    world = world_coordinates(geometry.bounding_box)
+    items = list(canvas_items(geometry, conf, world, (300, 200), origin=(-150, -100), max_points=100))
+    assert len(items) == -(-len(geometry) // 99) and len(polylines(geometry.segments)) == 1
+    points = np.concatenate([np.reshape(item.coordinates, (-1, 2))[1:] for item in items])
+    expected = to_pixels(geometry.segments[:, 2:], world, (300, 200)) - [150, 100]
+    np.testing.assert_allclose(points, expected)
+
+
+def test_draw_items():
+    """The polygons are drawn first and the dots last, and the drawing is animated in batches."""
+    conf = TurtleConfiguration(angle=45, line_width=3, palette=((1, 0, 0), (0, 0, 1)))
+    drawing = compute_drawing("{F+F+F}" + FractalTree().apply(3).replace('0', "'F@").replace('1', 'F'), conf)
+    world = world_coordinates(drawing.geometry.bounding_box)
+    canvas, batches = RecordingCanvas(), []
+    count = draw_items(canvas, canvas_items(drawing, conf, world, (200, 200)), "lsystem", batches.append, 4)
+    kinds = [kind for kind, _, _ in canvas.items]
+    assert count == len(kinds) and batches == list(range(4, count + 1, 4))
+    assert kinds == sorted(kinds, key=["polygon", "line", "oval"].index) and kinds.count("oval") == len(drawing.dots)
+    assert {options["fill"] for kind, _, options in canvas.items if kind == "line"} == {"#ff0000", "#0000ff"}
+    assert all(options["tags"] == "lsystem" for _, _, options in canvas.items)
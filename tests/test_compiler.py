@@ -0,0 +1,27 @@
+"""Testing the grammar-specialized rewrite functions."""
+
+import pytest
+from l_system.compiler import GATHER, REFERENCE, REPLACE, TRANSLATE, compile_grammar, reference_rewrite
+
+
+@pytest.mark.parametrize(
+    "axiom, productions, strategy",
+    [
+        ('F', {'F': 'F+F-F-F+F'}, REPLACE),
+        ('X', {'X': 'F[+X]F[-X]+X', 'F': 'FF'}, REPLACE),
+        ('A', {c: 'AB' + c.lower() + 'C' for c in 'ABCDEF'}, GATHER),
+        ('α', {c: 'αβ' + c for c in 'αβγδεζ'}, TRANSLATE),
+        ('AB', {'AB': 'BA', 'A': 'B'}, REFERENCE),
+        ('A', {'A': 'A'}, REFERENCE),
+    ],
+)
+def test_compile_grammar(axiom, productions, strategy):
+    """Every strategy rewrites exactly like the reference loop."""
+    compiled = compile_grammar(axiom, productions)
+    assert compiled.strategy == strategy
+
+    expected = state = axiom
+    for _ in range(4):
+        state = compiled.rewrite(state)
+        expected = reference_rewrite(expected, productions)
+        assert state == expected
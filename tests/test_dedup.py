@@ -0,0 +1,73 @@
+"""Testing the elimination of duplicate and overlapping segments."""
+
+import numpy as np
+import pytest
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.dedup import deduplicate
+from l_system.rendering.export import render_image
+from l_system.rendering.geometry import Geometry, compute_drawing, compute_geometry, compute_lattice_geometry
+
+
+def geometry(segments) -> Geometry:
+    segments = np.array(segments, dtype=np.float64).reshape(-1, 4)
+    return Geometry(segments, TurtleBoundingBox(0, 0, 10, 10))
+
+
+def test_duplicates():
+    """Empty segments and segments drawn again, in either direction, are dropped. The rest stay in drawing order."""
+    result, report = deduplicate(geometry([[0, 0, 1, 0], [1, 0, 1, 1], [1, 1, 1, 0], [1, 1, 1, 1], [0, 0, 1, 0]]))
+    np.testing.assert_array_equal(result.segments, [[0, 0, 1, 0], [1, 0, 1, 1]])
+    assert (report.segments, report.empty, report.duplicates, report.merged, report.dropped) == (5, 1, 2, 0, 3)
+
+
+def test_merge_collinear():
+    """Overlapping collinear pieces are merged, touching ones only when they are drawn one after the other."""
+    segments = [[0, 0, 2, 0], [3, 0, 1, 0], [5, 0, 7, 0], [0, 1, 1, 1], [1, 1, 2, 1], [2, 2, 3, 3], [7, 0, 8, 0]]
+    result, report = deduplicate(geometry(segments))
+    np.testing.assert_array_equal(
+        result.segments, [[0, 0, 3, 0], [5, 0, 7, 0], [0, 1, 2, 1], [2, 2, 3, 3], [7, 0, 8, 0]]
+    )
+    assert report.merged == 2 and report.duplicates == 0
+    unmerged, report = deduplicate(geometry(segments), merge_collinear=False)
+    assert len(unmerged) == len(segments) and report.dropped == 0
+
+
+def test_merge_collinear_at_any_angle():
+    """Lines that are neither axis aligned nor diagonal are merged, though their end points are rounded."""
+    direction = np.array([np.cos(np.pi / 6), np.sin(np.pi / 6)])
+    result, report = deduplicate(geometry([[0, 0, *2 * direction], [*direction, *3 * direction]]))
+    np.testing.assert_allclose(result.segments, [[0, 0, *3 * direction]])
+    assert report.merged == 1
+    result, report = deduplicate(compute_geometry("+FF+++F", TurtleConfiguration(angle=60)))
+    np.testing.assert_allclose(result.segments, [[0, 0, 3, 3 * np.sqrt(3)]], atol=1e-9)
+    assert (report.duplicates, report.merged) == (1, 1)
+
+
+@pytest.mark.parametrize("name, depth", [('KochCurvesFig19a', 3), ('HexagonalGosperCurve', 5), ('IslandsAndLakes', 3)])
+def test_lattice(name, depth):
+    """The floating point coordinates find the same duplicates and overlaps as the exact lattice ones."""
+    lsystem, conf = EXAMPLES[name]
+    state = lsystem.apply(depth)
+    exact, exact_report = deduplicate(compute_lattice_geometry(state, conf))
+    approximate, report = deduplicate(compute_geometry(state, conf))
+    assert exact.segments.dtype == np.int64 and exact_report == report and report.dropped > 0
+    assert len(exact) == exact_report.remaining
+
+
+def test_drawing_keeps_the_attributes():
+    """Segments of different widths or colors are never merged."""
+    square = "F+F+F+F+"
+    result, report = deduplicate(compute_drawing(square + "#" + square + "!" + square, TurtleConfiguration()))
+    assert report.duplicates == 4 and len(result) == 8
+    assert result.widths.tolist() == [1] * 4 + [2] * 4 and result.lengths.tolist() == [3] * 8
+
+
+def test_same_image():
+    """The deduplicated drawing renders like the original one, up to the pixels where merged lines are rasterized."""
+    lsystem, conf = EXAMPLES['BracketedOlSystemFig124b']
+    original = compute_geometry(lsystem.apply(4), conf)
+    result, report = deduplicate(original)
+    assert report.duplicates > 0
+    expected, actual = (np.asarray(render_image(g, conf, (200, 200))) for g in (original, result))
+    assert np.count_nonzero(np.any(expected != actual, axis=2)) <= 10
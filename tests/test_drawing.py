@@ -0,0 +1,163 @@
+"""Testing the full turtle symbol set and the per-segment attributes of a drawing."""
+
+import math
+
+import numpy as np
+import pytest
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import export_eps, export_png, export_svg
+from l_system.rendering.geometry import (
+    TurtleState,
+    compute_drawing,
+    interpret_chunk,
+    interpret_drawing,
+    state_moves,
+)
+from l_system.run_length import RunLengthState
+
+CONF = TurtleConfiguration(
+    angle=30, line_width=2, line_width_increment=0.5, length_scale_factor=2, angle_increment=10, initial_heading_angle=0
+)
+
+
+def replay_turtle(state: str, conf: TurtleConfiguration) -> dict[str, list]:
+    """A plain Python turtle with the drawing state of https://paulbourke.net/fractals/lsys/."""
+    turtle = {'heading': conf.initial_heading_angle, 'x': 0.0, 'y': 0.0}
+    turtle.update({'width': 0, 'scale': 0, 'angle': 0, 'swap': 0, 'color': 0})
+    stack, polygons, drawing = [], [], {'segments': [], 'widths': [], 'colors': [], 'dots': [], 'polygons': []}
+    for move in state:
+        angle = (conf.angle + conf.angle_increment * turtle['angle']) * (-1 if turtle['swap'] % 2 else 1)
+        width = max(conf.line_width + conf.line_width_increment * turtle['width'], 0)
+        if move in 'Ff':
+            step = conf.forward_step * conf.length_scale_factor ** turtle['scale']
+            x = turtle['x'] + step * math.cos(math.radians(turtle['heading']))
+            y = turtle['y'] + step * math.sin(math.radians(turtle['heading']))
+            if move == 'F':
+                drawing['segments'].append((turtle['x'], turtle['y'], x, y))
+                drawing['widths'].append(width)
+                drawing['colors'].append(turtle['color'])
+            turtle.update(x=x, y=y)
+            if polygons:
+                polygons[-1].append((x, y))
+        elif move in '+-|':
+            turtle['heading'] += {'+': angle, '-': -angle, '|': 180}[move]
+        elif move in '#!><)(&\'':
+            key, increment = {
+                '#': ('width', 1),
+                '!': ('width', -1),
+                '>': ('scale', 1),
+                '<': ('scale', -1),
+                ')': ('angle', 1),
+                '(': ('angle', -1),
+                '&': ('swap', 1),
+                "'": ('color', 1),
+            }[move]
+            turtle[key] += increment
+        elif move == '@':
+            drawing['dots'].append((turtle['x'], turtle['y'], width, turtle['color']))
+        elif move == '{':
+            polygons.append([(turtle['x'], turtle['y'])])
+            drawing['polygons'].append((polygons[-1], turtle['color']))
+        elif move == '}':
+            polygons.pop()
+        elif move == '[':
+            stack.append(dict(turtle))
+        elif move == ']':
+            turtle = stack.pop()
+    return drawing
+
+
+def random_state(rng: np.random.Generator, n: int, alphabet: str = "FFFff+-|#!@><&()'") -> str:
+    """A random state with balanced brackets and polygons."""
+    state, brackets = [], []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.08:
+            state.append('[')
+            brackets.append(']')
+        elif r < 0.12:
+            state.append('{')
+            brackets.append('}')
+        elif r < 0.2 and brackets:
+            state.append(brackets.pop())
+        else:
+            state.append(alphabet[rng.integers(len(alphabet))])
+    return "".join(state + brackets[::-1])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compute_drawing(seed):
+    """Every symbol is interpreted like a turtle replaying every move."""
+    state = random_state(np.random.default_rng(seed), 400)
+    drawing = compute_drawing(state, CONF)
+    expected = replay_turtle(state, CONF)
+
+    np.testing.assert_allclose(drawing.geometry.segments, np.array(expected['segments']).reshape(-1, 4), atol=1e-9)
+    np.testing.assert_allclose(drawing.widths, expected['widths'])
+    np.testing.assert_array_equal(drawing.colors, expected['colors'])
+    np.testing.assert_allclose(drawing.lengths, [math.dist(s[:2], s[2:]) for s in expected['segments']])
+    dots = np.array(expected['dots']).reshape(-1, 4)
+    np.testing.assert_allclose(drawing.dots, dots[:, :2], atol=1e-9)
+    np.testing.assert_allclose(drawing.dot_radii, dots[:, 2])
+    np.testing.assert_array_equal(drawing.dot_colors, dots[:, 3])
+    assert len(drawing.polygons()) == len(expected['polygons'])
+    for vertices, (expected_vertices, _) in zip(drawing.polygons(), expected['polygons']):
+        np.testing.assert_allclose(vertices, expected_vertices, atol=1e-9)
+    np.testing.assert_array_equal(drawing.polygon_colors, [color for _, color in expected['polygons']])
+
+
+def test_unmatched_polygon():
+    """A `}` without a `{` raises an `IndexError` like an unmatched `]`, an unclosed `{` is kept."""
+    with pytest.raises(IndexError):
+        compute_drawing('{F}}', CONF)
+    assert [len(p) for p in compute_drawing('{F+F', CONF).polygons()] == [3]
+
+
+def test_line_groups():
+    """The segments are grouped by width and color, in drawing order within a group."""
+    drawing = compute_drawing("F#F!F'F#F", CONF)
+    groups = [(width, color, len(segments)) for width, color, segments in drawing.line_groups()]
+    assert groups == [(2.0, 0, 2), (2.0, 1, 1), (2.5, 0, 1), (2.5, 1, 1)]
+    np.testing.assert_allclose(next(drawing.line_groups())[2][1], drawing.geometry.segments[2])
+
+
+def test_interpret_chunk():
+    """The drawing state is carried from one chunk to the next, and restored by the `]` of later chunks."""
+    state = random_state(np.random.default_rng(7), 2000)
+    moves, _, _ = state_moves(state, CONF)
+    expected = interpret_drawing(moves, CONF).geometry.segments
+    turtle_state, chunks = TurtleState.initial(CONF), []
+    for i in range(0, len(moves), 97):
+        geometry, turtle_state = interpret_chunk(moves[i : i + 97], CONF, turtle_state)
+        chunks.append(geometry.segments)
+    np.testing.assert_allclose(np.concatenate(chunks), expected, atol=1e-9)
+
+
+def test_run_length_state():
+    """Runs of the drawing state symbols are repeated, instead of merged to a single move like runs of `F`."""
+    state = RunLengthState('F>+|#', np.array([0, 1, 2, 3, 4, 0], dtype=np.uint8), np.array([2, 3, 2, 2, 2, 1]))
+    drawing = compute_drawing(state, CONF)
+    expected = compute_drawing(str(state), CONF)
+    np.testing.assert_allclose(drawing.geometry.segments[-1], expected.geometry.segments[-1], atol=1e-9)
+    np.testing.assert_allclose(drawing.widths[-1], expected.widths[-1])
+
+
+def test_default_palette():
+    """Without a palette every color index is the foreground color."""
+    conf = TurtleConfiguration(fg_color=(0.1, 0.2, 0.3), palette=((1, 0, 0), (0, 1, 0)))
+    assert conf.color(3) == (0, 1, 0)
+    assert TurtleConfiguration(fg_color=(0.1, 0.2, 0.3)).color(3) == (0.1, 0.2, 0.3)
+
+
+@pytest.mark.parametrize("export", [export_png, export_svg, export_eps])
+def test_export(tmp_path, export):
+    """The drawing is exported with its widths, colors, dots and polygons."""
+    conf = TurtleConfiguration(angle=90, palette=((1, 0, 0), (0, 0, 1)))
+    drawing = compute_drawing("{F+F+F+F}'#F@", conf)
+    path = tmp_path / f"drawing.{export.__name__[-3:]}"
+    export(drawing, conf, path, (64, 64))
+    assert path.stat().st_size > 0
+    if path.suffix == ".svg":
+        svg = path.read_text()
+        assert 'stroke="rgb(0, 0, 255)" stroke-width="2"' in svg
+        assert 'Z" fill="rgb(255, 0, 0)"' in svg and "<circle" in svg
@@ -0,0 +1,64 @@
+"""Testing the immutable expansions shared between threads."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from l_system.budget import Budget, BudgetExceeded
+from l_system.expansion import ExpansionCache
+from l_system.registry import EXAMPLES
+
+from tests.constants import FractalTree, KochCurve
+
+
+def test_expand():
+    """The expansion matches `apply`, without modifying the L-System, and its state is read-only."""
+    lsystem = KochCurve()
+    expansion = ExpansionCache().expand(lsystem, 3)
+    assert lsystem.state == lsystem.axiom and expansion.depth == 3
+    assert str(expansion.state) == KochCurve().apply(3) and len(expansion) == len(KochCurve().apply(3))
+    with pytest.raises(ValueError, match="read-only"):
+        expansion.state.ids[0] = 0
+
+
+def test_concurrent():
+    """Concurrent requests for the same expansion are computed once and share the result."""
+    cache, barrier = ExpansionCache(), threading.Barrier(8)
+    lsystem, _ = EXAMPLES['DragonCurve']
+
+    def request(_):
+        barrier.wait()
+        return cache.expand(lsystem, 16)
+
+    with ThreadPoolExecutor(8) as pool:
+        expansions = list(pool.map(request, range(8)))
+    assert all(e is expansions[0] for e in expansions)
+    assert cache.counters["misses"] == 1 and cache.counters["hits"] + cache.counters["coalesced"] == 7
+
+
+@pytest.mark.parametrize("lsystem", [FractalTree(), EXAMPLES['ParametricBinaryTree'][0]])
+def test_continue_from_cached(lsystem):
+    """A deeper expansion continues from a cached one, and matches the expansion from the axiom."""
+    cache = ExpansionCache()
+    cache.expand(lsystem, 2)
+    deeper = cache.expand(lsystem, 5)
+    expected = ExpansionCache().expand(lsystem, 5)
+    assert str(deeper.state) == str(expected.state) and deeper.fingerprint == expected.fingerprint
+    assert (expected.fingerprint, 5) in cache and len(cache) == 2
+
+
+def test_eviction():
+    """The least recently used expansions are evicted to bound the total size of the states."""
+    lsystem = KochCurve()
+    cache = ExpansionCache(max_bytes=len(lsystem.apply(3)) + 10)
+    expansions = [cache.expand(lsystem, depth) for depth in range(4)]
+    assert cache.counters["evictions"] > 0 and cache.size <= cache.max_bytes
+    assert (expansions[3].fingerprint, 3) in cache and (expansions[3].fingerprint, 2) not in cache
+
+
+def test_errors_are_not_cached():
+    """An expansion over its budget raises, and can be computed again with another budget."""
+    cache = ExpansionCache()
+    with pytest.raises(BudgetExceeded):
+        cache.expand(KochCurve(), 5, Budget(max_symbols=1000))
+    assert len(cache.expand(KochCurve(), 5)) == len(KochCurve().apply(5)) and cache.counters["misses"] == 2
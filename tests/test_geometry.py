@@ -0,0 +1,108 @@
+"""Testing the vectorized turtle interpreter."""
+
+import math
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import EISENSTEIN, GAUSSIAN, compute_geometry, compute_lattice_geometry
+
+from tests.constants import FractalTree, KochCurve
+
+
+def replay_turtle(state: str, conf: TurtleConfiguration) -> list[tuple[float, float, float, float]]:
+    """A plain Python turtle, used as the reference of the vectorized interpreter."""
+    heading, x, y, stack, segments = conf.initial_heading_angle, 0.0, 0.0, [], []
+    for symbol in state:
+        move = conf.turtle_move_mapper.get(symbol, symbol)
+        if move in 'Ff':
+            nx = x + conf.forward_step * math.cos(math.radians(heading))
+            ny = y + conf.forward_step * math.sin(math.radians(heading))
+            if move == 'F':
+                segments.append((x, y, nx, ny))
+            x, y = nx, ny
+        elif move == '+':
+            heading += conf.angle
+        elif move == '-':
+            heading -= conf.angle
+        elif move == '[':
+            stack.append((heading, x, y))
+        elif move == ']':
+            heading, x, y = stack.pop()
+    return segments
+
+
+@pytest.mark.parametrize(
+    "lsystem, conf",
+    [
+        (KochCurve(), TurtleConfiguration(angle=90)),
+        (FractalTree(), TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})),
+    ],
+)
+def test_compute_geometry(lsystem, conf):
+    """The vectorized interpreter draws the same segments as a turtle replaying every move."""
+    state = lsystem.apply(4)
+    geometry = compute_geometry(state, conf)
+    expected = np.array(replay_turtle(state, conf)).reshape(-1, 4)
+    np.testing.assert_allclose(geometry.segments, expected, atol=1e-9)
+    points = expected.reshape(-1, 2)
+    box = geometry.bounding_box
+    assert box.x_min == pytest.approx(min(0, points[:, 0].min()))
+    assert box.y_max == pytest.approx(max(0, points[:, 1].max()))
+
+
+def test_unknown_symbols():
+    """Symbols that are not mapped to a turtle move raise a `KeyError`, just like `LSystemTurtle.move`."""
+    with pytest.raises(KeyError):
+        compute_geometry('FX', TurtleConfiguration())
+
+
+@pytest.mark.parametrize(
+    "name, depth, angle, lattice",
+    [
+        ('DragonCurve', 12, 90, GAUSSIAN),
+        ('KochIsland', 3, 90, GAUSSIAN),
+        ('HexagonalGosperCurve', 4, 60, EISENSTEIN),
+        ('BracketedOlSystemFig124a', 4, 90, GAUSSIAN),
+    ],
+)
+def test_lattice(name, depth, angle, lattice):
+    """States turning by 90° or 60° are interpreted exactly on a lattice, matching the turtle."""
+    lsystem, conf = EXAMPLES[name]
+    conf = replace(conf, angle=angle)
+    state = lsystem.apply(depth)
+    exact = compute_lattice_geometry(state, conf)
+    assert exact.lattice is lattice and exact.segments.dtype == np.int64
+    np.testing.assert_allclose(exact.to_geometry().segments, replay_turtle(state, conf), atol=1e-6)
+    np.testing.assert_array_equal(compute_geometry(state, conf).segments, exact.to_geometry().segments)
+
+
+def test_lattice_is_exact():
+    """A closed curve returns exactly to its starting point, however many turns it took."""
+    conf = TurtleConfiguration(angle=60, forward_step=1)
+    exact = compute_lattice_geometry('F+F+F+F+F+F' * 1000, conf)
+    assert exact.segments[-1, 2:].tolist() == [0, 0]
+    assert compute_geometry('F+F+F+F+F+F' * 1000, conf).segments[-1, 2:].tolist() == [0.0, 0.0]
+
+
+@pytest.mark.parametrize(
+    "state, conf, lattice, expected",
+    [
+        ('F+F', TurtleConfiguration(angle=25.7), None, [[0, 0, 3, 0], [3, 0, 5.7032, 1.3010]]),
+        (
+            'F+F',
+            TurtleConfiguration(initial_heading_angle=45),
+            None,
+            [[0, 0, 2.1213, 2.1213], [2.1213, 2.1213, 0, 4.2426]],
+        ),
+        ('F>F', TurtleConfiguration(), None, [[0, 0, 3, 0], [3, 0, 7.5, 0]]),
+        ('F)+F', TurtleConfiguration(angle=85, angle_increment=5), GAUSSIAN, [[0, 0, 3, 0], [3, 0, 3, 3]]),
+    ],
+)
+def test_off_lattice(state, conf, lattice, expected):
+    """States leaving the lattices fall back to the trigonometric interpreter, the drawing state is followed."""
+    lattice_geometry = compute_lattice_geometry(state, conf)
+    assert (lattice_geometry and lattice_geometry.lattice) is lattice
+    np.testing.assert_allclose(compute_geometry(state, conf).segments, expected, atol=1e-4)
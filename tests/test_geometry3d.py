@@ -0,0 +1,86 @@
+"""Testing the vectorized 3D turtle interpreter."""
+
+import math
+
+import numpy as np
+import pytest
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+from l_system.rendering.geometry3d import Projection, compute_geometry3d
+
+from tests.constants import FractalTree
+
+BUSH = "F[&F[^F]\\F]/F[|+F]-F[&&/F]"
+
+
+def rotate(vector, axis, angle):
+    """Rodrigues' rotation of a vector around a unit axis."""
+    a = math.radians(angle)
+    return vector * math.cos(a) + np.cross(axis, vector) * math.sin(a) + axis * np.dot(axis, vector) * (1 - math.cos(a))
+
+
+def replay_turtle3d(state: str, conf: TurtleConfiguration) -> list[np.ndarray]:
+    """A plain Python 3D turtle, used as the reference of the vectorized interpreter."""
+    h = math.radians(conf.initial_heading_angle)
+    heading, left, up = (
+        np.array([math.cos(h), math.sin(h), 0.0]),
+        np.array([-math.sin(h), math.cos(h), 0.0]),
+        np.eye(3)[2],
+    )
+    position, stack, segments = np.zeros(3), [], []
+    for symbol in state:
+        if symbol in 'Ff':
+            end = position + conf.forward_step * heading
+            if symbol == 'F':
+                segments.append(np.concatenate([position, end]))
+            position = end
+        elif symbol in '+-|':
+            angle = 180 if symbol == '|' else conf.angle if symbol == '+' else -conf.angle
+            heading, left = rotate(heading, up, angle), rotate(left, up, angle)
+        elif symbol in '&^':
+            angle = conf.angle if symbol == '&' else -conf.angle
+            heading, up = rotate(heading, left, angle), rotate(up, left, angle)
+        elif symbol in '\\/':
+            angle = conf.angle if symbol == '\\' else -conf.angle
+            left, up = rotate(left, heading, angle), rotate(up, heading, angle)
+        elif symbol == '[':
+            stack.append((position, heading, left, up))
+        elif symbol == ']':
+            position, heading, left, up = stack.pop()
+    return segments
+
+
+def test_matches_the_reference_turtle():
+    conf = TurtleConfiguration(angle=30, forward_step=2, initial_heading_angle=90)
+    geometry = compute_geometry3d(BUSH * 3, conf)
+    np.testing.assert_allclose(geometry.segments, replay_turtle3d(BUSH * 3, conf), atol=1e-9)
+    # All three axes are used
+    assert np.ptp(geometry.vertices, axis=0).min() > 0
+
+
+def test_planar_systems_match_the_2d_interpreter():
+    conf = TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+    state = FractalTree().apply(5)
+    expected = compute_geometry(state, conf)
+    geometry = compute_geometry3d(state, conf)
+    np.testing.assert_allclose(geometry.segments[:, [0, 1, 3, 4]], expected.segments, atol=1e-9)
+    assert not geometry.segments[:, [2, 5]].any()
+    np.testing.assert_allclose(geometry.project().segments, expected.segments, atol=1e-9)
+
+
+def test_projections():
+    geometry = compute_geometry3d("F&F", TurtleConfiguration(angle=90))
+    # Pitching down by 90 degrees draws the second segment along -z, it collapses to a point when seen from the front
+    np.testing.assert_allclose(geometry.segments, [[0, 0, 0, 3, 0, 0], [3, 0, 0, 3, 0, -3]], atol=1e-9)
+    np.testing.assert_allclose(geometry.project().segments[1], [3, 0, 3, 0], atol=1e-9)
+    # and is seen full length from the side
+    side = geometry.project(Projection(azimuth=90)).segments
+    assert math.dist(side[1, :2], side[1, 2:]) == pytest.approx(3)
+
+    # In perspective, the segment in front of the center of the scene looks larger, the one behind it smaller
+    perspective = geometry.project(Projection(distance=10)).segments
+    assert math.dist(perspective[0, :2], perspective[0, 2:]) > 3
+    perspective = geometry.project(Projection(azimuth=90, distance=10)).segments
+    assert math.dist(perspective[1, :2], perspective[1, 2:]) < 3
+    with pytest.raises(ValueError):
+        geometry.project(Projection(distance=0.5))
@@ -0,0 +1,95 @@
+"""Testing the hierarchical instancing of the geometry of L-Systems."""
+
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+from examples.parametric_tree import ParametricBinaryTree
+from l_system.base import Lsystem
+from l_system.profiling import Observer, observe
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+from l_system.rendering.instancing import build_instances, write_instanced_svg
+
+from tests.constants import FractalTree, KochCurve
+
+
+def grammar(axiom: str, productions: dict[str, str]) -> Lsystem:
+    return type("Grammar", (Lsystem,), {"axiom": axiom, "productions": productions})()
+
+
+FRACTAL_TREE_CONF = TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+
+
+@pytest.mark.parametrize(
+    "lsystem, conf, depth",
+    [
+        (KochCurve(), TurtleConfiguration(angle=90, initial_heading_angle=30), 4),
+        (FractalTree(), FRACTAL_TREE_CONF, 6),
+        (grammar('F', {'F': 'F[|fF]-F'}), TurtleConfiguration(angle=60), 4),
+        (*EXAMPLES['BracketedOlSystemFig124d'], 5),
+        (*EXAMPLES['IslandsAndLakes'], 2),
+    ],
+)
+def test_geometry(lsystem, conf, depth):
+    """The instances draw the same segments in the same order, and visit the same area, as the expanded state."""
+    tree = build_instances(lsystem, conf, depth, cached_segments=16)
+    expected = compute_geometry(lsystem.apply(depth), conf)
+    geometry = tree.geometry()
+    assert len(tree) == len(expected)
+    np.testing.assert_allclose(geometry.segments, expected.segments, atol=1e-9)
+    np.testing.assert_allclose(geometry.bounding_box.to_tuple(), expected.bounding_box.to_tuple(), atol=1e-9)
+    np.testing.assert_allclose(np.concatenate(list(tree.chunks(chunk_size=50))), expected.segments, atol=1e-9)
+
+
+def test_instances_scale_with_depth():
+    """Every `(symbol, depth)` pair is interpreted once, however many times the symbol occurs."""
+    lsystem, conf = EXAMPLES['DragonCurve']
+    tree = build_instances(lsystem, conf, 30)
+    assert len(tree) == 2**30 and len(tree.instances) <= 2 * 31 + 4
+
+
+class OpenSpans(Observer):
+    def __init__(self):
+        self.open = 0
+
+    def span_started(self, name):
+        self.open += 1
+
+    def span_finished(self, name, seconds):
+        self.open -= 1
+
+
+def test_chunks_are_yielded_outside_of_the_spans():
+    """The consumer of the chunks isn't timed as geometry."""
+    lsystem, conf = EXAMPLES['DragonCurve']
+    tree = build_instances(lsystem, conf, 8, cached_segments=16)
+    with observe(OpenSpans()) as spans:
+        open_spans = [spans.open for _ in tree.chunks(chunk_size=1)]
+    assert len(open_spans) > 1 and not any(open_spans)
+
+
+@pytest.mark.parametrize(
+    "lsystem, message",
+    [
+        (grammar('F', {'F': 'F[+F'}), "not closed"),
+        (grammar('F', {'F': 'F#F'}), "rigid"),
+        (ParametricBinaryTree(), "parametric"),
+    ],
+)
+def test_not_instanceable(lsystem, message):
+    with pytest.raises(ValueError, match=message):
+        build_instances(lsystem, TurtleConfiguration(), 2)
+
+
+def test_write_instanced_svg(tmp_path):
+    """The SVG image holds a symbol per instance, placed by `<use>` elements."""
+    lsystem, conf = EXAMPLES['DragonCurve']
+    tree = build_instances(lsystem, conf, 16)
+    write_instanced_svg(tree, conf, tmp_path / "dragon.svg", inline_segments=4)
+    svg = ET.parse(tmp_path / "dragon.svg").getroot()
+    namespace = {"svg": "http://www.w3.org/2000/svg"}
+    symbols = svg.findall("svg:defs/svg:symbol", namespace)
+    assert 0 < len(symbols) <= len(tree.instances)
+    assert len(svg.findall(".//svg:use", namespace)) < 100 and len(svg.findall(".//svg:path", namespace)) < 100
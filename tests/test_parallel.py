@@ -0,0 +1,66 @@
+"""Testing the parallel geometry of bracketed L-Systems."""
+
+import numpy as np
+import pytest
+from l_system.registry import EXAMPLES
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry, state_moves
+from l_system.rendering.parallel import compute_geometry_parallel, split_branches, split_tasks
+
+CONF = TurtleConfiguration(angle=30, length_scale_factor=2, angle_increment=10, initial_heading_angle=0)
+
+
+def test_split_branches():
+    moves = state_moves("F[+F[-F]F]F[F]-[F", CONF)[0]
+    trunk, opens = split_branches(moves)
+    assert "".join(np.array(list("F[+F[-F]F]F[F]-[F"))[trunk]) == "FF-"
+    assert opens.tolist() == [1, 11, 15]
+    with pytest.raises(IndexError):
+        split_branches(state_moves("F]F[", CONF)[0])
+
+
+def test_split_tasks():
+    """The ranges cover the state, start at a top-level `[` and enter it in the state of the trunk."""
+    moves, steps, angles = state_moves("F+>[F]F(&[+F][-F]F[F", CONF)
+    tasks = split_tasks(moves, CONF, steps, angles, count=8)
+    assert [(start, stop, offset) for start, stop, offset, _ in tasks] == [
+        (0, 3, 0),
+        (3, 9, 1),
+        (9, 13, 3),
+        (13, 18, 4),
+        (18, 20, 6),
+    ]
+    entry, step = tasks[2][3], CONF.forward_step
+    np.testing.assert_allclose(
+        [entry.heading, *entry.position], [30, step + 2 * step * np.cos(np.pi / 6), 2 * step * np.sin(np.pi / 6)]
+    )
+    np.testing.assert_array_equal(entry.channels, [0, 1, -1, 1, 0])
+
+
+@pytest.mark.parametrize(
+    "name, depth",
+    [
+        ('BracketedOlSystemFig124a', 4),
+        ('BracketedOlSystemFig124b', 4),
+        ('BracketedOlSystemFig124c', 3),
+        ('BracketedOlSystemFig124d', 6),
+        ('BracketedOlSystemFig124f', 5),
+        ('ParametricBinaryTree', 6),
+        ('DragonCurve', 8),
+    ],
+)
+def test_same_geometry(name, depth):
+    """The branches interpreted by the workers draw the segments of `compute_geometry`, in the same order."""
+    lsystem, conf = EXAMPLES[name]
+    state = lsystem.apply(depth)
+    expected = compute_geometry(state, conf)
+    geometry = compute_geometry_parallel(state, conf, workers=2, min_moves=0)
+    np.testing.assert_allclose(geometry.segments, expected.segments, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(geometry.bounding_box.to_tuple(), expected.bounding_box.to_tuple(), rtol=0, atol=1e-9)
+
+
+def test_drawing_state():
+    """The entry states carry the drawing state of the trunk, e.g. the length scale and the turning angle."""
+    state = "F>[+F[-F]F]&F[(+F]<F[-F>F][F" * 5
+    geometry = compute_geometry_parallel(state, CONF, workers=2, min_moves=0)
+    np.testing.assert_allclose(geometry.segments, compute_geometry(state, CONF).segments, rtol=0, atol=1e-9)
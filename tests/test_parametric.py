@@ -0,0 +1,53 @@
+"""Testing the parametric L-system implementation."""
+
+import numpy as np
+import pytest
+from l_system.parametric import ParametricLsystem, compile_productions
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+
+
+class BinaryTree(ParametricLsystem):
+    """A parametric binary tree that stops growing once its branches get too short."""
+
+    axiom = 'F(1)'
+    productions = {'F(l) : l > 0.3': 'F(l*0.5)[+F(l*0.7)]'}
+
+
+@pytest.mark.parametrize(
+    "n, expected",
+    [
+        (0, "F(1)"),
+        (1, "F(0.5)[+F(0.7)]"),
+        (2, "F(0.25)[+F(0.35)][+F(0.35)[+F(0.49)]]"),
+    ],
+)
+def test_parametric_lsystem(n, expected):
+    """Testing the compiled production rules, including their conditions."""
+    assert str(BinaryTree().apply(n)) == expected
+
+
+def test_rules_are_matched_in_order():
+    """The first rule whose condition holds is applied, modules without a matching rule are copied."""
+    compiled = compile_productions(
+        'A(1)B(5)A(3,4)', {'A(x) : x > 2 and not x > 10': 'C', 'A(x)': 'A(x+2)', 'A(x, y)': 'B(x*y, sqrt(y))'}
+    )
+    state = compiled.rewrite(compiled.axiom)
+    assert str(state) == "A(3)B(5)B(12,2)"
+    assert str(compiled.rewrite(state)) == "CB(5)B(12,2)"
+
+
+def test_invalid_expressions():
+    """Expressions may only use the formal parameters and a few math functions."""
+    with pytest.raises(ValueError):
+        compile_productions('F(1)', {'F(l)': 'F(__import__("os"))'})
+    with pytest.raises(ValueError):
+        compile_productions('F(1)', {'F(l)': 'F(w)'})
+
+
+def test_parametric_geometry():
+    """The turtle reads the step length and the angle from the module parameters."""
+    state = BinaryTree().apply(1)
+    geometry = compute_geometry(state, TurtleConfiguration(forward_step=100, angle=90))
+    expected = np.array([[0, 0, 0.5, 0], [0.5, 0, 0.5, 0.7]])
+    np.testing.assert_allclose(geometry.segments, expected, atol=1e-12)
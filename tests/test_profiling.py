@@ -0,0 +1,58 @@
+"""Testing the profiling hooks."""
+
+import json
+
+from l_system import profiling
+from l_system.profiling import Observer, Profiler, observe
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+
+from tests.constants import KochCurve
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def span_finished(self, name, seconds):
+        self.events.append(("span", name))
+
+    def counted(self, name, value):
+        self.events.append(("count", name, value))
+
+
+def test_observers():
+    """Observers receive the spans and counters of the pipeline, only while they are registered."""
+    recorder = Recorder()
+    with observe(recorder):
+        state = KochCurve().apply(2)
+        compute_geometry(state, TurtleConfiguration())
+    KochCurve().apply(2)
+    assert recorder.events == [
+        ("span", "expansion"),
+        ("count", "symbols", 49),
+        ("span", "geometry"),
+        ("count", "segments", 25),
+    ]
+
+
+def test_disabled_spans_are_shared():
+    """Without observers no span objects are created."""
+    assert profiling.span("expansion") is profiling.span("drawing")
+
+
+def test_profiler_report(tmp_path):
+    """The profiler aggregates the spans and counters, optionally running the hot loops under cProfile."""
+    profiler = Profiler(cprofile_spans={"expansion"})
+    with observe(profiler):
+        KochCurve().apply(2)
+        KochCurve().apply(3)
+
+    report_path, stats_path = tmp_path / "report.json", tmp_path / "stats.prof"
+    profiler.write_json(report_path)
+    profiler.write_cprofile_stats(stats_path)
+    report = json.loads(report_path.read_text())
+    assert report["spans"]["expansion"]["calls"] == 2
+    assert report["counters"]["symbols"] == 49 + 249
+    assert report["peak_rss_bytes"] > 0
+    assert stats_path.stat().st_size > 0
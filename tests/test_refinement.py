@@ -0,0 +1,65 @@
+"""Testing the progressive refinement of L-Systems."""
+
+import numpy as np
+import pytest
+from examples.parametric_tree import ParametricBinaryTree
+from l_system.budget import Budget, BudgetExceeded, limits
+from l_system.refinement import Refinement
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+from l_system.streaming import iter_generations
+
+from tests.constants import FractalTree, KochCurve
+
+FRACTAL_TREE_CONF = TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+
+
+@pytest.mark.parametrize("lsystem", [KochCurve(), FractalTree(), ParametricBinaryTree()])
+def test_iter_generations(lsystem):
+    """Every generation is the state expanded directly to its depth."""
+    generations = list(iter_generations(lsystem, 4))
+    assert [depth for depth, _ in generations] == list(range(5))
+    assert [str(state) for _, state in generations] == [str(lsystem.apply(depth)) for depth in range(5)]
+
+
+def test_refinement():
+    """The generations are published in order, up to the requested depth."""
+    lsystem = FractalTree()
+    refinement = Refinement(lsystem, FRACTAL_TREE_CONF, 6).start()
+    refinement.join(timeout=10)
+    assert not refinement.running and refinement.error is None
+    depths = []
+    while not refinement.results.empty():
+        generation = refinement.results.get()
+        depths.append(generation.depth)
+    assert depths == list(range(7))
+    expected = compute_geometry(lsystem.apply(6), FRACTAL_TREE_CONF)
+    np.testing.assert_allclose(generation.geometry.segments, expected.segments)
+    assert len(generation.index.levels[0][1].segments) == len(expected)
+
+
+def test_latest_and_stop():
+    """`latest` skips to the deepest generation, and a stopped refinement publishes nothing more."""
+    refinement = Refinement(KochCurve(), TurtleConfiguration(angle=90), 3).start()
+    refinement.join(timeout=10)
+    assert refinement.latest().depth == 3 and refinement.latest() is None
+
+    stopped = Refinement(KochCurve(), TurtleConfiguration(angle=90), 20)
+    stopped.stop()
+    stopped.start().join(timeout=10)
+    assert not stopped.running and stopped.latest() is None
+
+
+def test_error():
+    """Errors of the background thread are kept for the consumer."""
+    refinement = Refinement(FractalTree(), TurtleConfiguration(), 2).start()
+    refinement.join(timeout=10)
+    assert isinstance(refinement.error, KeyError)
+
+
+def test_inherits_the_default_budget():
+    """The background thread uses the default budget of the context the refinement was created in."""
+    with limits(Budget(max_symbols=1000)):
+        refinement = Refinement(KochCurve(), TurtleConfiguration(angle=90), 6)
+    refinement.start().join(timeout=10)
+    assert isinstance(refinement.error, BudgetExceeded)
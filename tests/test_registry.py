@@ -0,0 +1,34 @@
+"""Testing the lazy registry of the examples."""
+
+import pytest
+from l_system.benchmark import measure_startup
+from l_system.registry import EXAMPLES, ExampleRegistry
+
+
+def test_examples_are_resolved_on_first_use():
+    registry = ExampleRegistry({'DragonCurve': "examples.dragon_curve"})
+    assert list(registry) == ['DragonCurve']
+    assert not registry.is_resolved('DragonCurve')
+
+    lsystem, turtle_configuration = registry['DragonCurve']
+    assert registry.is_resolved('DragonCurve')
+    assert lsystem.name() == 'DragonCurve'
+    assert turtle_configuration.turtle_move_mapper == {'A': 'F', 'B': 'F'}
+    # The same instances are returned by every lookup
+    assert registry['DragonCurve'][0] is lsystem
+
+
+def test_all_examples_are_registered_by_name():
+    for name in EXAMPLES:
+        assert EXAMPLES[name][0].name() == name
+
+
+def test_unknown_example():
+    with pytest.raises(KeyError):
+        EXAMPLES['NotAnExample']
+
+
+@pytest.mark.parametrize("module", ["l_system.base", "l_system.registry", "l_system.rendering.export"])
+def test_headless_imports_skip_tkinter(module):
+    _, imports_tk = measure_startup(module, repeat=1)
+    assert not imports_tk
@@ -0,0 +1,60 @@
+"""Testing the run-length encoded state backend."""
+
+import numpy as np
+import pytest
+from l_system.base import Lsystem
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry, intern_symbols
+from l_system.run_length import RunLengthState
+from l_system.symbol_array import SymbolArray
+
+from tests.constants import Algae, FractalTree, KochCurve
+
+
+class NodeRewriting(Lsystem):
+    """Figure 1.24d of The Algorithmic Beauty of Plants, its `F` runs double every generation."""
+
+    axiom = 'X'
+    productions = {'X': 'F[+X]F[-X]+X', 'F': 'FF'}
+
+
+@pytest.mark.parametrize("lsystem_cls", [Algae, FractalTree, KochCurve])
+def test_apply_runs(lsystem_cls):
+    """Rewriting whole runs produces the same states as the string backend."""
+    lsystem = lsystem_cls()
+    for n, expected in lsystem_cls.expected():
+        assert str(lsystem.apply_runs(n)) == expected
+
+
+def test_runs_are_merged():
+    """A run of `k` symbols whose successor is a run becomes a single longer run."""
+    lsystem = NodeRewriting()
+    state = lsystem.apply_runs(6)
+    assert str(state) == lsystem.apply(6)
+    assert state.counts.max() == 2**5
+    assert np.all(state.ids[1:] != state.ids[:-1])
+    assert state.compression_ratio > 1
+
+
+def test_run_length_geometry():
+    """A run of forward moves is drawn as one segment covering the same path."""
+    conf = TurtleConfiguration(angle=20, turtle_move_mapper={'X': 'F'})
+    lsystem = NodeRewriting()
+    expected = compute_geometry(lsystem.apply(5), conf)
+    actual = compute_geometry(lsystem.apply_runs(5), conf)
+    assert len(actual) < len(expected)
+    np.testing.assert_allclose(actual.bounding_box.to_tuple(), expected.bounding_box.to_tuple(), atol=1e-9)
+    np.testing.assert_allclose(
+        np.abs(actual.segments[:, 2:] - actual.segments[:, :2]).sum(),
+        np.abs(expected.segments[:, 2:] - expected.segments[:, :2]).sum(),
+    )
+
+
+def test_run_length_angle_increment():
+    """The turning angle increment is added to every turn of a run, like in the plain string."""
+    conf = TurtleConfiguration(angle=30, angle_increment=10)
+    state = ")F++F(-F"
+    expected = compute_geometry(state, conf)
+    ids, symbols = intern_symbols(state)
+    actual = compute_geometry(RunLengthState.encode(SymbolArray(symbols, ids.astype(np.uint8))), conf)
+    np.testing.assert_allclose(actual.segments, expected.segments, atol=1e-9)
@@ -0,0 +1,85 @@
+"""Testing the binary state and geometry format."""
+
+import numpy as np
+import pytest
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+from l_system.serialization import (
+    ALIGNMENT,
+    GeometryWriter,
+    StateWriter,
+    grammar_fingerprint,
+    load_geometry,
+    load_state,
+    read_header,
+    save_geometry,
+    save_state,
+)
+from l_system.streaming import iter_expansion, iter_geometry
+
+from tests.constants import FractalTree, KochCurve
+
+
+def test_fingerprint():
+    assert grammar_fingerprint('F', {'F': 'F+F', 'G': 'G'}) == grammar_fingerprint('F', {'G': 'G', 'F': 'F+F'})
+    assert grammar_fingerprint('F', {'F': 'F+F'}) != grammar_fingerprint('F', {'F': 'F-F'})
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_state_round_trip(tmp_path, mmap):
+    lsystem = KochCurve()
+    fingerprint = grammar_fingerprint(lsystem.axiom, lsystem.productions)
+    state = lsystem.apply_array(3)
+    save_state(tmp_path / "koch.lsys", state, fingerprint, depth=3)
+
+    header = read_header(tmp_path / "koch.lsys")
+    assert (header.count, header.depth, header.data_offset % ALIGNMENT) == (len(state), 3, 0)
+    loaded = load_state(tmp_path / "koch.lsys", fingerprint, mmap=mmap)
+    assert isinstance(loaded.ids, np.memmap) == mmap
+    assert str(loaded) == str(state)
+
+    with pytest.raises(ValueError, match="different grammar"):
+        load_state(tmp_path / "koch.lsys", grammar_fingerprint('F', {}))
+    with pytest.raises(ValueError, match="not a geometry file"):
+        load_geometry(tmp_path / "koch.lsys")
+
+
+def test_chunked_writing(tmp_path):
+    lsystem, conf = FractalTree(), TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+    with StateWriter(tmp_path / "tree.lsys", lsystem.apply_array(0).symbols) as states, GeometryWriter(
+        tmp_path / "tree.lsysg", np.float64
+    ) as geometries:
+        chunks = list(iter_expansion(lsystem, 5, chunk_size=8))
+        for chunk in chunks:
+            states.write(chunk)
+        for geometry in iter_geometry(chunks, conf):
+            geometries.write(geometry)
+
+    expected = compute_geometry(lsystem.apply(5), conf)
+    assert str(load_state(tmp_path / "tree.lsys")) == str(lsystem.state)
+    loaded = load_geometry(tmp_path / "tree.lsysg")
+    np.testing.assert_allclose(loaded.segments, expected.segments, atol=1e-9)
+    np.testing.assert_allclose(loaded.bounding_box.to_tuple(), expected.bounding_box.to_tuple(), atol=1e-9)
+
+
+def test_float32_geometry(tmp_path):
+    geometry = compute_geometry(KochCurve().apply(3), TurtleConfiguration())
+    save_geometry(tmp_path / "koch.lsysg", geometry)
+    loaded = load_geometry(tmp_path / "koch.lsysg")
+    assert loaded.segments.dtype == np.float32
+    np.testing.assert_allclose(loaded.segments, geometry.segments, rtol=1e-6)
+
+
+def test_not_a_state_file(tmp_path):
+    (tmp_path / "state.txt").write_text("F+F-F")
+    with pytest.raises(ValueError, match="not an L-System"):
+        read_header(tmp_path / "state.txt")
+
+
+def test_unknown_dtype(tmp_path):
+    save_state(tmp_path / "koch.lsys", KochCurve().apply_array(2))
+    raw = bytearray((tmp_path / "koch.lsys").read_bytes())
+    raw[7] = 0
+    (tmp_path / "koch.lsys").write_bytes(bytes(raw))
+    with pytest.raises(ValueError, match="unknown dtype code 0"):
+        read_header(tmp_path / "koch.lsys")
@@ -0,0 +1,120 @@
+"""Testing the local render service."""
+
+import asyncio
+import json
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from l_system.server import DEFAULT_BUDGET, RenderRequest, RenderResult, RenderService, ResultCache
+
+KOCH = {"axiom": "F", "productions": {"F": "F+F-F-F+F"}, "depth": 3, "turtle": {"angle": 90}, "format": "svg"}
+
+
+async def fetch(port: int, method: str, path: str, payload: dict | None = None) -> tuple[int, dict[str, str], bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *lines = head.decode().split("\r\n")
+    headers = {name.lower(): value.strip() for name, _, value in (line.partition(":") for line in lines)}
+    return int(status_line.split()[1]), headers, body
+
+
+def test_request_key():
+    """The key is independent of the order of the rules and defaults, and differs for another image."""
+    key = RenderRequest.from_json(KOCH).key
+    reordered = dict(reversed(KOCH.items()), size=[800, 800])
+    assert RenderRequest.from_json(reordered).key == key
+    assert RenderRequest.from_json({**KOCH, "depth": 2}).key != key
+    assert RenderRequest.from_json({"example": "DragonCurve"}).depth == 10
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [[], {"axiom": ""}, {**KOCH, "depth": -1}, {**KOCH, "format": "gif"}, {**KOCH, "turtle": {"heading": 1}}],
+)
+def test_invalid_request(payload):
+    with pytest.raises(ValueError):
+        RenderRequest.from_json(payload)
+
+
+def test_result_cache():
+    """The least recently used images are evicted once the cache is full, and larger images aren't cached."""
+    cache = ResultCache(max_bytes=10)
+    for key in "abc":
+        cache.put(key, RenderResult(b"1234", "image/png", 0))
+    assert "a" not in cache and cache.size == 8 and cache.evictions == 1
+    cache.get("b")
+    cache.put("d", RenderResult(b"1234", "image/png", 0))
+    assert list(cache) == ["b", "d"]
+    cache.put("e", RenderResult(bytes(11), "image/png", 0))
+    assert "e" not in cache and len(cache) == 2
+
+
+def test_service():
+    """Identical requests in flight are rendered once, then served from the cache."""
+
+    async def scenario():
+        async with RenderService(workers=1) as service:
+            server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                first, second = await asyncio.gather(
+                    fetch(port, "POST", "/render", KOCH), fetch(port, "POST", "/render", KOCH)
+                )
+                third = await fetch(port, "POST", "/render", KOCH)
+                errors = [
+                    await fetch(port, "POST", "/render", {**KOCH, "axiom": "X"}),
+                    await fetch(port, "POST", "/render", {"depth": 1}),
+                    await fetch(port, "GET", "/render"),
+                    await fetch(port, "GET", "/nowhere"),
+                ]
+                stats = json.loads((await fetch(port, "GET", "/stats"))[2])
+        return first, second, third, errors, stats
+
+    first, second, third, errors, stats = asyncio.run(scenario())
+    assert first[0] == second[0] == third[0] == 200
+    assert sorted([first[1]["x-cache"], second[1]["x-cache"]]) == ["coalesced", "miss"]
+    assert third[1]["x-cache"] == "hit" and third[1]["content-type"] == "image/svg+xml"
+    assert first[2] == second[2] == third[2] and first[2].startswith(b"<svg")
+    assert "expansion;dur=" in first[1]["server-timing"] and "total;dur=" in third[1]["server-timing"]
+    assert [status for status, _, _ in errors] == [422, 400, 405, 404]
+    assert (stats["misses"], stats["coalesced"], stats["hits"], stats["cache_entries"]) == (2, 1, 1, 1)
+
+
+@pytest.mark.parametrize(
+    "turtle",
+    [
+        {"angle": "abc"},
+        {"forward_step": True},
+        {"fg_color": [1, 0]},
+        {"palette": [[1, 0, "x"]]},
+        {"turtle_move_mapper": []},
+    ],
+)
+def test_invalid_turtle_configuration(turtle):
+    with pytest.raises(ValueError, match="invalid turtle configuration"):
+        RenderRequest.from_json({**KOCH, "turtle": turtle})
+
+
+def test_service_errors():
+    """Unbalanced grammars are rejected, huge requests exceed the default budget and a dead worker is replaced."""
+
+    async def scenario():
+        async with RenderService(workers=1) as service:
+            server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                unbalanced = await fetch(port, "POST", "/render", {**KOCH, "axiom": "F]"})
+                huge = await fetch(port, "POST", "/render", {"example": "DragonCurve", "depth": 40})
+                with pytest.raises(BrokenProcessPool):
+                    await asyncio.wrap_future(service._pool.submit(os._exit, 1))
+                after = await fetch(port, "POST", "/render", KOCH)
+        return unbalanced, huge, after, service.budget
+
+    unbalanced, huge, after, budget = asyncio.run(scenario())
+    assert unbalanced[0] == 422 and huge[0] == 413 and after[0] == 200
+    assert budget == DEFAULT_BUDGET
@@ -0,0 +1,78 @@
+"""Testing the spatial index over the segments of a drawing."""
+
+import numpy as np
+import pytest
+from l_system.rendering.configuration import TurtleBoundingBox, TurtleConfiguration
+from l_system.rendering.geometry import compute_drawing, compute_geometry
+from l_system.rendering.spatial import SegmentGrid, SegmentIndex, pan, simplify, zoom
+
+from tests.constants import KochCurve
+
+
+def brute_force(segments: np.ndarray, viewport: TurtleBoundingBox) -> np.ndarray:
+    xs, ys = segments[:, [0, 2]], segments[:, [1, 3]]
+    return np.flatnonzero(
+        (xs.min(axis=1) <= viewport.x_max)
+        & (xs.max(axis=1) >= viewport.x_min)
+        & (ys.min(axis=1) <= viewport.y_max)
+        & (ys.max(axis=1) >= viewport.y_min)
+    )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_query(seed):
+    """The grid finds exactly the segments whose bounding box intersects the viewport, in drawing order."""
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 100, size=(2000, 2))
+    segments = np.concatenate([starts, starts + rng.normal(0, 3, size=(2000, 2))], axis=1)
+    grid = SegmentGrid.build(segments, cell_segments=8)
+    for _ in range(20):
+        x, y = rng.uniform(-20, 110, size=2)
+        viewport = TurtleBoundingBox(x, y, x + rng.uniform(0, 50), y + rng.uniform(0, 50))
+        np.testing.assert_array_equal(grid.query(viewport), brute_force(segments, viewport))
+    np.testing.assert_array_equal(grid.query(TurtleBoundingBox(-1e3, -1e3, 1e3, 1e3)), np.arange(2000))
+
+
+def test_simplify():
+    """Snapped segments that are identical in either direction are merged, and points are dropped."""
+    segments = np.array([[0, 0, 1, 0], [1.1, 0, 0, 0.1], [0, 0, 0.2, 0.1], [1, 0, 2, 1]])
+    np.testing.assert_array_equal(simplify(segments, 1.0), [[0, 0, 1, 0], [1, 0, 2, 1]])
+
+
+def test_levels_of_detail():
+    """The coarser levels hold fewer segments, and are only used once a lattice cell is about a pixel."""
+    conf = TurtleConfiguration(angle=90)
+    index = SegmentIndex.build(compute_geometry(KochCurve().apply(5), conf))
+    sizes = [len(grid.segments) for _, grid in index.levels]
+    assert len(sizes) > 1 and sizes == sorted(sizes, reverse=True)
+    assert index.level(0) is index.levels[0][1]
+    assert index.level(1e9) is index.levels[-1][1]
+    everything = TurtleBoundingBox(-1e9, -1e9, 1e9, 1e9)
+    assert len(index.query(everything)) == sizes[0] and len(index.query(everything, 1e9)) == sizes[-1]
+
+
+def test_view_of_a_drawing():
+    """The view keeps the attributes of the visible segments, at every level, and culls the dots and polygons."""
+    conf = TurtleConfiguration(angle=90, palette=((1, 0, 0), (0, 0, 1)))
+    state = "{F+F+F+F}f" + KochCurve().apply(4) + "'" + "#" + KochCurve().apply(4) + "ff@"
+    drawing = compute_drawing(state, conf)
+    index = SegmentIndex.build(drawing)
+    assert len(index.levels) > 1
+    everything = TurtleBoundingBox(-1e9, -1e9, 1e9, 1e9)
+    view = index.view(everything)
+    np.testing.assert_array_equal(view.geometry.segments, drawing.geometry.segments)
+    np.testing.assert_array_equal(view.widths, drawing.widths)
+    np.testing.assert_array_equal(view.colors, drawing.colors)
+    assert len(view.dots) == 1 and len(view.polygon_colors) == 1 and len(view.polygon_vertices) == 5
+    # The segments of different widths and colors drawn over each other aren't merged
+    coarsest = index.view(everything, 1e9)
+    assert set(zip(coarsest.widths, coarsest.colors)) == {(1, 0), (2, 1)}
+    nothing = index.view(TurtleBoundingBox(1e8, 1e8, 1e8 + 1, 1e8 + 1))
+    assert (len(nothing), len(nothing.dots), len(nothing.polygon_colors)) == (0, 0, 0)
+
+
+def test_navigation():
+    """Zooming keeps the anchor in place and panning moves the whole viewport."""
+    viewport = TurtleBoundingBox(0, 0, 10, 20)
+    assert zoom(viewport, 0.5, (10, 0)).to_tuple() == (5, 0, 10, 10)
+    assert pan(viewport, 1, -2).to_tuple() == (1, -2, 11, 18)
@@ -0,0 +1,78 @@
+"""Testing the streaming expansion, interpretation and export."""
+
+import numpy as np
+import pytest
+from examples.parametric_tree import DEFAULT_TURTLE_CONFIG, ParametricBinaryTree
+from l_system.__main__ import main
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import render_image, write_png
+from l_system.rendering.geometry import compute_geometry, merge_bounding_boxes
+from l_system.streaming import iter_expansion, iter_geometry
+from l_system.symbol_array import SymbolArray
+from PIL import Image
+
+from tests.constants import FractalTree, KochCurve
+
+FRACTAL_TREE_CONF = TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+
+
+@pytest.mark.parametrize("lsystem", [KochCurve(), FractalTree(), ParametricBinaryTree()])
+def test_chunks_concatenate_to_the_state(lsystem):
+    chunks = list(iter_expansion(lsystem, 4, chunk_size=7))
+    assert max(len(c) for c in chunks) <= 7
+    assert "".join(str(c) for c in chunks) == str(lsystem.apply(4))
+
+
+@pytest.mark.parametrize(
+    "lsystem, conf",
+    [
+        (KochCurve(), TurtleConfiguration(angle=90)),
+        (FractalTree(), FRACTAL_TREE_CONF),
+        (ParametricBinaryTree(), DEFAULT_TURTLE_CONFIG),
+    ],
+)
+def test_turtle_state_is_carried_across_chunks(lsystem, conf):
+    expected = compute_geometry(lsystem.apply(5), conf)
+    geometries = list(iter_geometry(iter_expansion(lsystem, 5, chunk_size=5), conf))
+    assert len(geometries) > 1
+    np.testing.assert_allclose(np.concatenate([g.segments for g in geometries]), expected.segments, atol=1e-9)
+    bounding_box = merge_bounding_boxes(g.bounding_box for g in geometries)
+    np.testing.assert_allclose(bounding_box.to_tuple(), expected.bounding_box.to_tuple(), atol=1e-9)
+
+
+def test_unmatched_pop_across_chunks():
+    """The `[` of the first chunk matches one `]` of the second chunk, the other one has no match."""
+    chunks = [
+        SymbolArray("01[]", np.array([1, 2, 0], dtype=np.uint8)),
+        SymbolArray("01[]", np.array([3, 3], dtype=np.uint8)),
+    ]
+    with pytest.raises(IndexError):
+        list(iter_geometry(chunks, FRACTAL_TREE_CONF))
+
+
+def test_streamed_png_matches_the_in_memory_export(tmp_path):
+    lsystem, depth = FractalTree(), 6
+    geometries = list(iter_geometry(iter_expansion(lsystem, depth, chunk_size=16), FRACTAL_TREE_CONF))
+    bounding_box = merge_bounding_boxes(g.bounding_box for g in geometries)
+    write_png((g.segments for g in geometries), bounding_box, FRACTAL_TREE_CONF, tmp_path / "tree.png", (200, 200))
+
+    expected = render_image(compute_geometry(lsystem.apply(depth), FRACTAL_TREE_CONF), FRACTAL_TREE_CONF, (200, 200))
+    assert np.array_equal(np.asarray(Image.open(tmp_path / "tree.png")), np.asarray(expected))
+
+
+@pytest.mark.parametrize("fmt, header", [("png", b"\x89PNG"), ("svg", b"<svg"), ("eps", b"%!PS-Adobe-3.0 EPSF")])
+def test_render_command(tmp_path, capsys, fmt, header):
+    out = tmp_path / f"curve.{fmt}"
+    main(["render", "--example", "KochCurvesFig19a", "--depth", "3", "--size", "120x80", "--out", str(out)])
+    assert out.read_bytes().startswith(header)
+    assert "Rendered KochCurvesFig19a (depth 3" in capsys.readouterr().out
+
+
+def test_render_from_a_geometry_file(tmp_path, capsys):
+    render = ["render", "--example", "KochCurvesFig19a", "--depth", "3", "--size", "120x80"]
+    main(render + ["--save-geometry", str(tmp_path / "curve.lsysg"), "--out", str(tmp_path / "expanded.png")])
+    main(render + ["--geometry", str(tmp_path / "curve.lsysg"), "--out", str(tmp_path / "loaded.png")])
+    assert (tmp_path / "expanded.png").read_bytes() == (tmp_path / "loaded.png").read_bytes()
+
+    with pytest.raises(SystemExit, match="different grammar"):
+        main(["render", "--example", "DragonCurve", "--geometry", str(tmp_path / "curve.lsysg")])
@@ -0,0 +1,53 @@
+"""Testing the parameter sweeps over the turning angle and the forward step."""
+
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from l_system.registry import EXAMPLES
+from l_system.rendering.geometry import compute_geometry, compute_sweep
+from l_system.rendering.sweep import LABEL_HEIGHT, contact_sheet, sweep, write_variants
+
+ANGLES = [20.0, 25.7, 90.0]
+STEPS = [1.0, 2.5]
+
+
+@pytest.mark.parametrize(
+    "name",
+    ['BracketedOlSystemFig124a', 'BracketedOlSystemFig124d', 'DragonCurve', 'KochIsland', 'ParametricBinaryTree'],
+)
+def test_compute_sweep(name):
+    """Every variant matches the geometry computed with its angle and step."""
+    lsystem, conf = EXAMPLES[name]
+    state = lsystem.apply(min(lsystem.recursions, 4))
+    geometries = list(compute_sweep(state, conf, ANGLES, STEPS))
+    assert len(geometries) == len(ANGLES) * len(STEPS)
+    for (angle, step), geometry in zip([(a, s) for a in ANGLES for s in STEPS], geometries):
+        expected = compute_geometry(state, replace(conf, angle=angle, forward_step=step))
+        np.testing.assert_allclose(geometry.segments, expected.segments, atol=1e-9)
+        np.testing.assert_allclose(geometry.bounding_box.to_tuple(), expected.bounding_box.to_tuple(), atol=1e-9)
+
+
+def test_contact_sheet():
+    """The L-System isn't modified, and the variants are laid out row by row with their labels below."""
+    lsystem, conf = EXAMPLES['BracketedOlSystemFig124a']
+    state = lsystem.state
+    variants = sweep(lsystem, conf, ANGLES, STEPS, depth=3)
+    assert [(v.angle, v.forward_step) for v in variants[:2]] == [(20.0, 1.0), (20.0, 2.5)]
+    assert lsystem.state is state
+    assert contact_sheet(variants, conf, (50, 40)).size == (3 * 50, 2 * (40 + LABEL_HEIGHT))
+    assert contact_sheet(variants, conf, (50, 40), columns=4, shared_frame=True).size == (
+        4 * 50,
+        2 * (40 + LABEL_HEIGHT),
+    )
+
+
+def test_write_variants(tmp_path):
+    lsystem, conf = EXAMPLES['DragonCurve']
+    variants = sweep(lsystem, conf, [85, 90], depth=6)
+    paths = write_variants(variants, conf, tmp_path / "variants", "svg", (64, 64))
+    assert [p.name for p in paths] == [
+        f"angle_85_step_{conf.forward_step:g}.svg",
+        f"angle_90_step_{conf.forward_step:g}.svg",
+    ]
+    assert all(p.stat().st_size > 0 for p in paths)
@@ -0,0 +1,28 @@
+"""Testing the uint8 array state backend."""
+
+import numpy as np
+import pytest
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.geometry import compute_geometry
+
+from tests.constants import Algae, FractalTree, KochCurve
+
+
+@pytest.mark.parametrize("lsystem_cls", [Algae, FractalTree, KochCurve])
+def test_apply_array(lsystem_cls):
+    """The array backend produces the same states as the string backend, one byte per symbol."""
+    lsystem = lsystem_cls()
+    for n, expected in lsystem_cls.expected():
+        state = lsystem.apply_array(n)
+        assert state.ids.dtype == np.uint8
+        assert state.nbytes == len(expected)
+        assert str(state) == expected
+
+
+def test_array_geometry():
+    """A `SymbolArray` is interpreted directly by the vectorized turtle."""
+    conf = TurtleConfiguration(angle=45, turtle_move_mapper={'0': 'F', '1': 'F'})
+    lsystem = FractalTree()
+    expected = compute_geometry(lsystem.apply(5), conf)
+    actual = compute_geometry(lsystem.apply_array(5), conf)
+    np.testing.assert_array_equal(actual.segments, expected.segments)
@@ -0,0 +1,81 @@
+"""Testing the tiled rendering of large images."""
+
+import json
+
+import numpy as np
+import pytest
+from l_system.profiling import Observer, observe
+from l_system.rendering.configuration import TurtleConfiguration
+from l_system.rendering.export import render_image
+from l_system.rendering.geometry import compute_drawing, compute_geometry
+from l_system.rendering.spatial import TileGrid
+from l_system.rendering.tiles import write_tile_directory, write_tiled_png
+from PIL import Image
+
+from tests.constants import FractalTree, KochCurve
+
+
+def test_bucket():
+    """Every box is assigned to exactly the tiles it overlaps, in its original order."""
+    grid = TileGrid((100, 70), (32, 32))
+    rng = np.random.default_rng(0)
+    corners = rng.uniform(-20, 120, size=(200, 2, 2))
+    boxes = np.concatenate([corners.min(axis=1), corners.max(axis=1)], axis=1)
+    indices, offsets = grid.bucket(boxes)
+    for tile in range(len(grid)):
+        x0, y0, x1, y1 = grid.box(tile)
+        overlaps = (boxes[:, 0] < x1) & (boxes[:, 2] >= x0) & (boxes[:, 1] < y1) & (boxes[:, 3] >= y0)
+        np.testing.assert_array_equal(indices[offsets[tile] : offsets[tile + 1]], np.flatnonzero(overlaps))
+    assert grid.box(len(grid) - 1) == (96, 64, 100, 70)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_write_tiled_png(tmp_path, workers):
+    """The tiles are stitched to the same pixels as the image rendered in one buffer."""
+    conf = TurtleConfiguration(angle=90)
+    geometry = compute_geometry(KochCurve().apply(3), conf)
+    write_tiled_png(geometry, conf, tmp_path / "tiled.png", (301, 203), (64, 48), workers)
+    tiled = np.asarray(Image.open(tmp_path / "tiled.png").convert("RGB"))
+    np.testing.assert_array_equal(tiled, np.asarray(render_image(geometry, conf, (301, 203))))
+
+
+class Nesting(Observer):
+    def __init__(self):
+        self.open, self.deepest, self.calls = 0, 0, 0
+
+    def span_started(self, name):
+        self.open += 1
+        self.deepest = max(self.deepest, self.open)
+
+    def span_finished(self, name, seconds):
+        self.open -= 1
+        self.calls += 1
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_spans_do_not_nest(tmp_path, workers):
+    """Every tile and band is timed once, the spans of the tiles are closed while the bands are written."""
+    conf = TurtleConfiguration(angle=90)
+    geometry = compute_geometry(KochCurve().apply(2), conf)
+    with observe(Nesting()) as nesting:
+        write_tiled_png(geometry, conf, tmp_path / "tiled.png", (100, 60), (40, 40), workers)
+    assert nesting.deepest == 1
+    assert nesting.calls == 6 + 2
+
+
+def test_tiled_drawing(tmp_path):
+    """The widths, colors, dots and polygons of a drawing that cross tiles are drawn in all of them."""
+    conf = TurtleConfiguration(angle=45, line_width=6, palette=((1, 0, 0), (0, 0.5, 0)))
+    drawing = compute_drawing("{F+F+F+F}" + FractalTree().apply(4).replace('0', "'F@").replace('1', 'F'), conf)
+    write_tiled_png(drawing, conf, tmp_path / "tiled.png", (256, 256), (40, 40), 1)
+    tiled = np.asarray(Image.open(tmp_path / "tiled.png").convert("RGB"))
+    np.testing.assert_array_equal(tiled, np.asarray(render_image(drawing, conf, (256, 256))))
+
+
+def test_write_tile_directory(tmp_path):
+    """Every tile is stored to its own file, listed in the index of the directory."""
+    conf = TurtleConfiguration(angle=90)
+    grid = write_tile_directory(compute_geometry(KochCurve().apply(2), conf), conf, tmp_path, (100, 60), (64, 64), 1)
+    index = json.loads((tmp_path / "tiles.json").read_text())
+    assert (index["columns"], index["rows"]) == (grid.columns, grid.rows) == (2, 1)
+    assert [Image.open(tmp_path / name).size for name in index["tiles"]] == [(64, 60), (36, 60)]